@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Throughput and latency benchmarks for the demo MCP server tools
+
+Every benchmarked tool is driven through its server's `execute_tool` at each
+requested concurrency level against generated fixtures (files, a git
+repository, a document corpus and a memory store). Results report ops/sec,
+p50/p99 latency and peak RSS, and are written as JSON so runs can be compared.
+
+Usage:
+    python scripts/bench_demo_servers.py --concurrency 1,8,32 --output bench.json
+    python scripts/bench_demo_servers.py --tools search_memories --data-size 100000
+    python scripts/bench_demo_servers.py --output new.json --compare baseline.json --threshold 0.15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.core.demo_mcp_servers import (  # noqa: E402
+    FilesystemMCPServer, GitMCPServer, MemoryMCPServer, WebSearchMCPServer
+)
+
+ALL_TOOLS = [
+    "read_file", "list_directory", "git_status", "git_log",
+    "search_web", "create_memory", "search_memories"
+]
+
+_VOCABULARY = [
+    "sprint", "deploy", "review", "backlog", "issue", "release", "latency", "database",
+    "migration", "roadmap", "incident", "customer", "feature", "refactor", "pipeline",
+    "metrics", "server", "client", "cache", "index", "query", "memory", "branch", "commit",
+    "analytics", "budget", "team", "planning", "retro", "estimate", "priority", "risk"
+]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def random_text(rng, words):
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__)
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+class Fixtures:
+    """Generated data shared by the benchmarks in one run"""
+
+    def __init__(self, root, data_size, payload_size, seed=0):
+        self.root = root
+        self.data_size = data_size
+        self.payload_size = payload_size
+        self.rng = random.Random(seed)
+        self.files_dir = os.path.join(root, "files")
+        self.repo_dir = os.path.join(root, "repo")
+        self.corpus_dir = os.path.join(root, "corpus")
+        self.memory_db = os.path.join(root, "memory.sqlite3")
+
+    def build_files(self):
+        os.makedirs(self.files_dir, exist_ok=True)
+        payload = "x" * self.payload_size
+        self.file_paths = []
+        for i in range(self.data_size):
+            path = os.path.join(self.files_dir, f"file_{i:06d}.txt")
+            with open(path, "w") as f:
+                f.write(payload)
+            self.file_paths.append(path)
+
+    def build_repo(self):
+        """Create a repository with `data_size` commits using git fast-import"""
+        os.makedirs(self.repo_dir, exist_ok=True)
+        subprocess.run(["git", "init", "-q", self.repo_dir], check=True)
+        stream = []
+        timestamp = 1_700_000_000
+        for i in range(self.data_size):
+            content = f"change {i}\n".encode()
+            stream.append(
+                b"commit refs/heads/master\n"
+                + f"committer Bench <bench@example.com> {timestamp + i * 60} +0000\n".encode()
+                + f"data {len(f'commit {i}')}\ncommit {i}\n".encode()
+                + f"M 644 inline file_{i % 50}.txt\ndata {len(content)}\n".encode() + content + b"\n"
+            )
+        subprocess.run(
+            ["git", "fast-import", "--quiet"], input=b"".join(stream), cwd=self.repo_dir, check=True
+        )
+        subprocess.run(["git", "checkout", "-q", "-f", "master"], cwd=self.repo_dir, check=True)
+        # A few untracked and modified files give git_status something to report
+        for i in range(min(20, self.data_size)):
+            with open(os.path.join(self.repo_dir, f"untracked_{i}.txt"), "w") as f:
+                f.write("untracked\n")
+
+    def build_corpus(self):
+        os.makedirs(self.corpus_dir, exist_ok=True)
+        words = max(20, self.payload_size // 8)
+        for i in range(self.data_size):
+            with open(os.path.join(self.corpus_dir, f"doc_{i:06d}.md"), "w") as f:
+                f.write(f"# {random_text(self.rng, 4)}\n\n{random_text(self.rng, words)}\n")
+
+    def query(self):
+        return random_text(self.rng, 2)
+
+
+async def build_servers(fixtures, tools):
+    servers = {"filesystem": FilesystemMCPServer()}
+    if {"git_status", "git_log"} & set(tools):
+        fixtures.build_repo()
+        servers["git"] = GitMCPServer()
+    if {"read_file", "list_directory"} & set(tools):
+        fixtures.build_files()
+    if "search_web" in tools:
+        fixtures.build_corpus()
+        servers["web_search"] = WebSearchMCPServer(corpus_dir=fixtures.corpus_dir)
+        servers["web_search"].ensure_corpus()
+    if {"create_memory", "search_memories"} & set(tools):
+        memory = MemoryMCPServer(db_path=fixtures.memory_db)
+        words = max(4, fixtures.payload_size // 8)
+        for start in range(0, fixtures.data_size, 1000):
+            count = min(1000, fixtures.data_size - start)
+            await asyncio.gather(*(
+                memory.execute_tool("create_memory", {
+                    "content": random_text(fixtures.rng, words),
+                    "tags": [fixtures.rng.choice(_VOCABULARY)]
+                })
+                for _ in range(count)
+            ))
+        servers["memory"] = memory
+    return servers
+
+
+def make_operation(tool, servers, fixtures):
+    """Return a zero-argument coroutine factory that performs one tool call"""
+    rng = fixtures.rng
+    words = max(4, fixtures.payload_size // 8)
+    if tool == "read_file":
+        return lambda: servers["filesystem"].execute_tool("read_file", {"path": rng.choice(fixtures.file_paths)})
+    if tool == "list_directory":
+        return lambda: servers["filesystem"].execute_tool("list_directory", {"path": fixtures.files_dir})
+    if tool == "git_status":
+        return lambda: servers["git"].execute_tool("git_status", {"path": fixtures.repo_dir})
+    if tool == "git_log":
+        return lambda: servers["git"].execute_tool("git_log", {"path": fixtures.repo_dir, "limit": 50})
+    if tool == "search_web":
+        return lambda: servers["web_search"].execute_tool(
+            "search_web", {"query": fixtures.query(), "max_results": 5}
+        )
+    if tool == "create_memory":
+        return lambda: servers["memory"].execute_tool(
+            "create_memory", {"content": random_text(rng, words), "tags": [rng.choice(_VOCABULARY)]}
+        )
+    if tool == "search_memories":
+        return lambda: servers["memory"].execute_tool("search_memories", {"query": fixtures.query(), "limit": 10})
+    raise ValueError(f"Unknown tool: {tool}")
+
+
+async def run_load(operation, concurrency, iterations, duration):
+    """Drive `operation` from `concurrency` workers and collect per-call latencies"""
+    latencies = []
+    errors = 0
+    remaining = iterations
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker():
+        nonlocal remaining, errors
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+            elif remaining <= 0:
+                return
+            else:
+                remaining -= 1
+            started = time.perf_counter()
+            try:
+                result = await operation()
+                if not result or not result.get("success", False):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_benchmarks(args):
+    tools = args.tools
+    results = []
+    with tempfile.TemporaryDirectory(prefix="mcp-bench-") as root:
+        fixtures = Fixtures(root, args.data_size, args.payload_size, seed=args.seed)
+        setup_started = time.perf_counter()
+        servers = await build_servers(fixtures, tools)
+        print(f"Fixtures ready in {time.perf_counter() - setup_started:.1f}s (data size {args.data_size})")
+
+        for tool in tools:
+            operation = make_operation(tool, servers, fixtures)
+            # Warm caches and lazy initialization outside the measurement
+            await run_load(operation, 1, args.warmup, None)
+            for concurrency in args.concurrency:
+                latencies, errors, elapsed = await run_load(operation, concurrency, args.iterations, args.duration)
+                latencies.sort()
+                result = {
+                    "tool": tool,
+                    "concurrency": concurrency,
+                    "ops": len(latencies),
+                    "errors": errors,
+                    "ops_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+                    "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+                    "peak_rss_mb": peak_rss_mb()
+                }
+                results.append(result)
+                print(
+                    f"{tool:<16} c={concurrency:<4} {result['ops_per_sec']:>10.1f} ops/s  "
+                    f"p50 {result['p50_ms']:>8.3f} ms  p99 {result['p99_ms']:>8.3f} ms  "
+                    f"rss {result['peak_rss_mb']:>7.1f} MB  errors {errors}"
+                )
+
+        for server in servers.values():
+            server.close()
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Print per-benchmark deltas and return the regressions beyond `threshold`"""
+    with open(baseline_path) as f:
+        baseline = {(r["tool"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\nComparison against {baseline_path} (threshold {threshold:.0%}):")
+    for result in results:
+        previous = baseline.get((result["tool"], result["concurrency"]))
+        if previous is None:
+            continue
+        throughput_delta = (result["ops_per_sec"] - previous["ops_per_sec"]) / previous["ops_per_sec"] if previous["ops_per_sec"] else 0.0
+        p99_delta = (result["p99_ms"] - previous["p99_ms"]) / previous["p99_ms"] if previous["p99_ms"] else 0.0
+        regressed = throughput_delta < -threshold or p99_delta > threshold
+        marker = "REGRESSION" if regressed else "ok"
+        print(
+            f"  {result['tool']:<16} c={result['concurrency']:<4} "
+            f"ops/s {throughput_delta:+7.1%}  p99 {p99_delta:+7.1%}  {marker}"
+        )
+        if regressed:
+            regressions.append({
+                "tool": result["tool"],
+                "concurrency": result["concurrency"],
+                "ops_per_sec_delta": round(throughput_delta, 4),
+                "p99_delta": round(p99_delta, 4)
+            })
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark demo MCP server tools")
+    parser.add_argument("--tools", default=",".join(ALL_TOOLS), help="Comma-separated tools to benchmark")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--iterations", type=int, default=500, help="Calls per tool and concurrency level")
+    parser.add_argument("--duration", type=float, help="Run each level for this many seconds instead")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed calls before measuring each tool")
+    parser.add_argument("--payload-size", type=int, default=1024, help="Bytes per file, memory or document")
+    parser.add_argument("--data-size", type=int, default=1000, help="Files, commits, documents and memories to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    args.tools = [tool.strip() for tool in args.tools.split(",") if tool.strip()]
+    unknown = [tool for tool in args.tools if tool not in ALL_TOOLS]
+    if unknown:
+        parser.error(f"Unknown tools: {', '.join(unknown)} (available: {', '.join(ALL_TOOLS)})")
+    args.concurrency = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmarks(args))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {
+                "tools": args.tools,
+                "concurrency": args.concurrency,
+                "iterations": args.iterations,
+                "duration": args.duration,
+                "payload_size": args.payload_size,
+                "data_size": args.data_size,
+                "seed": args.seed
+            }
+        },
+        "results": results
+    }
+
+    exit_code = 0
+    if args.compare:
+        report["regressions"] = compare(results, args.compare, args.threshold)
+        exit_code = 1 if report["regressions"] else 0
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
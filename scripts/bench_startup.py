@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Streamlit app
+
+Each run starts a fresh interpreter. Import cost is measured with
+`python -X importtime`: streamlit is imported first, as `streamlit run`
+would have done, and everything pulled in by `src.main` after it is
+attributed to the app. First-render time is the time for Streamlit's
+`AppTest` to run the script once against throwaway databases. The script
+exits non-zero when a median goes over its budget or when a module that
+should load lazily is imported at startup.
+
+Usage:
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --runs 10 --import-budget-ms 150 --render-budget-ms 1500
+    python scripts/bench_startup.py --forbid openai,numpy --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+_IMPORT_SNIPPET = "import streamlit; import src.main"
+
+_RENDER_SNIPPET = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=60)
+started = time.perf_counter()
+app.run()
+elapsed = time.perf_counter() - started
+print(json.dumps({"render_ms": elapsed * 1000, "exceptions": [e.message for e in app.exception]}))
+"""
+
+
+def parse_importtime(stderr):
+    """Return `[(depth, module, self_us, cumulative_us)]` from `-X importtime` output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip()
+        entries.append(((len(name) - len(stripped) - 1) // 2, stripped.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def app_imports(entries, root="src.main"):
+    """Entries imported on behalf of `root`, i.e. printed between the previous top-level import and it"""
+    for index, (depth, module, _, _) in enumerate(entries):
+        if depth == 0 and module == root:
+            start = index
+            while start > 0 and entries[start - 1][0] > 0:
+                start -= 1
+            return entries[start:index + 1]
+    raise RuntimeError(f"{root} does not appear in the import trace")
+
+
+def measure_imports(python, env):
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", _IMPORT_SNIPPET],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing the app failed:\n{result.stderr[-2000:]}")
+    entries = app_imports(parse_importtime(result.stderr))
+    return {
+        "app_import_ms": entries[-1][3] / 1000,
+        "modules": [(module, cumulative_us / 1000) for _, module, _, cumulative_us in entries]
+    }
+
+
+def measure_render(python, env):
+    result = subprocess.run(
+        [python, "-c", _RENDER_SNIPPET, os.path.join(ROOT, "run.py")],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Rendering the app failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def heaviest_packages(modules, limit):
+    """Top-level third-party and stdlib packages first imported by the app, by cumulative import time"""
+    packages = {}
+    for module, cumulative_ms in modules:
+        top = module.split(".")[0]
+        if top == "src":
+            continue
+        if top == module or top not in packages:
+            packages[top] = max(packages.get(top, 0.0), cumulative_ms)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the Streamlit app")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters for the import measurement")
+    parser.add_argument("--render-runs", type=int, default=3, help="Fresh interpreters for the first-render measurement")
+    parser.add_argument("--import-budget-ms", type=float, default=250.0, help="Allowed median app import time")
+    parser.add_argument("--render-budget-ms", type=float, default=3000.0, help="Allowed median first-render time")
+    parser.add_argument("--forbid", default="openai", help="Comma-separated modules that must not load at startup")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest packages to list")
+    parser.add_argument("--python", default=sys.executable, help="Interpreter to benchmark")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+    args.forbid = [module.strip() for module in args.forbid.split(",") if module.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the run away from the developer's databases and prefetch spend
+        env = dict(
+            os.environ,
+            CHAT_HISTORY_DB_PATH=os.path.join(tmp, "chat_history.sqlite3"),
+            USER_DIRECTORY_DB_PATH=os.path.join(tmp, "user_directory.sqlite3"),
+            SESSION_STATE_DB_PATH=os.path.join(tmp, "session_state.sqlite3"),
+            USER_DIRECTORY_BACKEND="sqlite",
+            SPECULATIVE_PREFETCH="0"
+        )
+        # Compile bytecode once so every measured run starts from a warm cache, as a deployed replica does
+        subprocess.run([args.python, "-c", _IMPORT_SNIPPET], cwd=ROOT, env=env, capture_output=True)
+
+        import_runs = [measure_imports(args.python, env) for _ in range(args.runs)]
+        render_runs = [measure_render(args.python, env) for _ in range(args.render_runs)]
+
+    import_ms = statistics.median(run["app_import_ms"] for run in import_runs)
+    render_ms = statistics.median(run["render_ms"] for run in render_runs)
+    loaded = {module for module, _ in import_runs[0]["modules"]}
+    forbidden = sorted(
+        module for module in args.forbid
+        if any(name == module or name.startswith(module + ".") for name in loaded)
+    )
+    exceptions = sorted({message for run in render_runs for message in run["exceptions"]})
+
+    print(f"App import:   median {import_ms:8.1f} ms over {args.runs} runs (budget {args.import_budget_ms:.0f} ms)")
+    print(f"First render: median {render_ms:8.1f} ms over {args.render_runs} runs (budget {args.render_budget_ms:.0f} ms)")
+    print("\nHeaviest packages imported by the app:")
+    for package, cumulative_ms in heaviest_packages(import_runs[0]["modules"], args.top):
+        print(f"  {package:<32} {cumulative_ms:8.1f} ms")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append(f"app import {import_ms:.1f} ms exceeds {args.import_budget_ms:.0f} ms")
+    if render_ms > args.render_budget_ms:
+        failures.append(f"first render {render_ms:.1f} ms exceeds {args.render_budget_ms:.0f} ms")
+    if forbidden:
+        failures.append(f"loaded at startup: {', '.join(forbidden)}")
+    if exceptions:
+        failures.append(f"first render raised: {'; '.join(exceptions)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": args.python,
+                "app_import_ms": round(import_ms, 1),
+                "first_render_ms": round(render_ms, 1),
+                "import_runs_ms": [round(run["app_import_ms"], 1) for run in import_runs],
+                "render_runs_ms": [round(run["render_ms"], 1) for run in render_runs],
+                "forbidden_loaded": forbidden,
+                "failures": failures
+            }, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if failures:
+        print("\nFAILED: " + "; ".join(failures))
+        return 1
+    print("\nWithin budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Offline replay of recorded chat turns
+
+Turns recorded with TURN_RECORD_PATH (see `src/core/turn_recorder.py`) are
+run through the same response pipeline as `main()` and the service: the
+completion request is rebuilt from the recorded messages, profile, settings
+and tool catalog, so tool retrieval and serialization run again. The reply
+is streamed through `stream_reply` from a stand-in router that plays the
+recorded chunks back on their recorded schedule, and the tool calls go
+through the tool handlers again. Nothing touches the network.
+
+`--speed 1` keeps the original timing, `--speed 10` plays it ten times
+faster and `--speed 0` does not wait at all. By default turns are replayed
+one after another. With `--arrivals` each turn starts at its recorded
+arrival time, scaled by the speed, so concurrent turns overlap as they did
+in production.
+
+For each turn the report gives the time to build the request, the time to
+the first streamed text, and the pipeline overhead: the time the replay
+took beyond the recorded chunk schedule. It also flags turns whose reply
+text or tool results now come out differently. Compare against an earlier
+report to bisect a regression. The script exits non-zero when overhead or
+build time regress past the threshold or when a replay diverges from its
+recording.
+
+Usage:
+    python scripts/replay_turns.py turns.jsonl --speed 0 --output replay.json
+    python scripts/replay_turns.py turns.jsonl --speed 4 --arrivals
+    python scripts/replay_turns.py turns.jsonl --speed 0 --compare replay.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Replaying must not append to the recording it reads
+os.environ.pop("TURN_RECORD_PATH", None)
+
+from src.core.chat_pipeline import completion_request, stream_reply, ticket_from_tool_call  # noqa: E402
+from src.core.mcp_client import execute_tool  # noqa: E402
+from src.core.serialization import DecodeError, loads  # noqa: E402
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__)
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_recording(path):
+    """Return `(catalogs, turns, skipped)`: tool catalogs by digest, the replayable turns in order
+    and how many turns had nothing to replay"""
+    catalogs = {}
+    turns = []
+    skipped = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = loads(line)
+            if record.get("type") == "tools":
+                catalogs[record["digest"]] = record["tools"]
+            elif record.get("type") == "turn":
+                # Prefetched answers and turns that failed before the request have nothing to replay
+                if "messages" in record and record.get("chunks"):
+                    turns.append(record)
+                else:
+                    skipped += 1
+    return catalogs, turns, skipped
+
+
+def _chunk(entry):
+    """Rebuild a streamed chunk shaped like the OpenAI SDK's from its recorded form"""
+    content = entry[1] if len(entry) > 1 else None
+    tool_calls = entry[2] if len(entry) > 2 else None
+    usage = entry[3] if len(entry) > 3 else None
+    choices = []
+    if content is not None or tool_calls:
+        choices.append(SimpleNamespace(delta=SimpleNamespace(
+            content=content,
+            tool_calls=[
+                SimpleNamespace(index=index, function=SimpleNamespace(name=name, arguments=arguments))
+                for index, name, arguments in tool_calls or ()
+            ] or None
+        )))
+    return SimpleNamespace(choices=choices, usage=SimpleNamespace(
+        prompt_tokens=usage[0], completion_tokens=usage[1],
+        prompt_tokens_details=SimpleNamespace(cached_tokens=usage[2])
+    ) if usage else None)
+
+
+class ReplayRouter:
+    """Stands in for `ModelRouter`, streaming one turn's recorded chunks on their recorded schedule"""
+
+    def __init__(self, turn, speed):
+        self.deployment = SimpleNamespace(name=turn.get("deployment", "replay"))
+        self.chunks = [(entry[0], _chunk(entry)) for entry in turn["chunks"]]
+        self.speed = speed
+
+    def schedule_ms(self):
+        """When the last chunk is due, relative to the start of the stream"""
+        if not self.chunks or not self.speed:
+            return 0.0
+        return self.chunks[-1][0] / self.speed
+
+    async def stream(self, request):
+        started = time.perf_counter()
+        for offset_ms, chunk in self.chunks:
+            if self.speed:
+                delay = offset_ms / 1000 / self.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield self.deployment, chunk
+
+
+def _tool_results(turn, reply):
+    """Run the turn's tool calls through the handlers again; return `(seconds, mismatches)`"""
+    # Model tool calls were recorded in order by their handler; MCP calls carry their server
+    recorded = [call for call in turn.get("tool_calls", ()) if "server" not in call]
+    outcomes = []
+    mismatches = []
+    started = time.perf_counter()
+    for tool_call in reply["tool_calls"]:
+        try:
+            result = ticket_from_tool_call(tool_call)
+        except DecodeError as e:
+            outcomes.append({"error": str(e)})
+            continue
+        if result is not None:
+            outcomes.append({"result": result})
+    for call in turn.get("tool_calls", ()):
+        if "server" in call and execute_tool(call["server"], call["name"], call["arguments"]) != call.get("result"):
+            mismatches.append(f"tool {call['server']}/{call['name']} returned a different result")
+    elapsed = time.perf_counter() - started
+
+    expected = [{"error": call["error"]} if "error" in call else {"result": call.get("result")} for call in recorded]
+    if outcomes != expected:
+        mismatches.append("tool call results differ from the recording")
+    return elapsed, mismatches
+
+
+async def replay_turn(index, turn, catalogs, speed):
+    tools = catalogs.get(turn["tools"])
+    if tools is None:
+        return {"turn": index, "error": f"tool catalog {turn['tools']} is missing from the recording"}
+    settings = turn.get("settings", {})
+
+    started = time.perf_counter()
+    request = completion_request(turn["messages"], tools, turn.get("profile", {}), **settings)
+    built = time.perf_counter()
+
+    router = ReplayRouter(turn, speed)
+    content = []
+    first_delta = []
+    text = ""
+
+    def on_delta(delta):
+        nonlocal text
+        if not first_delta:
+            first_delta.append(time.perf_counter())
+        # What main()'s callback does before drawing: rebuild the text so far
+        content.append(delta)
+        text = "".join(content)
+
+    reply = await stream_reply(request, on_delta, router=router)
+    streamed = time.perf_counter()
+    tool_seconds, mismatches = _tool_results(turn, reply)
+    finished = time.perf_counter()
+
+    recorded_text = "".join(entry[1] for entry in turn["chunks"] if len(entry) > 1 and entry[1])
+    if reply["content"] != recorded_text:
+        mismatches.append("reply text differs from the recording")
+    attached = [tool["function"]["name"] for tool in request.get("tools", ())]
+    stream_ms = (streamed - built) * 1000
+    return {
+        "turn": index,
+        "source": turn.get("source"),
+        "messages": len(turn["messages"]),
+        "chunks": len(turn["chunks"]),
+        "build_ms": round((built - started) * 1000, 3),
+        "first_delta_ms": round((first_delta[0] - built) * 1000, 3) if first_delta else None,
+        "stream_ms": round(stream_ms, 3),
+        "overhead_ms": round(max(0.0, (finished - started) * 1000 - router.schedule_ms()), 3),
+        "tool_ms": round(tool_seconds * 1000, 3),
+        "recorded_total_ms": turn.get("total_ms"),
+        "recorded_render_ms": turn.get("render", {}),
+        "tools_changed": attached != turn.get("attached_tools", attached),
+        "mismatches": mismatches
+    }
+
+
+async def replay(turns, catalogs, speed, arrivals):
+    if not arrivals:
+        return [await replay_turn(index, turn, catalogs, speed) for index, turn in enumerate(turns)]
+
+    first_ts = turns[0]["ts"] if turns else 0.0
+    started = time.perf_counter()
+
+    async def at_arrival(index, turn):
+        if speed:
+            delay = (turn["ts"] - first_ts) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return await replay_turn(index, turn, catalogs, speed)
+
+    return list(await asyncio.gather(*(at_arrival(index, turn) for index, turn in enumerate(turns))))
+
+
+def summarize(results):
+    summary = {}
+    for metric in ("build_ms", "first_delta_ms", "overhead_ms", "tool_ms"):
+        values = sorted(result[metric] for result in results if result.get(metric) is not None)
+        summary[metric] = {
+            "mean": round(sum(values) / len(values), 3) if values else 0.0,
+            "p50": round(percentile(values, 0.50), 3),
+            "p99": round(percentile(values, 0.99), 3)
+        }
+    return summary
+
+
+def compare(summary, baseline_path, threshold):
+    """Print p50/p99 deltas of build time and overhead and return the regressions beyond `threshold`"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["summary"]
+
+    regressions = []
+    print(f"\nComparison against {baseline_path} (threshold {threshold:.0%}):")
+    for metric in ("build_ms", "overhead_ms"):
+        for stat in ("p50", "p99"):
+            previous = baseline.get(metric, {}).get(stat)
+            current = summary[metric][stat]
+            if not previous:
+                continue
+            delta = (current - previous) / previous
+            regressed = delta > threshold
+            print(f"  {metric:<12} {stat}  {previous:>9.3f} -> {current:>9.3f} ms  {delta:+7.1%}  {'REGRESSION' if regressed else 'ok'}")
+            if regressed:
+                regressions.append({"metric": metric, "stat": stat, "delta": round(delta, 4)})
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded chat turns offline")
+    parser.add_argument("recording", help="JSONL file written with TURN_RECORD_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed; 0 plays chunks without waiting")
+    parser.add_argument("--arrivals", action="store_true", help="Start turns at their recorded arrival times")
+    parser.add_argument("--limit", type=int, help="Replay only the first N turns")
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    parser.add_argument("--compare", help="Earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+    if args.speed < 0:
+        parser.error("--speed must not be negative")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    catalogs, turns, skipped = load_recording(args.recording)
+    if args.limit is not None:
+        turns = turns[:args.limit]
+    print(f"Replaying {len(turns)} turns from {args.recording} at speed {args.speed:g} ({skipped} without a request skipped)")
+
+    replay_started = time.perf_counter()
+    results = asyncio.run(replay(turns, catalogs, args.speed, args.arrivals))
+    elapsed = time.perf_counter() - replay_started
+
+    for result in results:
+        if "error" in result:
+            print(f"  turn {result['turn']:<4} {result['error']}")
+            continue
+        first_delta = f"{result['first_delta_ms']:>9.3f}" if result["first_delta_ms"] is not None else f"{'-':>9}"
+        notes = "; ".join(result["mismatches"] + (["attached tools changed"] if result["tools_changed"] else []))
+        print(
+            f"  turn {result['turn']:<4} build {result['build_ms']:>8.3f} ms  first text {first_delta} ms  "
+            f"overhead {result['overhead_ms']:>8.3f} ms  recorded {result['recorded_total_ms'] or 0:>9.1f} ms  {notes}"
+        )
+    replayed = [result for result in results if "error" not in result]
+    summary = summarize(replayed)
+    print(f"\nReplayed in {elapsed:.2f}s: " + ", ".join(
+        f"{metric} p50 {stats['p50']:.3f} / p99 {stats['p99']:.3f}" for metric, stats in summary.items()
+    ))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {
+                "recording": args.recording,
+                "speed": args.speed,
+                "arrivals": args.arrivals,
+                "limit": args.limit
+            }
+        },
+        "summary": summary,
+        "results": results
+    }
+
+    diverged = [result["turn"] for result in results if result.get("mismatches") or "error" in result]
+    report["diverged"] = diverged
+    if diverged:
+        print(f"\n{len(diverged)} turns no longer match their recording: {diverged[:20]}")
+    exit_code = 1 if diverged else 0
+    if args.compare:
+        report["regressions"] = compare(summary, args.compare, args.threshold)
+        exit_code = 1 if report["regressions"] or diverged else 0
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,28 @@
 #!/bin/bash
 
 # Start Demo MCP Servers
+#
+# Usage:
+#   scripts/start_demo_servers.sh                                  # all servers on one event loop
+#   scripts/start_demo_servers.sh --mode multi-process --workers 4 # N workers per server (SO_REUSEPORT)
+#   scripts/start_demo_servers.sh --servers memory,sqlite --ready-file /tmp/mcp.ready
 echo "🚀 Starting Demo MCP Servers..."
 
-# Start the demo servers in background
-python3 demo_mcp_servers.py &
+# Run from the project root so `src` is importable
+cd "$(dirname "$0")/.." || exit 1
 
-# Get the PID
-SERVER_PID=$!
-
-echo "Demo MCP servers started with PID: $SERVER_PID"
-echo "Servers running on ports: 3001, 3002, 3003, 3005"
+echo "Servers will listen on ports: 3001, 3002, 3003, 3004, 3005, 3006"
 echo ""
 echo "Available servers:"
 echo "  📁 Filesystem MCP (port 3001) - File operations"
-echo "  🔧 Git MCP (port 3002) - Git repository operations" 
+echo "  🔧 Git MCP (port 3002) - Git repository operations"
 echo "  🌐 Web Search MCP (port 3003) - Web search"
+echo "  🗄️ SQLite MCP (port 3004) - Database operations"
 echo "  💾 Memory MCP (port 3005) - Persistent memory"
+echo "  🔗 Fetch MCP (port 3006) - HTTP requests"
 echo ""
-echo "To stop servers: kill $SERVER_PID"
-echo "Or press Ctrl+C to stop this script"
+echo "The launcher prints READY once every server is listening."
+echo "Press Ctrl+C to stop all servers."
 
-# Wait for user to stop
-wait $SERVER_PID
+# exec so Ctrl+C and SIGTERM reach the launcher, which shuts everything down
+exec python3 -m src.core.server_launcher "$@"
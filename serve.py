@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Headless entry point: serves the chat pipeline over HTTP, SSE and WebSockets
+"""
+
+import sys
+import os
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from src.service.app import main
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 Configuration and constants for the Streamlit MCP application
 """
 
+import json
 import os
 from dotenv import load_dotenv
 
@@ -132,3 +133,56 @@ AZURE_OPENAI_CONFIG = {
     "api_version": os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
     "deployment_name": os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 }
+
+
+def _load_deployments():
+    """Deployments for the model router
+
+    AZURE_OPENAI_DEPLOYMENTS holds a JSON list of objects with
+    `deployment_name` and optionally `name`, `tier` ("fast" or "large"),
+    `region`, `endpoint`, `api_key` and `api_version`; missing connection
+    settings default to the AZURE_OPENAI_* values. Without it, the single
+    configured deployment is used, plus AZURE_OPENAI_FAST_DEPLOYMENT_NAME as
+    the fast tier when set.
+    """
+    defaults = {
+        "endpoint": AZURE_OPENAI_CONFIG["endpoint"],
+        "api_key": AZURE_OPENAI_CONFIG["api_key"],
+        "api_version": AZURE_OPENAI_CONFIG["api_version"]
+    }
+    configured = os.getenv("AZURE_OPENAI_DEPLOYMENTS")
+    if configured:
+        return [dict(defaults, **deployment) for deployment in json.loads(configured)]
+    deployments = []
+    if AZURE_OPENAI_CONFIG["deployment_name"]:
+        deployments.append(dict(defaults, deployment_name=AZURE_OPENAI_CONFIG["deployment_name"], tier="large"))
+    fast_deployment = os.getenv("AZURE_OPENAI_FAST_DEPLOYMENT_NAME")
+    if fast_deployment:
+        deployments.append(dict(defaults, deployment_name=fast_deployment, tier="fast"))
+    return deployments
+
+
+AZURE_OPENAI_DEPLOYMENTS = _load_deployments()
+
+# Tools attached to each chat request, ranked against the latest user messages
+TOOL_RETRIEVAL_CONFIG = {
+    # Ranked tools sent besides the pinned ones; 0 sends every tool
+    "top_k": int(os.getenv("TOOL_RETRIEVAL_TOP_K", "8")),
+    # Always sent: the built-in tools unless TOOL_RETRIEVAL_PINNED lists names
+    "pinned": [
+        name.strip() for name in os.getenv("TOOL_RETRIEVAL_PINNED", "").split(",") if name.strip()
+    ] or [tool["name"] for tool in BUILTIN_TOOLS],
+    # Blend in hashed n-gram embeddings to match paraphrases (needs numpy)
+    "vectors": os.getenv("TOOL_RETRIEVAL_VECTORS", "").lower() in ("1", "true", "yes")
+}
+
+# Speculative prefetch of task-card responses (opt-in)
+PREFETCH_CONFIG = {
+    "enabled": os.getenv("SPECULATIVE_PREFETCH", "").lower() in ("1", "true", "yes"),
+    # High-priority task cards warmed after each render
+    "top_k": int(os.getenv("PREFETCH_TOP_K", "2")),
+    # Tokens the prefetcher may spend per hour across all sessions
+    "token_budget": int(os.getenv("PREFETCH_TOKEN_BUDGET", "20000")),
+    # Seconds a prefetched answer stays valid
+    "ttl": float(os.getenv("PREFETCH_TTL", "120"))
+}
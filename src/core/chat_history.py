@@ -0,0 +1,241 @@
+"""
+Durable chat history keyed by user and conversation
+
+Messages are appended to SQLite and never rewritten. Bodies above
+`COMPRESS_THRESHOLD` bytes (typically tool outputs) are stored
+zlib-compressed. Sessions keep only a `ChatWindow` of recent messages in
+memory and page older ones in on demand, so a long conversation costs a
+bounded amount of memory and survives server restarts.
+"""
+
+import asyncio
+import time
+import zlib
+
+from src.core.serialization import dumps_str, loads
+from src.core.sqlite_pool import ConnectionPool, SerializedWriter
+
+# Message bodies at least this large are compressed before storing
+COMPRESS_THRESHOLD = 2048
+_MESSAGE_KEYS = ("id", "role", "content")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_email TEXT NOT NULL,
+    title TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations(user_email, updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id INTEGER NOT NULL REFERENCES conversations(id),
+    role TEXT NOT NULL,
+    content TEXT,
+    content_z BLOB,
+    extra TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id, id);
+"""
+
+
+def _encode_content(content):
+    data = content.encode("utf-8")
+    if len(data) >= COMPRESS_THRESHOLD:
+        compressed = zlib.compress(data, 6)
+        if len(compressed) < len(data):
+            return None, compressed
+    return content, None
+
+
+def _row_to_message(row):
+    message_id, role, content, content_z, extra = row
+    if content_z is not None:
+        content = zlib.decompress(content_z).decode("utf-8")
+    message = {"id": message_id, "role": role, "content": content}
+    if extra:
+        message.update(loads(extra))
+    return message
+
+
+class ChatHistoryStore:
+    """Append-only SQLite log of conversations and their messages"""
+
+    def __init__(self, path, read_pool_size=4):
+        self.path = path
+        self._writer = SerializedWriter(path, on_open=lambda conn: conn.executescript(_SCHEMA))
+        self._pool = ConnectionPool(path, size=read_pool_size)
+
+    def create_conversation(self, user_email, title="New conversation"):
+        def insert(conn):
+            now = time.time()
+            return conn.execute(
+                "INSERT INTO conversations (user_email, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (user_email, title, now, now)
+            ).lastrowid
+        return self._writer.execute(insert)
+
+    def list_conversations(self, user_email, limit=20):
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, title, created_at, updated_at FROM conversations "
+                "WHERE user_email = ? ORDER BY updated_at DESC LIMIT ?",
+                (user_email, limit)
+            ).fetchall()
+        return [
+            {"id": row[0], "title": row[1], "created_at": row[2], "updated_at": row[3]}
+            for row in rows
+        ]
+
+    def latest_conversation(self, user_email):
+        """Return the id of the user's most recently updated conversation, or None"""
+        conversations = self.list_conversations(user_email, limit=1)
+        return conversations[0]["id"] if conversations else None
+
+    def submit(self, conversation_id, message):
+        """Queue a message for appending and return a Future resolving to its id
+
+        Keys besides role and content (e.g. rendered ticket cards) are kept
+        alongside the message and returned with it.
+        """
+        content, content_z = _encode_content(message.get("content") or "")
+        extra = {key: value for key, value in message.items() if key not in _MESSAGE_KEYS}
+
+        def insert(conn):
+            now = time.time()
+            message_id = conn.execute(
+                "INSERT INTO messages (conversation_id, role, content, content_z, extra, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (conversation_id, message["role"], content, content_z, dumps_str(extra) if extra else None, now)
+            ).lastrowid
+            conn.execute("UPDATE conversations SET updated_at = ? WHERE id = ?", (now, conversation_id))
+            if message["role"] == "user":
+                # The first user message names the conversation
+                conn.execute(
+                    "UPDATE conversations SET title = ? WHERE id = ? AND title = 'New conversation'",
+                    ((message.get("content") or "")[:80], conversation_id)
+                )
+            return message_id
+
+        return self._writer.submit(insert)
+
+    def append(self, conversation_id, message):
+        return self.submit(conversation_id, message).result()
+
+    def recent(self, conversation_id, limit=50):
+        """Return the last `limit` messages in chronological order"""
+        return self.before(conversation_id, None, limit)
+
+    def before(self, conversation_id, before_id, limit=50):
+        """Return up to `limit` messages older than `before_id`, in chronological order"""
+        with self._pool.connection() as conn:
+            if before_id is None:
+                rows = conn.execute(
+                    "SELECT id, role, content, content_z, extra FROM messages "
+                    "WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+                    (conversation_id, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT id, role, content, content_z, extra FROM messages "
+                    "WHERE conversation_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                    (conversation_id, before_id, limit)
+                ).fetchall()
+        return [_row_to_message(row) for row in reversed(rows)]
+
+    def after(self, conversation_id, after_id, limit=200):
+        """Return up to `limit` messages newer than `after_id`, in chronological order"""
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, role, content, content_z, extra FROM messages "
+                "WHERE conversation_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (conversation_id, after_id or 0, limit)
+            ).fetchall()
+        return [_row_to_message(row) for row in rows]
+
+    def count(self, conversation_id):
+        with self._pool.connection() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation_id = ?", (conversation_id,)
+            ).fetchone()[0]
+
+    def close(self):
+        self._writer.close()
+        self._pool.close()
+
+
+class ChatWindow:
+    """The slice of one conversation a session holds in memory
+
+    `messages` starts with the most recent `page_size` messages and never
+    holds more than `max_messages`. Appending beyond that drops the oldest
+    loaded ones. `load_earlier` pages older messages back in from the store
+    and, once the window is full, drops the newest instead (`has_later`);
+    the next append or `load_latest` returns to the end of the conversation.
+    """
+
+    def __init__(self, store, conversation_id, page_size=50, max_messages=200):
+        self.store = store
+        self.conversation_id = conversation_id
+        self.page_size = page_size
+        self.max_messages = max_messages
+        self.messages = []
+        self.load_latest()
+
+    def load_latest(self):
+        """Hold the most recent `page_size` messages again, in the same list object"""
+        self.messages[:] = self.store.recent(self.conversation_id, self.page_size)
+        self.has_earlier = len(self.messages) == self.page_size
+        self.has_later = False
+
+    def append(self, message):
+        """Persist a message and add it to the window, returning the stored message"""
+        message = dict(message)
+        message["id"] = self.store.append(self.conversation_id, message)
+        return self._keep(message)
+
+    async def append_async(self, message):
+        """Like `append`, but awaits the write instead of blocking the event loop"""
+        message = dict(message)
+        message["id"] = await asyncio.wrap_future(self.store.submit(self.conversation_id, message))
+        return self._keep(message)
+
+    def _keep(self, message):
+        if self.has_later:
+            self.load_latest()
+            # The reload already read the message if it was just stored
+            if self.messages and self.messages[-1]["id"] >= message["id"]:
+                return message
+        self.messages.append(message)
+        if len(self.messages) > self.max_messages:
+            del self.messages[:len(self.messages) - self.max_messages]
+            self.has_earlier = True
+        return message
+
+    def refresh(self):
+        """Add messages appended by other processes since the newest one held; return how many"""
+        if self.has_later:
+            self.load_latest()
+            return len(self.messages)
+        newest_id = self.messages[-1]["id"] if self.messages else None
+        newer = self.store.after(self.conversation_id, newest_id, self.max_messages)
+        for message in newer:
+            self._keep(message)
+        return len(newer)
+
+    def load_earlier(self, count=None):
+        """Page in up to `count` older messages and return how many were loaded"""
+        if not self.has_earlier:
+            return 0
+        count = count or self.page_size
+        oldest_id = self.messages[0]["id"] if self.messages else None
+        earlier = self.store.before(self.conversation_id, oldest_id, count)
+        self.has_earlier = len(earlier) == count
+        self.messages[:0] = earlier
+        overflow = len(self.messages) - self.max_messages
+        if overflow > 0:
+            del self.messages[-overflow:]
+            self.has_later = True
+        return len(earlier)
@@ -0,0 +1,243 @@
+"""
+The chat turn pipeline, independent of the UI
+
+Builds chat completion requests, streams replies through the model router
+and turns tool calls into results. It holds no session state, so the
+Streamlit handlers and the headless service share it; each passes in the
+messages, tools, profile and settings of its own session.
+"""
+
+import asyncio
+import inspect
+import threading
+import time
+from types import SimpleNamespace
+
+from src.config.config import AZURE_OPENAI_DEPLOYMENTS, SYSTEM_PROMPT
+from src.core.model_router import Deployment, ModelRouter
+from src.core.serialization import DecodeError, LinearTicket, decode_as, digest, tool_schemas
+from src.core.single_flight import FlightAborted, SingleFlight
+from src.core.tool_retriever import get_tool_retriever, retrieval_query
+from src.core.turn_recorder import current_turn
+
+# Generation parameters used until a session sets its own
+DEFAULT_MAX_TOKENS = 2000
+DEFAULT_TEMPERATURE = 0.7
+# Most recent conversation messages sent with each request
+CONTEXT_MESSAGES = 40
+
+_router = None
+_router_lock = threading.Lock()
+# Identical requests in flight at the same time share one upstream stream
+_replies = SingleFlight()
+
+
+def create_router(**options):
+    """Build a model router over the configured deployments, or None when there are none"""
+    if not AZURE_OPENAI_DEPLOYMENTS:
+        return None
+    return ModelRouter([Deployment.from_config(config) for config in AZURE_OPENAI_DEPLOYMENTS], **options)
+
+
+def get_router():
+    """Return the process-wide model router, or None when no deployment is configured"""
+    global _router
+    if _router is None and AZURE_OPENAI_DEPLOYMENTS:
+        with _router_lock:
+            if _router is None:
+                _router = create_router()
+    return _router
+
+
+def api_messages(messages):
+    """Strip stored metadata so messages can be sent to the chat completions API"""
+    return [{"role": message["role"], "content": message["content"]} for message in messages]
+
+
+def recent_context(messages, limit=CONTEXT_MESSAGES):
+    """The last `limit` messages, starting at a user message when the slice has one"""
+    recent = messages[-limit:]
+    for index, message in enumerate(recent):
+        if message["role"] == "user":
+            return recent[index:]
+    return recent
+
+
+def role_context(profile):
+    """System message describing the user, role-wide facts first"""
+    permissions = ", ".join(sorted(profile.get("permissions", []))) or "none"
+    return (
+        f"The user's role is {profile.get('role', 'user')} with permissions: {permissions}.\n"
+        f"The user is {profile.get('name', 'Guest User')} <{profile.get('email') or 'guest'}>"
+        f" on the {profile.get('team') or 'unassigned'} team."
+    )
+
+
+def completion_request(messages, tools, profile, max_tokens=DEFAULT_MAX_TOKENS, temperature=DEFAULT_TEMPERATURE):
+    """Chat completion arguments for `messages`
+
+    The request starts with a prefix that is identical across turns and, up to
+    the role context, across users: the system prompt, the tools sorted by name
+    with canonical key order, then the user's role context. Providers cache
+    prompt prefixes, so only the conversation after it has to be processed
+    anew. The model is left out; the router picks the deployment.
+
+    Only the tools relevant to the latest user messages are attached (see
+    `ToolRetriever`), so the prefix is shared by turns that need the same
+    tools. Only the last `CONTEXT_MESSAGES` messages are sent, however much
+    history the caller has loaded.
+    """
+    messages = recent_context(messages)
+    available = tools
+    catalog = digest(available)
+    tools = get_tool_retriever().select(available, retrieval_query(messages), key=catalog)
+    # Converted and sorted once per distinct tool set instead of on every request
+    tools = tool_schemas.canonical_tools(tools, key=catalog if tools is available else None)
+    prefix = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": role_context(profile)}
+    ]
+    request = {
+        "messages": prefix + messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    if tools:
+        request["tools"] = tools
+        request["tool_choice"] = "auto"
+    turn = current_turn()
+    if turn is not None:
+        turn.set_request(messages, available, profile, max_tokens, temperature, request, catalog)
+    return request
+
+
+async def stream_reply(request, on_delta=None, router=None):
+    """Stream a completion, calling `on_delta(text)` for each piece of content
+
+    `on_delta` may be a coroutine function. Returns `{"content",
+    "tool_calls", "deployment", "usage"}`; tool call fragments are joined per
+    call index so their arguments are complete JSON.
+
+    While an identical request is already streaming, in this or another
+    session, the reply is read from that stream instead of a second call.
+    """
+    router = router or get_router()
+    if router is None:
+        raise RuntimeError("No Azure OpenAI deployment is configured")
+    content = []
+    tool_calls = {}
+    deployment_name = None
+    usage = None
+    turn = current_turn()
+    while True:
+        chunks = _replies.stream((id(router), digest(request)), lambda: router.stream(request))
+        if turn is not None:
+            turn.stream_started()
+        try:
+            async for deployment, chunk in chunks:
+                if turn is not None:
+                    turn.chunk(deployment, chunk)
+                deployment_name = deployment.name
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    # Azure sends content filter results and the final usage in choice-less chunks
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content.append(delta.content)
+                    if on_delta is not None:
+                        rendered = time.perf_counter()
+                        result = on_delta(delta.content)
+                        if inspect.isawaitable(result):
+                            await result
+                        if turn is not None:
+                            turn.render("deltas", time.perf_counter() - rendered)
+                for tool_call in delta.tool_calls or ():
+                    call = tool_calls.setdefault(tool_call.index, {"name": "", "arguments": []})
+                    if tool_call.function is not None:
+                        if tool_call.function.name:
+                            call["name"] = tool_call.function.name
+                        if tool_call.function.arguments:
+                            call["arguments"].append(tool_call.function.arguments)
+        except FlightAborted:
+            if deployment_name is not None:
+                raise
+            # The session that started the shared stream left before it began; start over
+            continue
+        finally:
+            # Lets other sessions sharing this stream know right away if this one stops early
+            await chunks.aclose()
+        break
+    return {
+        "content": "".join(content),
+        "tool_calls": [
+            SimpleNamespace(function=SimpleNamespace(name=call["name"], arguments="".join(call["arguments"])))
+            for _, call in sorted(tool_calls.items())
+        ],
+        "deployment": deployment_name,
+        "usage": usage_summary(usage)
+    }
+
+
+def usage_summary(usage):
+    """Token counts of a response, including prompt tokens served from the provider's cache"""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "completion_tokens": usage.completion_tokens
+    }
+
+
+def prompt_cache_stats(router=None):
+    """Prompt tokens sent and served from the provider's prompt cache, over all deployments"""
+    router = router or get_router()
+    deployments = router.stats() if router is not None else []
+    return {
+        "prompt_tokens": sum(stats["prompt_tokens"] for stats in deployments),
+        "cached_tokens": sum(stats["cached_tokens"] for stats in deployments)
+    }
+
+
+def complete_chat(request):
+    """Run a non-streaming completion and return `(reply, total_tokens)`
+
+    Safe to call off the script thread: it uses no session state.
+    """
+    deployment, response = asyncio.run(get_router().complete(request))
+    message = response.choices[0].message
+    reply = {
+        "content": message.content or "",
+        "tool_calls": list(message.tool_calls or []),
+        "deployment": deployment.name,
+        "usage": usage_summary(response.usage)
+    }
+    return reply, response.usage.total_tokens if response.usage else 0
+
+
+def ticket_from_tool_call(tool_call):
+    """Return the ticket a `show_linear_ticket` call displays, or None for other tools
+
+    Raises `DecodeError` when the arguments are not a valid ticket.
+    """
+    name, arguments = tool_call.function.name, tool_call.function.arguments
+    if name != "show_linear_ticket":
+        return None
+    turn = current_turn()
+    started = time.perf_counter()
+    try:
+        ticket = decode_as(arguments, LinearTicket)
+    except DecodeError as e:
+        if turn is not None:
+            turn.tool_call(name, arguments, error=str(e), seconds=time.perf_counter() - started)
+        raise
+    result = {
+        "title": ticket.title, "status": ticket.status, "assignee": ticket.assignee,
+        "deadline": ticket.deadline, "tags": ticket.tags
+    }
+    if turn is not None:
+        turn.tool_call(name, arguments, result=result, seconds=time.perf_counter() - started)
+    return result
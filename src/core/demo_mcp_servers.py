@@ -5,26 +5,150 @@ These are simplified implementations of common MCP servers
 """
 
 import asyncio
-import json
 import os
+import re
 import sqlite3
 import subprocess
 import sys
-from datetime import datetime
+import threading
+import time
 from pathlib import Path
 
+from src.core.git_history import GitHistoryIndex
+from src.core.http_client import CachingHTTPClient
+from src.core.memory_store import InMemoryMemoryStore, SQLiteMemoryStore
+from src.core.search_corpus import DocumentCorpus
+from src.core.serialization import DecodeError, Fragment, dumps, dumps_str, loads
+from src.core.sqlite_pool import ConnectionPool, SerializedWriter
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+PROTOCOL_VERSION = "2024-11-05"
+# Largest single JSON-RPC message accepted on a connection
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+# Statements that would end or nest the SQLite writer's shared transaction
+_TRANSACTION_CONTROL_RE = re.compile(
+    r"^\s*(?:(?:--[^\n]*(?:\n|$)|/\*.*?\*/)\s*)*(?:BEGIN|COMMIT|END|ROLLBACK|SAVEPOINT|RELEASE)\b",
+    re.IGNORECASE | re.DOTALL
+)
+
 # Simple MCP server implementations
 class DemoMCPServer:
     def __init__(self, name, port):
         self.name = name
         self.port = port
         self.tools = []
+        self.server = None
+        # Worker processes serving this server's port; set by the launcher
+        self.workers = 1
+        self._tools_list_cache = None
     
-    async def start(self):
-        print(f"Starting {self.name} on port {self.port}")
-        # In a real implementation, this would start an MCP server
-        # For demo purposes, we'll just simulate the server running
+    async def start(self, host="127.0.0.1", port=None, reuse_port=False):
+        """Listen for newline-delimited JSON-RPC messages on a TCP port"""
+        print(f"Starting {self.name} on port {port or self.port}")
+        self.server = await asyncio.start_server(
+            self._handle_connection, host, port or self.port,
+            reuse_port=reuse_port or None, limit=MAX_MESSAGE_BYTES
+        )
         return True
+    
+    async def stop(self):
+        """Stop accepting connections and release server resources"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        self.close()
+    
+    def close(self):
+        pass
+    
+    def tools_list_result(self):
+        """Return the `tools/list` result, encoded once until `self.tools` changes"""
+        key = tuple(map(id, self.tools))
+        cached = self._tools_list_cache
+        if cached is None or cached[0] != key:
+            result = {"tools": [
+                {"name": tool["name"], "description": tool["description"], "inputSchema": tool["input_schema"]}
+                for tool in self.tools
+            ]}
+            cached = self._tools_list_cache = (key, Fragment(dumps(result), result))
+        return cached[1]
+    
+    async def handle_message(self, message):
+        """Handle one JSON-RPC request and return the response, or None for notifications"""
+        method = message.get("method")
+        params = message.get("params") or {}
+        try:
+            if method == "initialize":
+                result = {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "serverInfo": {"name": self.name, "version": "1.0.0"},
+                    "capabilities": {"tools": {}}
+                }
+            elif method == "ping":
+                result = {}
+            elif method == "tools/list":
+                result = self.tools_list_result()
+            elif method == "tools/call":
+                output = await self.execute_tool(params.get("name"), params.get("arguments") or {})
+                if output is None:
+                    raise LookupError(f"Unknown tool: {params.get('name')}")
+                result = {
+                    "content": [{"type": "text", "text": dumps_str(output)}],
+                    "isError": not output.get("success", True)
+                }
+            else:
+                raise LookupError(f"Method not found: {method}")
+            response = {"jsonrpc": "2.0", "id": message.get("id"), "result": result}
+        except LookupError as e:
+            response = {"jsonrpc": "2.0", "id": message.get("id"), "error": {"code": -32601, "message": str(e)}}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": message.get("id"), "error": {"code": -32603, "message": str(e)}}
+        return response if "id" in message else None
+    
+    async def _handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        pending = set()
+        
+        async def respond(message):
+            response = await self.handle_message(message)
+            if response is not None:
+                async with write_lock:
+                    writer.write(dumps(response) + b"\n")
+                    await writer.drain()
+        
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    message = loads(line)
+                except DecodeError as e:
+                    error = {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": str(e)}}
+                    async with write_lock:
+                        writer.write(dumps(error) + b"\n")
+                    continue
+                # Requests on one connection run concurrently and reply by id
+                task = asyncio.create_task(respond(message))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # The server is shutting down with this client still connected. Ending the
+            # handler normally, rather than cancelled, keeps asyncio's stream callback
+            # from logging the cancellation as an error (Python < 3.12).
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
 
 class FilesystemMCPServer(DemoMCPServer):
     def __init__(self):
@@ -107,8 +231,87 @@ class GitMCPServer(DemoMCPServer):
                     "properties": {"path": {"type": "string"}, "limit": {"type": "integer"}},
                     "required": ["path"]
                 }
+            },
+            {
+                "name": "git_index_history",
+                "description": "Incrementally index commit history for analytics",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"path": {"type": "string"}},
+                    "required": ["path"]
+                }
+            },
+            {
+                "name": "git_commit_activity",
+                "description": "Get commits per week per author from the history index",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "author": {"type": "string"},
+                        "since_days": {"type": "integer"}
+                    },
+                    "required": ["path"]
+                }
+            },
+            {
+                "name": "git_hot_files",
+                "description": "Get the most frequently changed files from the history index",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "limit": {"type": "integer"},
+                        "since_days": {"type": "integer"}
+                    },
+                    "required": ["path"]
+                }
+            },
+            {
+                "name": "git_author_stats",
+                "description": "Get per-author commit and churn totals from the history index",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "limit": {"type": "integer"},
+                        "since_days": {"type": "integer"}
+                    },
+                    "required": ["path"]
+                }
             }
         ]
+        self.history_indexes = {}
+        self._history_lock = threading.Lock()
+    
+    def get_history_index(self, path):
+        """Return the history index for a repository, opening it on first use"""
+        repo_path = os.path.abspath(path)
+        with self._history_lock:
+            index = self.history_indexes.get(repo_path)
+            if index is None:
+                index = GitHistoryIndex(repo_path)
+                self.history_indexes[repo_path] = index
+        return index
+    
+    def _with_index(self, path, query):
+        """Bring a repository's history index up to date and return `(ingest stats, query(index))`
+
+        Runs `git log` and SQLite writes; call it in a worker thread.
+        """
+        index = self.get_history_index(path)
+        stats = index.ingest()
+        return stats, query(index)
+    
+    @staticmethod
+    def _since(arguments):
+        """Start of the `since_days` window as a Unix time, or None for all history"""
+        since_days = arguments.get("since_days")
+        if since_days is None:
+            return None
+        if isinstance(since_days, bool) or not isinstance(since_days, int) or since_days < 0:
+            raise ValueError(f"since_days must be a non-negative integer, got {since_days!r}")
+        return int(time.time()) - since_days * 86400 if since_days else None
     
     async def execute_tool(self, tool_name, arguments):
         path = arguments.get("path", ".")
@@ -129,10 +332,52 @@ class GitMCPServer(DemoMCPServer):
                 return {"log": result.stdout, "success": True}
             except Exception as e:
                 return {"error": str(e), "success": False}
+        
+        elif tool_name == "git_index_history":
+            try:
+                stats, summary = await asyncio.to_thread(self._with_index, path, GitHistoryIndex.summary)
+                return {"index": stats, "summary": summary, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "git_commit_activity":
+            try:
+                since = self._since(arguments)
+                _, activity = await asyncio.to_thread(
+                    self._with_index, path,
+                    lambda index: index.commits_per_week(author=arguments.get("author"), since=since)
+                )
+                return {"activity": activity, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "git_hot_files":
+            try:
+                since = self._since(arguments)
+                _, files = await asyncio.to_thread(
+                    self._with_index, path, lambda index: index.hot_files(limit=arguments.get("limit", 10), since=since)
+                )
+                return {"files": files, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "git_author_stats":
+            try:
+                since = self._since(arguments)
+                _, authors = await asyncio.to_thread(
+                    self._with_index, path, lambda index: index.author_stats(limit=arguments.get("limit", 10), since=since)
+                )
+                return {"authors": authors, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
 
 class WebSearchMCPServer(DemoMCPServer):
-    def __init__(self):
+    def __init__(self, corpus_dir=None):
         super().__init__("Web Search MCP", 3003)
+        self.corpus_dir = corpus_dir or os.getenv("WEB_SEARCH_CORPUS_DIR", str(PROJECT_ROOT / "docs"))
+        self.corpus = DocumentCorpus()
+        self._ingested = False
+        self._ingest_lock = threading.Lock()
         self.tools = [
             {
                 "name": "search_web",
@@ -142,34 +387,421 @@ class WebSearchMCPServer(DemoMCPServer):
                     "properties": {"query": {"type": "string"}, "max_results": {"type": "integer"}},
                     "required": ["query"]
                 }
+            },
+            {
+                "name": "index_documents",
+                "description": "Add HTML, Markdown or text documents to the search corpus",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"path": {"type": "string"}},
+                    "required": ["path"]
+                }
             }
         ]
     
+    def ensure_corpus(self):
+        """Index the configured corpus directory on first use
+
+        Reads and indexes files; call it in a worker thread.
+        """
+        if not self._ingested:
+            with self._ingest_lock:
+                if not self._ingested:
+                    if os.path.exists(self.corpus_dir):
+                        self.corpus.ingest(self.corpus_dir)
+                    self._ingested = True
+        return self.corpus
+    
     async def execute_tool(self, tool_name, arguments):
         if tool_name == "search_web":
             query = arguments.get("query")
             max_results = arguments.get("max_results", 5)
-            
-            # Simulate web search results
-            results = [
-                {
-                    "title": f"Search result 1 for '{query}'",
-                    "url": f"https://example.com/result1",
-                    "snippet": f"This is a simulated search result for '{query}'"
-                },
-                {
-                    "title": f"Search result 2 for '{query}'", 
-                    "url": f"https://example.com/result2",
-                    "snippet": f"Another simulated result for '{query}'"
+            try:
+                corpus = await asyncio.to_thread(self.ensure_corpus)
+                results, cached = await asyncio.to_thread(corpus.search, query, max_results)
+                return {"results": results, "cached": cached, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "index_documents":
+            path = arguments.get("path")
+            try:
+                corpus = await asyncio.to_thread(self.ensure_corpus)
+                stats = await asyncio.to_thread(corpus.ingest, path)
+                return {"index": stats, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
+
+class SQLiteMCPServer(DemoMCPServer):
+    DEFAULT_BATCH_SIZE = 200
+    DEFAULT_MAX_ROWS = 10_000
+    DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+    CURSOR_IDLE_TIMEOUT = 60
+    
+    def __init__(self, db_path=None, read_pool_size=4, max_open_cursors=None):
+        super().__init__("SQLite MCP", 3004)
+        self.db_path = db_path or os.getenv("SQLITE_MCP_DB_PATH", "sqlite_mcp.sqlite3")
+        self.read_pool_size = read_pool_size
+        # Keep at least one pooled connection free for new queries
+        self.max_open_cursors = max_open_cursors or max(1, read_pool_size - 1)
+        self._readers = None
+        self._writer = None
+        self._open_lock = threading.Lock()
+        self._cursors = {}
+        self._next_cursor = 1
+        self._cursor_lock = threading.Lock()
+        self.tools = [
+            {
+                "name": "query",
+                "description": "Run a read-only SQL query and return the first batch of rows",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "sql": {"type": "string"},
+                        "params": {"type": "array"},
+                        "batch_size": {"type": "integer"},
+                        "max_rows": {"type": "integer"},
+                        "max_bytes": {"type": "integer"}
+                    },
+                    "required": ["sql"]
+                }
+            },
+            {
+                "name": "fetch_rows",
+                "description": "Fetch the next batch of rows from an open query cursor",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"cursor": {"type": "integer"}, "batch_size": {"type": "integer"}},
+                    "required": ["cursor"]
+                }
+            },
+            {
+                "name": "close_cursor",
+                "description": "Close an open query cursor",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"cursor": {"type": "integer"}},
+                    "required": ["cursor"]
                 }
+            },
+            {
+                "name": "execute",
+                "description": "Run a SQL statement that modifies the database",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"sql": {"type": "string"}, "params": {"type": "array"}},
+                    "required": ["sql"]
+                }
+            },
+            {
+                "name": "list_tables",
+                "description": "List tables and views in the database",
+                "input_schema": {"type": "object", "properties": {}}
+            },
+            {
+                "name": "describe",
+                "description": "Describe the columns of a table",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"table": {"type": "string"}},
+                    "required": ["table"]
+                }
+            }
+        ]
+    
+    def _open(self):
+        """Open the writer and read pool on first use"""
+        if self._readers is None:
+            with self._open_lock:
+                if self._readers is None:
+                    # The writer creates the database file before read-only connections open it
+                    self._writer = SerializedWriter(self.db_path)
+                    self._readers = ConnectionPool(self.db_path, size=self.read_pool_size)
+    
+    @property
+    def readers(self):
+        self._open()
+        return self._readers
+    
+    @staticmethod
+    def _row_size(row):
+        size = 0
+        for value in row:
+            if isinstance(value, (str, bytes)):
+                size += len(value)
+            else:
+                size += 8
+        return size
+    
+    def _expire_cursors(self):
+        now = time.monotonic()
+        with self._cursor_lock:
+            expired = [
+                cursor_id for cursor_id, state in self._cursors.items()
+                if now - state["last_used"] > self.CURSOR_IDLE_TIMEOUT
             ]
+            if len(self._cursors) - len(expired) >= self.max_open_cursors:
+                # Reclaim the least recently used cursor to free a connection
+                live = sorted(
+                    (state["last_used"], cursor_id) for cursor_id, state in self._cursors.items()
+                    if cursor_id not in expired
+                )
+                expired.append(live[0][1])
+            states = [self._cursors.pop(cursor_id) for cursor_id in expired]
+        for state in states:
+            self._release_cursor(state)
+    
+    def _release_cursor(self, state):
+        state["cursor"].close()
+        self.readers.release(state["conn"])
+    
+    def _next_batch(self, state, batch_size):
+        """Read one batch from a cursor, honouring its row and byte caps"""
+        rows = []
+        limit = min(batch_size, state["max_rows"] - state["rows_sent"])
+        exhausted = False
+        truncated = False
+        while len(rows) < limit:
+            row = state["cursor"].fetchone()
+            if row is None:
+                exhausted = True
+                break
+            size = self._row_size(row)
+            if state["bytes_sent"] + size > state["max_bytes"]:
+                truncated = True
+                break
+            state["bytes_sent"] += size
+            rows.append(list(row))
+        state["rows_sent"] += len(rows)
+        if not exhausted and not truncated and state["rows_sent"] >= state["max_rows"]:
+            # Peek so a result set of exactly max_rows is not reported as truncated
+            truncated = state["cursor"].fetchone() is not None
+            exhausted = not truncated
+        state["last_used"] = time.monotonic()
+        return rows, exhausted or truncated, truncated
+    
+    def _query(self, sql, params, batch_size, max_rows, max_bytes):
+        self._expire_cursors()
+        conn = self.readers.acquire(timeout=30)
+        try:
+            cursor = conn.execute(sql, params)
+        except Exception:
+            self.readers.release(conn)
+            raise
+        state = {
+            "conn": conn,
+            "cursor": cursor,
+            "columns": [column[0] for column in cursor.description or []],
+            "rows_sent": 0,
+            "bytes_sent": 0,
+            "max_rows": max_rows,
+            "max_bytes": max_bytes,
+            "last_used": time.monotonic()
+        }
+        rows, done, truncated = self._next_batch(state, batch_size)
+        cursor_id = None
+        if done:
+            self._release_cursor(state)
+        else:
+            with self._cursor_lock:
+                cursor_id = self._next_cursor
+                self._next_cursor += 1
+                self._cursors[cursor_id] = state
+        return {"columns": state["columns"], "rows": rows, "cursor": cursor_id, "truncated": truncated}
+    
+    def _fetch(self, cursor_id, batch_size):
+        with self._cursor_lock:
+            state = self._cursors.pop(cursor_id, None)
+        if state is None:
+            raise ValueError(f"Cursor {cursor_id} is closed or expired")
+        try:
+            rows, done, truncated = self._next_batch(state, batch_size)
+        except Exception:
+            self._release_cursor(state)
+            raise
+        if done:
+            self._release_cursor(state)
+            cursor_id = None
+        else:
+            with self._cursor_lock:
+                self._cursors[cursor_id] = state
+        return {"columns": state["columns"], "rows": rows, "cursor": cursor_id, "truncated": truncated}
+    
+    def _close_cursor(self, cursor_id):
+        with self._cursor_lock:
+            state = self._cursors.pop(cursor_id, None)
+        if state is None:
+            return False
+        self._release_cursor(state)
+        return True
+    
+    def close(self):
+        with self._cursor_lock:
+            states = list(self._cursors.values())
+            self._cursors.clear()
+        for state in states:
+            self._release_cursor(state)
+        with self._open_lock:
+            if self._readers is not None:
+                self._writer.close()
+                self._readers.close()
+                self._readers = None
+                self._writer = None
+    
+    def _read(self, sql, params=()):
+        with self.readers.connection(timeout=30) as conn:
+            return conn.execute(sql, params).fetchall()
+    
+    async def execute_tool(self, tool_name, arguments):
+        if tool_name == "query":
+            try:
+                result = await asyncio.to_thread(
+                    self._query,
+                    arguments.get("sql"),
+                    arguments.get("params", []),
+                    arguments.get("batch_size", self.DEFAULT_BATCH_SIZE),
+                    arguments.get("max_rows", self.DEFAULT_MAX_ROWS),
+                    arguments.get("max_bytes", self.DEFAULT_MAX_BYTES)
+                )
+                return dict(result, success=True)
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "fetch_rows":
+            try:
+                result = await asyncio.to_thread(
+                    self._fetch, arguments.get("cursor"), arguments.get("batch_size", self.DEFAULT_BATCH_SIZE)
+                )
+                return dict(result, success=True)
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "close_cursor":
+            closed = await asyncio.to_thread(self._close_cursor, arguments.get("cursor"))
+            return {"closed": closed, "success": True}
+        
+        elif tool_name == "execute":
+            sql = arguments.get("sql")
+            params = arguments.get("params", [])
             
-            return {"results": results[:max_results], "success": True}
+            def run(conn):
+                cursor = conn.execute(sql, params)
+                return {"rowcount": cursor.rowcount, "lastrowid": cursor.lastrowid}
+            
+            if not isinstance(sql, str) or _TRANSACTION_CONTROL_RE.match(sql):
+                return {
+                    "error": "execute takes one data or schema statement; transactions are managed by the server",
+                    "success": False
+                }
+            try:
+                self._open()
+                result = await asyncio.wrap_future(self._writer.submit(run))
+                return dict(result, success=True)
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "list_tables":
+            try:
+                rows = await asyncio.to_thread(
+                    self._read,
+                    "SELECT name, type FROM sqlite_master "
+                    "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' ORDER BY name"
+                )
+                return {"tables": [{"name": name, "type": kind} for name, kind in rows], "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "describe":
+            table = arguments.get("table")
+            try:
+                rows = await asyncio.to_thread(
+                    self._read,
+                    "SELECT name, type, \"notnull\", dflt_value, pk FROM pragma_table_info(?)",
+                    (table,)
+                )
+                if not rows:
+                    return {"error": f"Table '{table}' not found", "success": False}
+                columns = [
+                    {"name": name, "type": kind, "not_null": bool(not_null), "default": default, "primary_key": bool(pk)}
+                    for name, kind, not_null, default, pk in rows
+                ]
+                return {"table": table, "columns": columns, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
+
+class FetchMCPServer(DemoMCPServer):
+    def __init__(self, per_host_limit=4, max_bytes=1024 * 1024):
+        super().__init__("Fetch MCP", 3006)
+        self.client = CachingHTTPClient(per_host_limit=per_host_limit, default_max_bytes=max_bytes)
+        self.tools = [
+            {
+                "name": "http_request",
+                "description": "Make an HTTP request, served from the response cache when fresh",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "url": {"type": "string"},
+                        "method": {"type": "string"},
+                        "headers": {"type": "object"},
+                        "body": {"type": "string"},
+                        "max_bytes": {"type": "integer"},
+                        "timeout": {"type": "number"}
+                    },
+                    "required": ["url"]
+                }
+            },
+            {
+                "name": "http_cache_stats",
+                "description": "Get HTTP response cache statistics",
+                "input_schema": {"type": "object", "properties": {}}
+            }
+        ]
+    
+    def close(self):
+        self.client.close()
+    
+    async def execute_tool(self, tool_name, arguments):
+        if tool_name == "http_request":
+            try:
+                response = await asyncio.to_thread(
+                    self.client.request,
+                    arguments.get("method", "GET"),
+                    arguments.get("url"),
+                    headers=arguments.get("headers"),
+                    body=arguments.get("body"),
+                    max_bytes=arguments.get("max_bytes"),
+                    timeout=arguments.get("timeout")
+                )
+                return {"response": response, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
+        
+        elif tool_name == "http_cache_stats":
+            cache = self.client.cache
+            return {
+                "cache": dict(cache.stats, entries=len(cache), bytes=cache.size, max_bytes=cache.max_bytes),
+                "success": True
+            }
 
 class MemoryMCPServer(DemoMCPServer):
-    def __init__(self):
+    # Above this many vectors, semantic search probes an IVF coarse index
+    IVF_THRESHOLD = 200_000
+    IVF_NPROBE = 8
+    VECTOR_FLUSH_INTERVAL = 1024
+    
+    def __init__(self, store=None, db_path=None, embedder=None):
         super().__init__("Memory MCP", 3005)
-        self.memories = []
+        self.db_path = db_path or os.getenv("MEMORY_MCP_DB_PATH", "memory_mcp.sqlite3")
+        self._store = store
+        self._embedder = embedder
+        self._vectors = None
+        self._vectors_lock = threading.Lock()
+        # Ids evicted while the vector index is being built, removed once it is published
+        self._evicted_during_build = None
+        self._evicted_lock = threading.Lock()
+        # Every memory up to this id has been read from the store into the vector index
+        self._synced_id = 0
+        self._unflushed_vectors = 0
         self.tools = [
             {
                 "name": "create_memory",
@@ -185,60 +817,196 @@ class MemoryMCPServer(DemoMCPServer):
                 "description": "Search existing memories",
                 "input_schema": {
                     "type": "object",
-                    "properties": {"query": {"type": "string"}},
+                    "properties": {
+                        "query": {"type": "string"},
+                        "tags": {"type": "array", "items": {"type": "string"}},
+                        "limit": {"type": "integer"},
+                        "offset": {"type": "integer"},
+                        "mode": {"type": "string", "enum": ["keyword", "semantic"]}
+                    },
                     "required": ["query"]
                 }
             }
         ]
     
+    @property
+    def store(self):
+        """Open the configured storage backend on first use"""
+        if self._store is None:
+            if self.db_path == ":memory:":
+                max_memories = os.getenv("MEMORY_MCP_MAX_MEMORIES")
+                max_bytes = os.getenv("MEMORY_MCP_MAX_BYTES")
+                self._store = InMemoryMemoryStore(
+                    max_memories=int(max_memories) if max_memories else None,
+                    max_bytes=int(max_bytes) if max_bytes else None,
+                    eviction_policy=os.getenv("MEMORY_MCP_EVICTION", "lru")
+                )
+                self._store.add_eviction_listener(self._on_evicted)
+            else:
+                self._store = SQLiteMemoryStore(self.db_path)
+        return self._store
+    
+    @property
+    def vectors(self):
+        """Open the semantic vector index on first use and catch up with the store"""
+        if self._vectors is None:
+            with self._vectors_lock:
+                if self._vectors is None:
+                    self._build_vectors()
+        return self._vectors
+    
+    def _build_vectors(self):
+        from src.core.embeddings import HashedNgramEmbedder, VectorIndex
+        
+        if self._embedder is None:
+            self._embedder = HashedNgramEmbedder()
+        # The memory map is not safe to share, so with several workers each keeps its index in memory
+        persistent = (
+            self.db_path != ":memory:" and not isinstance(self.store, InMemoryMemoryStore) and self.workers == 1
+        )
+        vectors = VectorIndex(self._embedder.dim, path=f"{self.db_path}.vectors" if persistent else None)
+        self._synced_id = vectors.max_id
+        with self._evicted_lock:
+            self._evicted_during_build = set()
+        self._catch_up(vectors)
+        if self.IVF_THRESHOLD is not None and len(vectors) > self.IVF_THRESHOLD:
+            vectors.build_ivf()
+        with self._evicted_lock:
+            self._vectors = vectors
+            evicted, self._evicted_during_build = self._evicted_during_build, None
+        for memory_id in evicted:
+            vectors.remove(memory_id)
+        # Memories created while the index was built were not embedded by create_memory
+        self._catch_up(vectors)
+        vectors.flush()
+    
+    def _catch_up(self, vectors):
+        """Embed the memories stored since the last catch-up
+
+        Tracks the newest id read from the store rather than the newest id in
+        the index: with several workers, a memory this worker embedded can be
+        newer than ones other workers stored in the meantime.
+        """
+        batch = []
+        synced_id = self._synced_id
+        for memory in self.store.iter_memories(after_id=synced_id):
+            synced_id = memory["id"]
+            if memory["id"] in vectors:
+                continue
+            batch.append(memory)
+            if len(batch) >= 512:
+                self._embed_into(vectors, batch)
+                batch = []
+        if batch:
+            self._embed_into(vectors, batch)
+        self._synced_id = max(self._synced_id, synced_id)
+    
+    def _on_evicted(self, memory_ids):
+        with self._evicted_lock:
+            vectors = self._vectors
+            if vectors is None:
+                if self._evicted_during_build is not None:
+                    self._evicted_during_build.update(memory_ids)
+                return
+        for memory_id in memory_ids:
+            vectors.remove(memory_id)
+    
+    def _embed_into(self, vectors, memories):
+        texts = [" ".join([memory["content"], *memory["tags"]]) for memory in memories]
+        vectors.add([memory["id"] for memory in memories], self._embedder(texts))
+    
+    def _semantic_search(self, query, limit, offset, tags):
+        vectors = self.vectors
+        if self.workers > 1:
+            # Other workers add memories to the shared database
+            self._catch_up(vectors)
+        wanted = offset + limit
+        nprobe = self.IVF_NPROBE if self.IVF_THRESHOLD is not None and len(vectors) > self.IVF_THRESHOLD else None
+        # Over-fetch when filtering by tags so a page still fills up
+        ranked = vectors.search(self._embedder([query]), k=wanted * 4 if tags else wanted, nprobe=nprobe)[0]
+        memories = self.store.get_many([memory_id for memory_id, _ in ranked])
+        wanted_tags = {tag.lower() for tag in tags or []}
+        results = []
+        for memory_id, score in ranked:
+            memory = memories.get(memory_id)
+            if memory is None:
+                continue
+            if wanted_tags and not wanted_tags <= {tag.lower() for tag in memory["tags"]}:
+                continue
+            results.append(dict(memory, score=round(score, 4)))
+        # Every indexed memory is ranked, so all of them (with the tags) count as matches
+        total = self.store.search("", limit=0, tags=tags)[0] if tags else len(vectors)
+        return total, results[offset:offset + limit]
+    
+    def close(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+            self._vectors = None
+    
     async def execute_tool(self, tool_name, arguments):
         if tool_name == "create_memory":
             content = arguments.get("content")
             tags = arguments.get("tags", [])
-            
-            memory = {
-                "id": len(self.memories) + 1,
-                "content": content,
-                "tags": tags,
-                "created_at": datetime.now().isoformat()
-            }
-            self.memories.append(memory)
-            return {"memory": memory, "success": True}
+            try:
+                memory = await self.store.create(content, tags)
+                if self._vectors is not None:
+                    self._embed_into(self._vectors, [memory])
+                    self._unflushed_vectors += 1
+                    if self._unflushed_vectors >= self.VECTOR_FLUSH_INTERVAL:
+                        self._vectors.flush()
+                        self._unflushed_vectors = 0
+                return {"memory": memory, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
         
         elif tool_name == "search_memories":
-            query = arguments.get("query", "").lower()
-            matching_memories = [
-                mem for mem in self.memories 
-                if query in mem["content"].lower() or any(query in tag.lower() for tag in mem["tags"])
-            ]
-            return {"memories": matching_memories, "success": True}
+            query = arguments.get("query", "")
+            limit = arguments.get("limit", 10)
+            offset = arguments.get("offset", 0)
+            search = self._semantic_search if arguments.get("mode") == "semantic" else self.store.search
+            try:
+                total, matching_memories = await asyncio.to_thread(
+                    search, query, limit=limit, offset=offset, tags=arguments.get("tags")
+                )
+                return {"memories": matching_memories, "total": total, "success": True}
+            except Exception as e:
+                return {"error": str(e), "success": False}
 
 # Demo server instances
 DEMO_SERVERS = {
     "filesystem": FilesystemMCPServer(),
     "git": GitMCPServer(), 
     "web_search": WebSearchMCPServer(),
-    "memory": MemoryMCPServer()
+    "sqlite": SQLiteMCPServer(),
+    "memory": MemoryMCPServer(),
+    "fetch": FetchMCPServer()
 }
 
-async def start_demo_servers():
-    """Start all demo MCP servers"""
+async def start_demo_servers(server_ids=None, host="127.0.0.1", reuse_port=False):
+    """Start demo MCP servers on the running event loop and return the ones that started"""
     print("Starting Demo MCP Servers...")
     
-    for server_id, server in DEMO_SERVERS.items():
-        try:
-            await server.start()
+    selected = {
+        server_id: server for server_id, server in DEMO_SERVERS.items()
+        if server_ids is None or server_id in server_ids
+    }
+    results = await asyncio.gather(
+        *(server.start(host=host, reuse_port=reuse_port) for server in selected.values()),
+        return_exceptions=True
+    )
+    started = {}
+    for (server_id, server), result in zip(selected.items(), results):
+        if isinstance(result, Exception):
+            print(f"❌ Failed to start {server.name}: {result}")
+        else:
+            started[server_id] = server
             print(f"✅ {server.name} started on port {server.port}")
-        except Exception as e:
-            print(f"❌ Failed to start {server.name}: {e}")
-    
-    print("\nDemo servers are running!")
-    print("You can now test the Streamlit app with these servers.")
-    print("Press Ctrl+C to stop all servers.")
+    return started
 
 if __name__ == "__main__":
-    try:
-        asyncio.run(start_demo_servers())
-    except KeyboardInterrupt:
-        print("\nStopping demo servers...")
-        sys.exit(0)
+    from src.core.server_launcher import main
+    
+    sys.exit(main())
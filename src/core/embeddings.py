@@ -0,0 +1,308 @@
+"""
+Offline text embeddings and a vectorized similarity index
+
+`HashedNgramEmbedder` turns text into fixed-size vectors by hashing character
+n-grams and words, so semantic search works without a model download or a
+network call. Any callable that maps a list of strings to an `(n, dim)` array
+can be used in its place.
+
+`VectorIndex` keeps the embeddings in one contiguous float32 matrix that grows
+in amortized chunks, answers batched cosine top-k queries with a single matrix
+product plus `argpartition`, and can persist the matrix as a memory map. Rows
+of removed vectors are reclaimed once they outnumber the live ones. An
+optional IVF coarse index restricts each query to the closest clusters.
+"""
+
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashedNgramEmbedder:
+    """Signed feature hashing of character n-grams and words"""
+
+    def __init__(self, dim=256, ngram_range=(3, 4), word_weight=2.0):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.word_weight = word_weight
+        self.name = f"hashed-ngram-{dim}-{ngram_range[0]}-{ngram_range[1]}"
+
+    def _features(self, text):
+        words = _WORD_RE.findall(text.lower())
+        for word in words:
+            yield "w:" + word, self.word_weight
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for start in range(max(1, len(padded) - n + 1)):
+                    yield padded[start:start + n], 1.0
+
+    def __call__(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                # crc32 is stable across processes, unlike hash()
+                hashed = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if hashed & 0x80000000 else -1.0
+                vectors[row, hashed % self.dim] += sign * weight
+        return normalize_rows(vectors)
+
+
+def normalize_rows(vectors):
+    """L2-normalize each row so dot products are cosine similarities"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores, k):
+    """Return `(indices, scores)` of the k best entries in each row, best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class VectorIndex:
+    """Growable embedding matrix with batched cosine top-k search"""
+
+    # Removed rows are reclaimed when there are more of them than live rows, and at least this many
+    MIN_COMPACT_ROWS = 256
+
+    def __init__(self, dim, path=None, initial_capacity=1024, growth_factor=1.5):
+        self.dim = dim
+        self.path = path
+        self.initial_capacity = initial_capacity
+        self.growth_factor = growth_factor
+        self.count = 0
+        self._lock = threading.RLock()
+        self._positions = {}
+        self._ivf = None
+
+        if path and os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            if meta["dim"] != dim:
+                raise ValueError(f"Vector index at {path} has dim {meta['dim']}, expected {dim}")
+            self.count = meta["count"]
+            self._open(meta["capacity"])
+            self._positions = {
+                int(doc_id): position
+                for position, doc_id in enumerate(self.ids[:self.count])
+                if doc_id >= 0
+            }
+        else:
+            self._open(initial_capacity)
+
+    @property
+    def _meta_path(self):
+        return f"{self.path}.meta.json"
+
+    def _open(self, capacity):
+        self.capacity = capacity
+        if self.path:
+            self.matrix = self._memmap(f"{self.path}.f32", np.float32, (capacity, self.dim))
+            self.ids = self._memmap(f"{self.path}.ids", np.int64, (capacity,), fill=-1)
+        else:
+            self.matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            self.ids = np.full(capacity, -1, dtype=np.int64)
+
+    @staticmethod
+    def _memmap(filename, dtype, shape, fill=0):
+        itemsize = np.dtype(dtype).itemsize * int(np.prod(shape[1:], dtype=np.int64))
+        old_rows = os.path.getsize(filename) // itemsize if os.path.exists(filename) else 0
+        with open(filename, "ab") as f:
+            f.truncate(itemsize * shape[0])
+        array = np.memmap(filename, dtype=dtype, mode="r+", shape=shape)
+        if fill and old_rows < shape[0]:
+            array[old_rows:] = fill
+        return array
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity = max(int(capacity * self.growth_factor), capacity + 1)
+        if self.path:
+            self.matrix.flush()
+            self.ids.flush()
+            del self.matrix, self.ids
+            self._open(capacity)
+        else:
+            matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+            matrix[:self.count] = self.matrix[:self.count]
+            ids = np.full(capacity, -1, dtype=np.int64)
+            ids[:self.count] = self.ids[:self.count]
+            self.matrix, self.ids, self.capacity = matrix, ids, capacity
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._positions
+
+    @property
+    def max_id(self):
+        return max(self._positions, default=0)
+
+    def add(self, doc_ids, vectors):
+        """Append vectors for the given ids, replacing existing entries"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            for doc_id in doc_ids:
+                self.remove(doc_id)
+            end = self.count + len(doc_ids)
+            if end > self.capacity:
+                self._grow(end)
+            self.matrix[self.count:end] = vectors
+            self.ids[self.count:end] = doc_ids
+            for offset, doc_id in enumerate(doc_ids):
+                self._positions[int(doc_id)] = self.count + offset
+            if self._ivf is not None:
+                self._ivf.assign(range(self.count, end), vectors)
+            self.count = end
+
+    def remove(self, doc_id):
+        with self._lock:
+            position = self._positions.pop(doc_id, None)
+            if position is None:
+                return False
+            self.ids[position] = -1
+            self.matrix[position] = 0.0
+            dead = self.count - len(self._positions)
+            if dead >= self.MIN_COMPACT_ROWS and dead > len(self._positions):
+                self.compact()
+            return True
+
+    def compact(self):
+        """Move the live rows to the front and shrink the matrix to fit them"""
+        with self._lock:
+            live = np.flatnonzero(self.ids[:self.count] >= 0)
+            matrix = np.array(self.matrix[live])
+            ids = np.array(self.ids[live])
+            capacity = max(self.initial_capacity, int(len(live) * self.growth_factor) + 1)
+            if self.path:
+                del self.matrix, self.ids
+            self._open(capacity)
+            self.matrix[:len(live)] = matrix
+            self.matrix[len(live):] = 0.0
+            self.ids[:len(live)] = ids
+            self.ids[len(live):] = -1
+            if self._ivf is not None:
+                moved = np.full(self.count, -1, dtype=np.int64)
+                moved[live] = np.arange(len(live))
+                self._ivf.remap(moved)
+            self._positions = {int(doc_id): position for position, doc_id in enumerate(ids)}
+            self.count = len(live)
+            # The files were truncated, so the metadata must not describe the old layout
+            self.flush()
+
+    def search(self, query_vectors, k=10, nprobe=None):
+        """Return one `[(doc_id, score), ...]` list per query vector"""
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            if not self._positions:
+                return [[] for _ in range(len(queries))]
+            if self._ivf is not None and nprobe is not None:
+                return [self._ivf.search(self, query, k, nprobe) for query in queries]
+            scores = queries @ self.matrix[:self.count].T
+            if len(self._positions) < self.count:
+                # Removed rows have zero vectors, push them out of the top-k
+                scores[:, self.ids[:self.count] < 0] = -np.inf
+            indices, top_scores = top_k(scores, k)
+            return [
+                [
+                    (int(self.ids[index]), float(score))
+                    for index, score in zip(row_indices, row_scores)
+                    if np.isfinite(score)
+                ]
+                for row_indices, row_scores in zip(indices, top_scores)
+            ]
+
+    def build_ivf(self, nlist=None, iterations=10, sample_size=65536, seed=0):
+        """Cluster the stored vectors into an IVF coarse index"""
+        with self._lock:
+            live = np.flatnonzero(self.ids[:self.count] >= 0)
+            if not len(live):
+                self._ivf = None
+                return 0
+            nlist = nlist or max(1, int(np.sqrt(len(live))))
+            rng = np.random.default_rng(seed)
+            if len(live) > sample_size:
+                sample = np.sort(rng.choice(live, sample_size, replace=False))
+            else:
+                sample = live
+            self._ivf = IVFCoarseIndex.train(self.matrix[sample], nlist, iterations=iterations, rng=rng)
+            # Assign in chunks so the score matrix stays small
+            for start in range(0, len(live), 16384):
+                positions = live[start:start + 16384]
+                self._ivf.assign(positions, self.matrix[positions])
+            return len(self._ivf.centroids)
+
+    def flush(self):
+        """Persist the matrix and metadata when backed by a memory map"""
+        if not self.path:
+            return
+        with self._lock:
+            self.matrix.flush()
+            self.ids.flush()
+            with open(self._meta_path, "w") as f:
+                json.dump({"dim": self.dim, "count": self.count, "capacity": self.capacity}, f)
+
+
+class IVFCoarseIndex:
+    """Inverted-file index: k-means centroids with a row list per cluster"""
+
+    def __init__(self, centroids):
+        self.centroids = centroids
+        self.lists = [[] for _ in range(len(centroids))]
+        self._arrays = None
+
+    @classmethod
+    def train(cls, vectors, nlist, iterations=10, rng=None):
+        rng = rng or np.random.default_rng(0)
+        nlist = min(nlist, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, vectors)
+            # Empty clusters keep their previous centroid
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+        return cls(centroids.astype(np.float32))
+
+    def assign(self, positions, vectors):
+        clusters = np.argmax(np.asarray(vectors) @ self.centroids.T, axis=1)
+        for position, cluster in zip(positions, clusters):
+            self.lists[cluster].append(int(position))
+        self._arrays = None
+
+    def remap(self, moved):
+        """Apply an old-to-new row mapping; rows mapped to -1 are dropped"""
+        self.lists = [[int(moved[row]) for row in rows if moved[row] >= 0] for rows in self.lists]
+        self._arrays = None
+
+    def search(self, index, query, k, nprobe):
+        if self._arrays is None:
+            self._arrays = [np.asarray(rows, dtype=np.int64) for rows in self.lists]
+        probe = top_k((query @ self.centroids.T)[None, :], nprobe)[0][0]
+        rows = np.concatenate([self._arrays[cluster] for cluster in probe])
+        rows = rows[index.ids[rows] >= 0]
+        if not len(rows):
+            return []
+        scores = index.matrix[rows] @ query
+        order, top_scores = top_k(scores[None, :], k)
+        return [(int(index.ids[rows[i]]), float(s)) for i, s in zip(order[0], top_scores[0])]
@@ -0,0 +1,381 @@
+"""
+Incremental commit-history index for repository analytics
+
+Commits, per-file churn and authors are stored in a SQLite database next to
+the repository's git directory. Each ingest only walks the commits added since
+the last indexed SHA, and weekly/per-file rollups are maintained as commits are
+ingested so analytics queries never have to walk `git log`.
+"""
+
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+
+INDEX_FILENAME = "mcp-history.sqlite3"
+SECONDS_PER_WEEK = 7 * 24 * 3600
+# 1970-01-05 00:00 UTC, the first Monday after the Unix epoch
+_EPOCH_MONDAY = 4 * 24 * 3600
+_RECORD_SEP = "\x1e"
+_FIELD_SEP = "\x1f"
+_LOG_FORMAT = f"--format={_RECORD_SEP}%H{_FIELD_SEP}%an{_FIELD_SEP}%ae{_FIELD_SEP}%ct"
+_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS commits (
+    sha TEXT PRIMARY KEY,
+    author_id INTEGER NOT NULL REFERENCES authors(id),
+    committed_at INTEGER NOT NULL,
+    insertions INTEGER NOT NULL,
+    deletions INTEGER NOT NULL,
+    files_changed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_commits_time ON commits(committed_at);
+CREATE INDEX IF NOT EXISTS idx_commits_author ON commits(author_id, committed_at);
+CREATE TABLE IF NOT EXISTS file_changes (
+    sha TEXT NOT NULL,
+    path TEXT NOT NULL,
+    committed_at INTEGER NOT NULL,
+    insertions INTEGER NOT NULL,
+    deletions INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_file_changes_time ON file_changes(committed_at, path);
+CREATE TABLE IF NOT EXISTS file_churn (
+    path TEXT PRIMARY KEY,
+    commits INTEGER NOT NULL,
+    insertions INTEGER NOT NULL,
+    deletions INTEGER NOT NULL,
+    last_commit_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS weekly_activity (
+    week_start INTEGER NOT NULL,
+    author_id INTEGER NOT NULL,
+    commits INTEGER NOT NULL,
+    insertions INTEGER NOT NULL,
+    deletions INTEGER NOT NULL,
+    PRIMARY KEY (week_start, author_id)
+);
+"""
+
+
+def week_start(timestamp):
+    """Return the Monday 00:00 UTC timestamp of the week containing `timestamp`"""
+    return timestamp - ((timestamp - _EPOCH_MONDAY) % SECONDS_PER_WEEK)
+
+
+def _run_git(repo_path, *args):
+    result = subprocess.run(["git", *args], cwd=repo_path, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout.strip()
+
+
+def _parse_numstat(line):
+    parts = line.split("\t", 2)
+    if len(parts) != 3:
+        return None
+    insertions, deletions, path = parts
+    # Binary files report "-" for both counts
+    insertions = int(insertions) if insertions.isdigit() else 0
+    deletions = int(deletions) if deletions.isdigit() else 0
+    return path, insertions, deletions
+
+
+class GitHistoryIndex:
+    """SQLite-backed commit history index for a single git repository"""
+
+    def __init__(self, repo_path, db_path=None):
+        self.repo_path = os.path.abspath(repo_path)
+        if db_path is None:
+            git_dir = _run_git(self.repo_path, "rev-parse", "--absolute-git-dir")
+            db_path = os.path.join(git_dir, INDEX_FILENAME)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._author_ids = dict(self._conn.execute("SELECT email, id FROM authors"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def _is_ancestor(self, sha, head):
+        result = subprocess.run(
+            ["git", "merge-base", "--is-ancestor", sha, head],
+            cwd=self.repo_path, capture_output=True
+        )
+        return result.returncode == 0
+
+    def _reset(self):
+        for table in ("commits", "file_changes", "file_churn", "weekly_activity", "authors", "meta"):
+            self._conn.execute(f"DELETE FROM {table}")
+        self._author_ids = {}
+
+    def _author_id(self, name, email):
+        key = email.lower()
+        author_id = self._author_ids.get(key)
+        if author_id is None:
+            cursor = self._conn.execute(
+                "INSERT INTO authors (email, name) VALUES (?, ?)", (key, name)
+            )
+            author_id = cursor.lastrowid
+            self._author_ids[key] = author_id
+        return author_id
+
+    def _iter_commits(self, revision_range):
+        """Stream commits from `git log` without buffering the whole history"""
+        process = subprocess.Popen(
+            ["git", "log", "--reverse", "--no-renames", "--numstat", _LOG_FORMAT, revision_range],
+            cwd=self.repo_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, encoding="utf-8", errors="replace"
+        )
+        commit = None
+        try:
+            for line in process.stdout:
+                line = line.rstrip("\n")
+                if line.startswith(_RECORD_SEP):
+                    if commit is not None:
+                        yield commit
+                    sha, name, email, committed_at = line[1:].split(_FIELD_SEP)
+                    commit = {
+                        "sha": sha,
+                        "name": name,
+                        "email": email,
+                        "committed_at": int(committed_at),
+                        "files": []
+                    }
+                elif line and commit is not None:
+                    change = _parse_numstat(line)
+                    if change:
+                        commit["files"].append(change)
+            if commit is not None:
+                yield commit
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            if process.wait() != 0:
+                raise RuntimeError(stderr.strip() or "git log failed")
+
+    def _write_batch(self, commits):
+        commit_rows = []
+        change_rows = []
+        churn_rows = []
+        weekly_rows = []
+        for commit in commits:
+            author_id = self._author_id(commit["name"], commit["email"])
+            committed_at = commit["committed_at"]
+            insertions = sum(change[1] for change in commit["files"])
+            deletions = sum(change[2] for change in commit["files"])
+            commit_rows.append((
+                commit["sha"], author_id, committed_at, insertions, deletions, len(commit["files"])
+            ))
+            for path, file_ins, file_del in commit["files"]:
+                change_rows.append((commit["sha"], path, committed_at, file_ins, file_del))
+                churn_rows.append((path, file_ins, file_del, committed_at))
+            weekly_rows.append((week_start(committed_at), author_id, insertions, deletions))
+
+        self._conn.executemany(
+            "INSERT INTO commits (sha, author_id, committed_at, insertions, deletions, files_changed) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            commit_rows
+        )
+        self._conn.executemany(
+            "INSERT INTO file_changes (sha, path, committed_at, insertions, deletions) "
+            "VALUES (?, ?, ?, ?, ?)",
+            change_rows
+        )
+        self._conn.executemany(
+            "INSERT INTO file_churn (path, commits, insertions, deletions, last_commit_at) "
+            "VALUES (?, 1, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+            "commits = commits + 1, insertions = insertions + excluded.insertions, "
+            "deletions = deletions + excluded.deletions, "
+            "last_commit_at = MAX(last_commit_at, excluded.last_commit_at)",
+            churn_rows
+        )
+        self._conn.executemany(
+            "INSERT INTO weekly_activity (week_start, author_id, commits, insertions, deletions) "
+            "VALUES (?, ?, 1, ?, ?) ON CONFLICT(week_start, author_id) DO UPDATE SET "
+            "commits = commits + 1, insertions = insertions + excluded.insertions, "
+            "deletions = deletions + excluded.deletions",
+            weekly_rows
+        )
+
+    def ingest(self):
+        """Index commits added since the last indexed SHA"""
+        started = time.perf_counter()
+        try:
+            head = _run_git(self.repo_path, "rev-parse", "HEAD")
+        except RuntimeError:
+            # Empty repository, nothing to index yet
+            return {"indexed": 0, "head": None, "rebuilt": False, "elapsed_ms": 0.0}
+
+        with self._lock:
+            last_sha = self._get_meta("last_sha")
+            if last_sha == head:
+                return {"indexed": 0, "head": head, "rebuilt": False, "elapsed_ms": 0.0}
+
+            rebuilt = bool(last_sha) and not self._is_ancestor(last_sha, head)
+            try:
+                with self._conn:
+                    if last_sha and not rebuilt:
+                        revision_range = f"{last_sha}..{head}"
+                    else:
+                        # First run, or history was rewritten under us
+                        self._reset()
+                        revision_range = head
+
+                    indexed = 0
+                    batch = []
+                    for commit in self._iter_commits(revision_range):
+                        batch.append(commit)
+                        if len(batch) >= _BATCH_SIZE:
+                            self._write_batch(batch)
+                            indexed += len(batch)
+                            batch = []
+                    if batch:
+                        self._write_batch(batch)
+                        indexed += len(batch)
+                    self._set_meta("last_sha", head)
+            except Exception:
+                # The transaction was rolled back, drop ids that were never stored
+                self._author_ids = dict(self._conn.execute("SELECT email, id FROM authors"))
+                raise
+
+        return {
+            "indexed": indexed,
+            "head": head,
+            "rebuilt": rebuilt,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def summary(self):
+        """Return totals for the indexed history"""
+        with self._lock:
+            commits, first, last = self._conn.execute(
+                "SELECT COUNT(*), MIN(committed_at), MAX(committed_at) FROM commits"
+            ).fetchone()
+            authors = self._conn.execute("SELECT COUNT(*) FROM authors").fetchone()[0]
+            files = self._conn.execute("SELECT COUNT(*) FROM file_churn").fetchone()[0]
+            head = self._get_meta("last_sha")
+        return {
+            "commits": commits,
+            "authors": authors,
+            "files": files,
+            "first_commit_at": first,
+            "last_commit_at": last,
+            "indexed_head": head
+        }
+
+    def commits_per_week(self, author=None, since=None):
+        """Return commit counts per week and author, newest week first"""
+        query = (
+            "SELECT w.week_start, a.name, a.email, w.commits, w.insertions, w.deletions "
+            "FROM weekly_activity w JOIN authors a ON a.id = w.author_id"
+        )
+        clauses = []
+        params = []
+        if author:
+            clauses.append("(a.email = ? OR a.name = ?)")
+            params.extend([author.lower(), author])
+        if since is not None:
+            clauses.append("w.week_start >= ?")
+            params.append(week_start(since))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY w.week_start DESC, w.commits DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {
+                "week_start": week,
+                "author": name,
+                "email": email,
+                "commits": commits,
+                "insertions": insertions,
+                "deletions": deletions
+            }
+            for week, name, email, commits, insertions, deletions in rows
+        ]
+
+    def hot_files(self, limit=10, since=None):
+        """Return the most frequently changed files, optionally since a timestamp"""
+        if since is None:
+            query = (
+                "SELECT path, commits, insertions, deletions, last_commit_at FROM file_churn "
+                "ORDER BY commits DESC, insertions + deletions DESC LIMIT ?"
+            )
+            params = (limit,)
+        else:
+            query = (
+                "SELECT path, COUNT(*), SUM(insertions), SUM(deletions), MAX(committed_at) "
+                "FROM file_changes WHERE committed_at >= ? GROUP BY path "
+                "ORDER BY COUNT(*) DESC, SUM(insertions) + SUM(deletions) DESC LIMIT ?"
+            )
+            params = (since, limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {
+                "path": path,
+                "commits": commits,
+                "insertions": insertions,
+                "deletions": deletions,
+                "last_commit_at": last_commit_at
+            }
+            for path, commits, insertions, deletions, last_commit_at in rows
+        ]
+
+    def author_stats(self, limit=10, since=None):
+        """Return per-author commit and churn totals"""
+        query = (
+            "SELECT a.name, a.email, COUNT(*), SUM(c.insertions), SUM(c.deletions), "
+            "MIN(c.committed_at), MAX(c.committed_at) "
+            "FROM commits c JOIN authors a ON a.id = c.author_id"
+        )
+        params = []
+        if since is not None:
+            query += " WHERE c.committed_at >= ?"
+            params.append(since)
+        query += " GROUP BY c.author_id ORDER BY COUNT(*) DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {
+                "author": name,
+                "email": email,
+                "commits": commits,
+                "insertions": insertions,
+                "deletions": deletions,
+                "first_commit_at": first,
+                "last_commit_at": last
+            }
+            for name, email, commits, insertions, deletions, first, last in rows
+        ]
@@ -0,0 +1,308 @@
+"""
+Pooled, caching HTTP client for the Fetch MCP server
+
+Each host gets its own keep-alive `requests.Session` and a concurrency limit.
+Responses to GET/HEAD are kept in a private HTTP cache that follows the
+RFC 9111 freshness rules (Cache-Control max-age, Expires, heuristic freshness
+from Last-Modified) and revalidates stale entries with ETag/Last-Modified
+conditional requests. Bodies are streamed and cut off at a byte cap.
+"""
+
+import base64
+import email.utils
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+CACHEABLE_STATUSES = {200, 203, 204, 300, 301, 404, 410}
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Heuristic freshness is 10% of the time since Last-Modified, capped at a day
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX_SECONDS = 24 * 3600
+_HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "content-length"
+}
+
+
+def parse_cache_control(value):
+    """Parse a Cache-Control header into a dict of lowercase directives"""
+    directives = {}
+    for part in (value or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, argument = part.partition("=")
+        directives[name.strip().lower()] = argument.strip().strip('"') or True
+    return directives
+
+
+def _parse_seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_http_date(value):
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class CacheEntry:
+    __slots__ = ("status", "headers", "body", "stored_at", "initial_age", "freshness", "vary", "must_revalidate")
+
+    def __init__(self, status, headers, body, request_headers, now):
+        self.status = status
+        self.headers = CaseInsensitiveDict(headers)
+        self.body = body
+        self.stored_at = now
+        self.vary = {
+            name.strip().lower(): request_headers.get(name.strip())
+            for name in headers.get("Vary", "").split(",") if name.strip()
+        }
+        self._update_freshness(now)
+
+    def _update_freshness(self, now):
+        headers = self.headers
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        date = _parse_http_date(headers.get("Date")) or now
+        apparent_age = max(0.0, now - date)
+        self.initial_age = max(apparent_age, _parse_seconds(headers.get("Age")) or 0)
+        self.must_revalidate = "no-cache" in directives
+
+        max_age = _parse_seconds(directives.get("max-age"))
+        if max_age is not None:
+            self.freshness = max_age
+            return
+        expires = headers.get("Expires")
+        if expires is not None:
+            expires_at = _parse_http_date(expires)
+            # An invalid Expires value means "already expired"
+            self.freshness = max(0.0, expires_at - date) if expires_at else 0.0
+            return
+        last_modified = _parse_http_date(headers.get("Last-Modified"))
+        if last_modified:
+            self.freshness = min(HEURISTIC_MAX_SECONDS, HEURISTIC_FRACTION * max(0.0, date - last_modified))
+        else:
+            self.freshness = 0.0
+
+    def age(self, now):
+        return self.initial_age + (now - self.stored_at)
+
+    def is_fresh(self, now):
+        return not self.must_revalidate and self.age(now) < self.freshness
+
+    def matches(self, request_headers):
+        return all(request_headers.get(name) == value for name, value in self.vary.items())
+
+    def refresh(self, not_modified_headers, now):
+        """Apply the headers of a 304 response and restart the freshness clock"""
+        for name, value in not_modified_headers.items():
+            if name.lower() not in _HOP_BY_HOP_HEADERS:
+                self.headers[name] = value
+        self.stored_at = now
+        self._update_freshness(now)
+
+    @property
+    def validators(self):
+        conditional = {}
+        if "ETag" in self.headers:
+            conditional["If-None-Match"] = self.headers["ETag"]
+        if "Last-Modified" in self.headers:
+            conditional["If-Modified-Since"] = self.headers["Last-Modified"]
+        return conditional
+
+
+class HTTPCache:
+    """In-memory private cache bounded by total body bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0}
+
+    @staticmethod
+    def key(method, url):
+        return ("GET" if method == "HEAD" else method, url)
+
+    def get(self, method, url):
+        with self._lock:
+            entry = self._entries.get(self.key(method, url))
+            if entry is not None:
+                self._entries.move_to_end(self.key(method, url))
+            return entry
+
+    def store(self, method, url, entry):
+        key = self.key(method, url)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            if len(entry.body) > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.size += len(entry.body)
+            self.stats["stored"] += 1
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def invalidate(self, url):
+        with self._lock:
+            entry = self._entries.pop(("GET", url), None)
+            if entry is not None:
+                self.size -= len(entry.body)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachingHTTPClient:
+    """HTTP client with per-host keep-alive pools, limits and a response cache"""
+
+    def __init__(self, per_host_limit=4, cache=None, default_max_bytes=1024 * 1024, timeout=30):
+        self.per_host_limit = per_host_limit
+        self.cache = cache if cache is not None else HTTPCache()
+        self.default_max_bytes = default_max_bytes
+        self.timeout = timeout
+        self._sessions = {}
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def _host_state(self, url):
+        parts = urlsplit(url)
+        host = (parts.scheme, parts.netloc)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.per_host_limit)
+                session.mount(f"{parts.scheme}://", adapter)
+                self._sessions[host] = session
+                self._limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return session, self._limits[host]
+
+    def _send(self, method, url, headers, body, max_bytes, timeout):
+        session, limit = self._host_state(url)
+        with limit:
+            with session.request(
+                method, url, headers=headers, data=body, stream=True,
+                timeout=timeout or self.timeout, allow_redirects=True
+            ) as response:
+                chunks = []
+                received = 0
+                truncated = False
+                if method != "HEAD":
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        if received + len(chunk) > max_bytes:
+                            chunks.append(chunk[:max_bytes - received])
+                            truncated = True
+                            break
+                        chunks.append(chunk)
+                        received += len(chunk)
+                return response.status_code, response.headers, b"".join(chunks), truncated, response.url
+
+    @staticmethod
+    def _cached_body(entry, method, max_bytes):
+        # HEAD shares the GET entry but has no body; the byte cap applies as it does on the network path
+        if method == "HEAD":
+            return b"", False
+        return entry.body[:max_bytes], len(entry.body) > max_bytes
+
+    def request(self, method, url, headers=None, body=None, max_bytes=None, timeout=None):
+        """Perform a request, answering from or revalidating the cache when allowed"""
+        method = method.upper()
+        headers = CaseInsensitiveDict(headers or {})
+        max_bytes = max_bytes or self.default_max_bytes
+        started = time.perf_counter()
+        request_directives = parse_cache_control(headers.get("Cache-Control"))
+        cacheable_method = method in ("GET", "HEAD")
+        use_cache = cacheable_method and "no-store" not in request_directives
+
+        entry = self.cache.get(method, url) if use_cache else None
+        if entry is not None and not entry.matches(headers):
+            entry = None
+
+        if entry is not None:
+            now = time.time()
+            max_age = _parse_seconds(request_directives.get("max-age"))
+            fresh = entry.is_fresh(now) and "no-cache" not in request_directives
+            if fresh and (max_age is None or entry.age(now) <= max_age):
+                self.cache.stats["hits"] += 1
+                content, truncated = self._cached_body(entry, method, max_bytes)
+                return self._result(entry.status, entry.headers, content, url, "hit", truncated, started, entry.age(now))
+            headers.update(entry.validators)
+
+        status, response_headers, content, truncated, final_url = self._send(
+            method, url, headers, body, max_bytes, timeout
+        )
+        now = time.time()
+
+        if entry is not None and status == 304:
+            entry.refresh(response_headers, now)
+            self.cache.stats["revalidated"] += 1
+            content, truncated = self._cached_body(entry, method, max_bytes)
+            return self._result(entry.status, entry.headers, content, url, "revalidated", truncated, started, 0)
+
+        cache_status = "bypass"
+        if use_cache:
+            self.cache.stats["misses"] += 1
+            cache_status = "miss"
+            directives = parse_cache_control(response_headers.get("Cache-Control"))
+            storable = (
+                status in CACHEABLE_STATUSES
+                and not truncated
+                and "no-store" not in directives
+                and response_headers.get("Vary", "").strip() != "*"
+            )
+            if storable:
+                stored = CacheEntry(status, response_headers, content, headers, now)
+                # HEAD responses carry no body, so only GET populates the cache
+                if method == "GET" and (stored.freshness > 0 or stored.validators):
+                    self.cache.store(method, url, stored)
+        elif method in UNSAFE_METHODS and status < 400:
+            self.cache.invalidate(url)
+            if final_url != url:
+                self.cache.invalidate(final_url)
+
+        return self._result(status, response_headers, content, final_url, cache_status, truncated, started, 0)
+
+    @staticmethod
+    def _result(status, headers, body, url, cache_status, truncated, started, age):
+        content_type = headers.get("Content-Type", "")
+        is_text = content_type.startswith("text/") or any(
+            marker in content_type for marker in ("json", "xml", "javascript", "x-www-form-urlencoded")
+        )
+        result = {
+            "url": url,
+            "status": status,
+            "headers": dict(headers),
+            "size": len(body),
+            "truncated": truncated,
+            "cache": cache_status,
+            "age": int(age),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+        if is_text or not content_type:
+            result["body"] = body.decode("utf-8", errors="replace")
+        else:
+            result["body_base64"] = base64.b64encode(body).decode("ascii")
+        return result
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
@@ -0,0 +1,186 @@
+"""
+MCP server connections and tool execution, independent of the UI
+
+Server and tool registries are plain dicts owned by the caller: the
+Streamlit session state in the app, or a service session in headless mode.
+`servers` maps a server name to its settings and status, and `tools` maps
+each connected server's name to its tool definitions.
+
+Identical tool calls and connection checks that are in flight at the same
+time, from any sessions, share one execution.
+"""
+
+import socket
+import time
+
+from src.config.config import MCP_TOOLS
+from src.core.serialization import digest
+from src.core.single_flight import SingleFlight
+from src.core.turn_recorder import current_turn
+
+_in_flight = SingleFlight()
+
+
+def test_mcp_connection(host, port):
+    """Test connection to MCP server"""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(5)
+        result = sock.connect_ex((host, int(port)))
+        sock.close()
+        return result == 0
+    except Exception:
+        return False
+
+
+def discover_mcp_tools(server_name):
+    """Discover tools from MCP server"""
+    return MCP_TOOLS.get(server_name.lower(), [])
+
+
+def add_server(servers, name, host, port, description):
+    """Register a server as disconnected"""
+    servers[name] = {
+        "host": host,
+        "port": port,
+        "description": description,
+        "status": "disconnected",
+        "tools": []
+    }
+
+
+def remove_server(servers, tools, name):
+    """Forget a server and its tools"""
+    servers.pop(name, None)
+    tools.pop(name, None)
+
+
+def connect_server(servers, tools, name):
+    """Connect to a registered server and discover its tools
+
+    Blocks for up to the connection timeout; async callers should run it in
+    a thread.
+    """
+    if name not in servers:
+        return False, "Server not found"
+    
+    server = servers[name]
+    
+    # Test connection; sessions connecting to the same server at once share one check
+    host, port = server["host"], server["port"]
+    if not _in_flight.do(("connect", host, port), lambda: test_mcp_connection(host, port)):
+        return False, "Connection failed"
+    
+    # Discover tools
+    discovered = discover_mcp_tools(name)
+    tools[name] = discovered
+    server["status"] = "connected"
+    server["tools"] = discovered
+    
+    return True, f"Connected successfully. Found {len(discovered)} tools."
+
+
+def disconnect_server(servers, tools, name):
+    """Mark a server disconnected and drop its tools"""
+    if name in servers:
+        servers[name]["status"] = "disconnected"
+        tools.pop(name, None)
+        return True, "Disconnected successfully"
+    return False, "Server not found"
+
+
+def execute_tool(server_name, tool_name, arguments):
+    """Run a tool call, sharing one execution among identical calls in flight
+
+    Calls are identical when the server, tool and arguments match, whatever
+    the key order of the arguments. The result is shared, so callers must
+    not modify it.
+    """
+    key = ("tool", server_name.lower(), tool_name, digest(arguments))
+    turn = current_turn()
+    started = time.perf_counter()
+    result = _in_flight.do(key, lambda: simulate_mcp_tool_execution(server_name, tool_name, arguments))
+    if turn is not None:
+        turn.tool_call(tool_name, arguments, result=result, seconds=time.perf_counter() - started, server=server_name)
+    return result
+
+
+def simulate_mcp_tool_execution(server_name, tool_name, arguments):
+    """Simulate MCP tool execution for demo purposes"""
+    # This would normally call the actual MCP server
+    # For demo purposes, we'll simulate responses
+    
+    if server_name.lower() == "filesystem mcp":
+        if tool_name == "read_file":
+            path = arguments.get("path", "")
+            return {
+                "content": f"Demo content from {path}",
+                "success": True,
+                "message": f"Successfully read {path}"
+            }
+        elif tool_name == "list_directory":
+            path = arguments.get("path", ".")
+            return {
+                "files": ["demo_file1.txt", "demo_file2.py", "demo_folder/"],
+                "success": True,
+                "message": f"Listed contents of {path}"
+            }
+    
+    elif server_name.lower() == "git mcp":
+        if tool_name == "git_status":
+            return {
+                "status": "M  demo_file.py\nA  new_file.txt",
+                "success": True,
+                "message": "Git status retrieved"
+            }
+        elif tool_name == "git_log":
+            return {
+                "log": "abc1234 Fix demo bug\ndef5678 Add new feature\nghi9012 Initial commit",
+                "success": True,
+                "message": "Git log retrieved"
+            }
+    
+    elif server_name.lower() == "web search mcp":
+        if tool_name == "search_web":
+            query = arguments.get("query", "")
+            return {
+                "results": [
+                    {
+                        "title": f"Search result for '{query}'",
+                        "url": "https://example.com/result1",
+                        "snippet": f"This is a demo search result for '{query}'"
+                    }
+                ],
+                "success": True,
+                "message": f"Found results for '{query}'"
+            }
+    
+    elif server_name.lower() == "memory mcp":
+        if tool_name == "create_memory":
+            content = arguments.get("content", "")
+            return {
+                "memory": {
+                    "id": 1,
+                    "content": content,
+                    "created_at": "2024-01-01T00:00:00Z"
+                },
+                "success": True,
+                "message": "Memory created successfully"
+            }
+        elif tool_name == "search_memories":
+            return {
+                "memories": [
+                    {
+                        "id": 1,
+                        "content": "Demo memory content",
+                        "created_at": "2024-01-01T00:00:00Z"
+                    }
+                ],
+                "success": True,
+                "message": "Memories found"
+            }
+    
+    return {
+        "success": False,
+        "message": f"Tool '{tool_name}' not found in server '{server_name}'"
+    }
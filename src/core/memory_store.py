@@ -0,0 +1,492 @@
+"""
+Storage backends for the Memory MCP server
+
+`SQLiteMemoryStore` is the durable default: WAL-mode SQLite with an FTS5
+full-text index, group-committed writes through a single writer thread and a
+pool of read connections. `InMemoryMemoryStore` keeps everything in process
+and is used for tests and throwaway sessions.
+"""
+
+import asyncio
+import heapq
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+
+from src.core.serialization import dumps_str, loads
+from src.core.sqlite_pool import ConnectionPool, SerializedWriter
+from src.core.text_index import InvertedIndex, normalize_tag, tokenize
+
+# Relative weights of the content and tags columns in FTS5 bm25()
+_FTS_WEIGHTS = (1.0, 2.0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS memory_tags (
+    tag TEXT NOT NULL,
+    memory_id INTEGER NOT NULL,
+    PRIMARY KEY (tag, memory_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_memory_tags_memory ON memory_tags(memory_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+    content, tags, content='memories', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN
+    INSERT INTO memories_fts (rowid, content, tags) VALUES (new.id, new.content, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN
+    INSERT INTO memories_fts (memories_fts, rowid, content, tags)
+    VALUES ('delete', old.id, old.content, old.tags);
+    DELETE FROM memory_tags WHERE memory_id = old.id;
+END;
+"""
+
+
+def _clean_tags(tags):
+    seen = []
+    for tag in tags or []:
+        if tag and tag.strip() and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+class MemoryStore:
+    """Common interface for memory backends"""
+
+    def submit(self, content, tags=None):
+        """Queue a new memory and return a Future resolving to the stored record"""
+        raise NotImplementedError
+
+    def get(self, memory_id):
+        raise NotImplementedError
+
+    def get_many(self, memory_ids):
+        """Return the stored memories for the given ids, keyed by id"""
+        raise NotImplementedError
+
+    def iter_memories(self, after_id=0, batch_size=1000):
+        """Yield memories with ids greater than `after_id` in id order"""
+        raise NotImplementedError
+
+    def delete(self, memory_id):
+        raise NotImplementedError
+
+    def search(self, query, limit=10, offset=0, tags=None):
+        """Return `(total_matches, [memory, ...])` ranked by relevance"""
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def add(self, content, tags=None):
+        return self.submit(content, tags).result()
+
+    async def create(self, content, tags=None):
+        return await asyncio.wrap_future(self.submit(content, tags))
+
+
+class TagTable:
+    """Interns tag strings to small integers shared by every record"""
+
+    def __init__(self):
+        self._ids = {}
+        self._tags = []
+        self._refcounts = []
+        self._free = []
+
+    def __len__(self):
+        return len(self._ids)
+
+    def acquire(self, tags):
+        tag_ids = []
+        for tag in tags:
+            tag_id = self._ids.get(tag)
+            if tag_id is None:
+                tag = sys.intern(tag)
+                if self._free:
+                    tag_id = self._free.pop()
+                    self._tags[tag_id] = tag
+                    self._refcounts[tag_id] = 0
+                else:
+                    tag_id = len(self._tags)
+                    self._tags.append(tag)
+                    self._refcounts.append(0)
+                self._ids[tag] = tag_id
+            self._refcounts[tag_id] += 1
+            tag_ids.append(tag_id)
+        return tuple(tag_ids)
+
+    def release(self, tag_ids):
+        for tag_id in tag_ids:
+            self._refcounts[tag_id] -= 1
+            if not self._refcounts[tag_id]:
+                del self._ids[self._tags[tag_id]]
+                self._tags[tag_id] = None
+                self._free.append(tag_id)
+
+    def names(self, tag_ids):
+        return [self._tags[tag_id] for tag_id in tag_ids]
+
+
+class MemoryRecord:
+    """Compact memory record: integer timestamps and interned tag ids"""
+
+    __slots__ = ("id", "content", "tag_ids", "created_at", "last_access", "hits")
+
+    def __init__(self, memory_id, content, tag_ids, created_at):
+        self.id = memory_id
+        self.content = content
+        self.tag_ids = tag_ids
+        # Microseconds since the epoch
+        self.created_at = created_at
+        self.last_access = created_at
+        self.hits = 0
+
+    def size(self):
+        return sys.getsizeof(self.content) + 8 * len(self.tag_ids)
+
+
+def _now_us():
+    return time.time_ns() // 1000
+
+
+class InMemoryMemoryStore(MemoryStore):
+    """Process-local store of compact records with a BM25 inverted index
+
+    When `max_memories` or `max_bytes` is set, records are evicted once the
+    cap is exceeded until the store is back under `low_watermark` of it.
+    Eviction policies:
+
+    - ``lru``: least recently created or returned by a search/get
+    - ``oldest``: lowest id first
+    - ``least_referenced``: fewest search/get hits, oldest first on ties
+
+    Evicted and deleted records leave slack in the index dicts; a background
+    thread compacts them once enough records have been removed.
+    """
+
+    EVICTION_POLICIES = ("lru", "oldest", "least_referenced")
+
+    def __init__(self, max_memories=None, max_bytes=None, eviction_policy="lru",
+                 low_watermark=0.9, compaction_ratio=0.25, background_compaction=True):
+        if eviction_policy not in self.EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy: {eviction_policy}")
+        self.max_memories = max_memories
+        self.max_bytes = max_bytes
+        self.eviction_policy = eviction_policy
+        self.low_watermark = low_watermark
+        self.compaction_ratio = compaction_ratio
+        self.records = OrderedDict()
+        self.tags = TagTable()
+        self.index = InvertedIndex(keep_doc_terms=False)
+        self.size = 0
+        self.evicted = 0
+        self._removed_since_compaction = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._eviction_listeners = []
+        self._compaction_needed = threading.Event()
+        self._closed = False
+        self._compactor = None
+        if background_compaction:
+            self._compactor = threading.Thread(target=self._compaction_loop, name="memory-compactor", daemon=True)
+            self._compactor.start()
+
+    def add_eviction_listener(self, callback):
+        """Call `callback(memory_ids)` whenever records are evicted"""
+        self._eviction_listeners.append(callback)
+
+    def _to_memory(self, record):
+        return {
+            "id": record.id,
+            "content": record.content,
+            "tags": self.tags.names(record.tag_ids),
+            "created_at": datetime.fromtimestamp(record.created_at / 1_000_000).isoformat()
+        }
+
+    def _touch(self, record):
+        record.hits += 1
+        record.last_access = _now_us()
+        if self.eviction_policy == "lru":
+            self.records.move_to_end(record.id)
+
+    def _remove_locked(self, record):
+        del self.records[record.id]
+        self.index.remove(record.id, record.content, self.tags.names(record.tag_ids))
+        self.tags.release(record.tag_ids)
+        self.size -= record.size()
+        self._removed_since_compaction += 1
+
+    def _over_cap(self, factor=1.0):
+        return (
+            (self.max_memories is not None and len(self.records) > self.max_memories * factor)
+            or (self.max_bytes is not None and self.size > self.max_bytes * factor)
+        )
+
+    def _evict_locked(self):
+        """Evict down to the low watermark and return the evicted ids"""
+        if not self._over_cap():
+            return []
+        evicted = []
+        if self.eviction_policy == "least_referenced":
+            # A linear heapify ranks every record, so the count and byte caps
+            # both evict by references however many records it takes;
+            # evicting in bulk amortizes the pass
+            ranked = [(record.hits, record.id) for record in self.records.values()]
+            heapq.heapify(ranked)
+            while ranked and self._over_cap(self.low_watermark):
+                record = self.records[heapq.heappop(ranked)[1]]
+                self._remove_locked(record)
+                evicted.append(record.id)
+        else:
+            # Records are ordered oldest-first ("oldest") or least-recent-first ("lru")
+            while self.records and self._over_cap(self.low_watermark):
+                record = next(iter(self.records.values()))
+                self._remove_locked(record)
+                evicted.append(record.id)
+        self.evicted += len(evicted)
+        return evicted
+
+    def submit(self, content, tags=None):
+        tags = _clean_tags(tags)
+        with self._lock:
+            record = MemoryRecord(self._next_id, content, self.tags.acquire(tags), _now_us())
+            self._next_id += 1
+            self.records[record.id] = record
+            self.size += record.size()
+            self.index.add(record.id, content, tags)
+            memory = self._to_memory(record)
+            evicted = self._evict_locked()
+        self._after_removal(evicted)
+        future = Future()
+        future.set_result(memory)
+        return future
+
+    def _after_removal(self, evicted):
+        if evicted:
+            for callback in self._eviction_listeners:
+                callback(evicted)
+        if self._removed_since_compaction > self.compaction_ratio * max(len(self.records), 1):
+            self._compaction_needed.set()
+
+    def get(self, memory_id):
+        with self._lock:
+            record = self.records.get(memory_id)
+            if record is None:
+                return None
+            self._touch(record)
+            return self._to_memory(record)
+
+    def get_many(self, memory_ids):
+        with self._lock:
+            memories = {}
+            for memory_id in memory_ids:
+                record = self.records.get(memory_id)
+                if record is not None:
+                    self._touch(record)
+                    memories[memory_id] = self._to_memory(record)
+            return memories
+
+    def iter_memories(self, after_id=0, batch_size=1000):
+        with self._lock:
+            memory_ids = sorted(memory_id for memory_id in self.records if memory_id > after_id)
+        for start in range(0, len(memory_ids), batch_size):
+            with self._lock:
+                batch = [
+                    self._to_memory(self.records[memory_id])
+                    for memory_id in memory_ids[start:start + batch_size]
+                    if memory_id in self.records
+                ]
+            yield from batch
+
+    def delete(self, memory_id):
+        with self._lock:
+            record = self.records.get(memory_id)
+            if record is None:
+                return False
+            self._remove_locked(record)
+        self._after_removal([])
+        return True
+
+    def search(self, query, limit=10, offset=0, tags=None):
+        with self._lock:
+            total, ranked = self.index.search(query, limit=limit, offset=offset, tags=tags)
+            results = []
+            for memory_id, score in ranked:
+                record = self.records[memory_id]
+                self._touch(record)
+                results.append(dict(self._to_memory(record), score=round(score, 4)))
+            return total, results
+
+    def count(self):
+        return len(self.records)
+
+    def compact(self):
+        """Rebuild the record and index dicts to release space left by removals"""
+        with self._lock:
+            self.records = OrderedDict(self.records)
+            self.index.compact()
+            self._removed_since_compaction = 0
+
+    def _compaction_loop(self):
+        while True:
+            self._compaction_needed.wait()
+            self._compaction_needed.clear()
+            if self._closed:
+                return
+            self.compact()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memories": len(self.records),
+                "bytes": self.size,
+                "tags": len(self.tags),
+                "terms": len(self.index.postings),
+                "evicted": self.evicted,
+                "max_memories": self.max_memories,
+                "max_bytes": self.max_bytes,
+                "eviction_policy": self.eviction_policy
+            }
+
+    def close(self):
+        self._closed = True
+        self._compaction_needed.set()
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """Durable store using WAL-mode SQLite with FTS5 ranking"""
+
+    def __init__(self, path, read_pool_size=4, max_batch=256):
+        self.path = path
+        self._writer = SerializedWriter(path, max_batch=max_batch, on_open=self._create_schema)
+        self._readers = ConnectionPool(path, size=read_pool_size)
+
+    @staticmethod
+    def _create_schema(conn):
+        conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _row_to_memory(row, score=None):
+        memory_id, content, tags, created_at = row[:4]
+        memory = {
+            "id": memory_id,
+            "content": content,
+            "tags": loads(tags),
+            "created_at": created_at
+        }
+        if score is not None:
+            memory["score"] = round(score, 4)
+        return memory
+
+    def submit(self, content, tags=None):
+        tags = _clean_tags(tags)
+        created_at = datetime.now().isoformat()
+        tags_json = dumps_str(tags)
+        normalized = {normalize_tag(tag) for tag in tags}
+
+        def insert(conn):
+            cursor = conn.execute(
+                "INSERT INTO memories (content, tags, created_at) VALUES (?, ?, ?)",
+                (content, tags_json, created_at)
+            )
+            memory_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO memory_tags (tag, memory_id) VALUES (?, ?)",
+                [(tag, memory_id) for tag in normalized]
+            )
+            return {"id": memory_id, "content": content, "tags": tags, "created_at": created_at}
+
+        return self._writer.submit(insert)
+
+    def get(self, memory_id):
+        with self._readers.connection() as conn:
+            row = conn.execute(
+                "SELECT id, content, tags, created_at FROM memories WHERE id = ?", (memory_id,)
+            ).fetchone()
+        return self._row_to_memory(row) if row else None
+
+    def get_many(self, memory_ids):
+        memory_ids = list(memory_ids)
+        if not memory_ids:
+            return {}
+        placeholders = ", ".join("?" * len(memory_ids))
+        with self._readers.connection() as conn:
+            rows = conn.execute(
+                f"SELECT id, content, tags, created_at FROM memories WHERE id IN ({placeholders})",
+                memory_ids
+            ).fetchall()
+        return {row[0]: self._row_to_memory(row) for row in rows}
+
+    def iter_memories(self, after_id=0, batch_size=1000):
+        while True:
+            with self._readers.connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, content, tags, created_at FROM memories WHERE id > ? ORDER BY id LIMIT ?",
+                    (after_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_memory(row)
+            after_id = rows[-1][0]
+
+    def delete(self, memory_id):
+        def remove(conn):
+            return conn.execute("DELETE FROM memories WHERE id = ?", (memory_id,)).rowcount > 0
+        return self._writer.execute(remove)
+
+    def search(self, query, limit=10, offset=0, tags=None):
+        terms = tokenize(query)
+        tag_clause = ""
+        tag_params = []
+        for tag in tags or []:
+            tag_clause += " AND m.id IN (SELECT memory_id FROM memory_tags WHERE tag = ?)"
+            tag_params.append(normalize_tag(tag))
+
+        with self._readers.connection() as conn:
+            if terms:
+                match = " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+                base = (
+                    "FROM memories_fts JOIN memories m ON m.id = memories_fts.rowid "
+                    "WHERE memories_fts MATCH ?" + tag_clause
+                )
+                params = [match, *tag_params]
+                total = conn.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+                rows = conn.execute(
+                    "SELECT m.id, m.content, m.tags, m.created_at, "
+                    f"bm25(memories_fts, {_FTS_WEIGHTS[0]}, {_FTS_WEIGHTS[1]}) AS rank "
+                    f"{base} ORDER BY rank LIMIT ? OFFSET ?",
+                    [*params, limit, offset]
+                ).fetchall()
+                # FTS5 ranks are negative, lower is better
+                return total, [self._row_to_memory(row, score=-row[4]) for row in rows]
+
+            if not tag_params:
+                return 0, []
+            base = "FROM memories m WHERE 1 = 1" + tag_clause
+            total = conn.execute(f"SELECT COUNT(*) {base}", tag_params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT m.id, m.content, m.tags, m.created_at {base} ORDER BY m.id DESC LIMIT ? OFFSET ?",
+                [*tag_params, limit, offset]
+            ).fetchall()
+            return total, [self._row_to_memory(row, score=0.0) for row in rows]
+
+    def count(self):
+        with self._readers.connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def close(self):
+        self._writer.close()
+        self._readers.close()
@@ -0,0 +1,318 @@
+"""
+Latency-aware routing of chat completions across Azure OpenAI deployments
+
+Each request is classified as a quick lookup or an analysis and sent to a
+deployment of the matching tier (``fast`` or ``large``). Within a tier,
+deployments are ranked by an exponentially weighted moving average of their
+time to first token. Repeated failures put a deployment on cooldown, errors
+before the first token fail over to the next candidate, and a stream whose
+first token is late is hedged with a second deployment; whichever answers
+first wins.
+
+Token usage is recorded per deployment, including the prompt tokens the
+provider served from its prompt cache.
+"""
+
+import asyncio
+import re
+import threading
+import time
+
+FAST_TIER = "fast"
+LARGE_TIER = "large"
+# Rough characters-per-token ratio used to estimate prompt size
+CHARS_PER_TOKEN = 4
+# Requests beyond these limits go to the large tier
+FAST_MAX_PROMPT_TOKENS = 3000
+FAST_MAX_TOOLS = 12
+# First Azure API version that accepts stream_options
+STREAM_USAGE_API_VERSION = "2024-09-01"
+_ANALYSIS_RE = re.compile(
+    r"\b(analy[sz]\w*|assess\w*|compar\w*|comprehensive|explain|forecast|plan\w*|report|review|risks?|strategy|summar\w*|why)\b",
+    re.IGNORECASE
+)
+
+
+def estimate_tokens(messages):
+    return sum(len(message.get("content") or "") for message in messages) // CHARS_PER_TOKEN
+
+
+def classify_request(messages, tools=None):
+    """Return the tier a request should run on"""
+    if estimate_tokens(messages) > FAST_MAX_PROMPT_TOKENS or len(tools or ()) > FAST_MAX_TOOLS:
+        return LARGE_TIER
+    last_user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    if len(last_user) > 600 or _ANALYSIS_RE.search(last_user):
+        return LARGE_TIER
+    return FAST_TIER
+
+
+class Deployment:
+    """One Azure OpenAI deployment and its live health statistics"""
+
+    # Weight of the newest sample in the moving averages
+    ALPHA = 0.2
+    FAILURES_BEFORE_COOLDOWN = 3
+    COOLDOWN_SECONDS = 30.0
+
+    def __init__(self, name, deployment, endpoint, api_key, api_version, tier=LARGE_TIER, region=None):
+        self.name = name
+        self.deployment = deployment
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.api_version = api_version
+        self.tier = tier
+        self.region = region
+        # Moving averages of time to first token (streams) and of whole non-streaming completions
+        self.latency = None
+        self.completion_latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            name=config.get("name") or config["deployment_name"],
+            deployment=config["deployment_name"],
+            endpoint=config["endpoint"],
+            api_key=config["api_key"],
+            api_version=config.get("api_version", "2024-02-15-preview"),
+            tier=config.get("tier", LARGE_TIER),
+            region=config.get("region")
+        )
+
+    def client(self):
+        # The SDK takes longer to import than the rest of the app; load it on first use
+        from openai import AsyncAzureOpenAI
+        return AsyncAzureOpenAI(api_key=self.api_key, api_version=self.api_version, azure_endpoint=self.endpoint)
+
+    @property
+    def streams_usage(self):
+        """Whether streamed responses can end with a usage chunk"""
+        return (self.api_version or "")[:10] >= STREAM_USAGE_API_VERSION
+
+    def available(self, now):
+        return now >= self.cooldown_until
+
+    def _average(self, average, sample):
+        return sample if average is None else average + self.ALPHA * (sample - average)
+
+    def record_success(self, latency, first_token=True):
+        """Record a successful request: its time to first token, or with
+        `first_token=False` the duration of a whole completion"""
+        with self._lock:
+            self.requests += 1
+            # Kept apart so full completions do not inflate the hedge threshold
+            if first_token:
+                self.latency = self._average(self.latency, latency)
+            else:
+                self.completion_latency = self._average(self.completion_latency, latency)
+            self.error_rate *= 1 - self.ALPHA
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.error_rate += self.ALPHA * (1 - self.error_rate)
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.FAILURES_BEFORE_COOLDOWN:
+                self.cooldown_until = time.monotonic() + self.COOLDOWN_SECONDS
+
+    def record_usage(self, usage):
+        """Count prompt tokens and how many of them hit the provider's prompt cache"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        with self._lock:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.cached_tokens += getattr(details, "cached_tokens", 0) or 0
+
+    def score(self):
+        """Expected latency inflated by the error rate; unknown deployments get tried"""
+        return (self.latency or 0.0) * (1 + 4 * self.error_rate)
+
+    def stats(self):
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        return {
+            "name": self.name, "tier": self.tier, "region": self.region, "requests": self.requests,
+            "latency_ms": ms(self.latency), "completion_latency_ms": ms(self.completion_latency),
+            "error_rate": round(self.error_rate, 3), "cooling_down": not self.available(time.monotonic()),
+            "prompt_tokens": self.prompt_tokens, "cached_tokens": self.cached_tokens
+        }
+
+
+class _StreamHandle:
+    """A started stream with its first chunk already read"""
+
+    def __init__(self, deployment, client, stream, first_chunk, owns_client):
+        self.deployment = deployment
+        self.client = client
+        self.stream = stream
+        self.first_chunk = first_chunk
+        self.owns_client = owns_client
+
+    async def close(self):
+        await self.stream.close()
+        if self.owns_client:
+            await self.client.close()
+
+
+class ModelRouter:
+    """Routes chat completions to the fastest healthy deployment of a tier"""
+
+    def __init__(self, deployments, hedge_after=2.0, hedge_factor=3.0, reuse_clients=False):
+        if not deployments:
+            raise ValueError("At least one deployment is required")
+        self.deployments = deployments
+        # Hedge once the first token is later than hedge_factor x the usual latency
+        self.hedge_after = hedge_after
+        self.hedge_factor = hedge_factor
+        # A client's connection pool is bound to one event loop. Callers that
+        # keep a single loop (the service) reuse one client per deployment;
+        # callers that run each request on a fresh loop must not.
+        self.reuse_clients = reuse_clients
+        self._clients = {}
+
+    def _client(self, deployment):
+        """Return `(client, owned)`; owned clients are closed after the request"""
+        if not self.reuse_clients:
+            return deployment.client(), True
+        client = self._clients.get(deployment.name)
+        if client is None:
+            client = self._clients[deployment.name] = deployment.client()
+        return client, False
+
+    async def aclose(self):
+        """Close the clients kept for reuse"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.close()
+
+    def candidates(self, tier):
+        """Deployments to try in order: the tier's healthy ones by score, then the rest"""
+        now = time.monotonic()
+        ranked = sorted(
+            self.deployments,
+            key=lambda d: (not d.available(now), d.tier != tier, d.score())
+        )
+        return ranked
+
+    def route(self, messages, tools=None):
+        return self.candidates(classify_request(messages, tools))
+
+    def _hedge_delay(self, deployment):
+        if deployment.latency is None:
+            return self.hedge_after
+        return max(0.5, min(self.hedge_after, deployment.latency * self.hedge_factor))
+
+    async def _start_stream(self, deployment, request):
+        client, owned = self._client(deployment)
+        if deployment.streams_usage:
+            request = dict(request, stream_options={"include_usage": True})
+        started = time.perf_counter()
+        stream = None
+        try:
+            stream = await client.chat.completions.create(model=deployment.deployment, stream=True, **request)
+            first_chunk = None
+            async for chunk in stream:
+                first_chunk = chunk
+                break
+        except BaseException as e:
+            # A hedged loser is cancelled mid-stream; release its connection
+            if stream is not None:
+                await stream.close()
+            if owned:
+                await client.close()
+            if not isinstance(e, asyncio.CancelledError):
+                deployment.record_failure()
+            raise
+        deployment.record_success(time.perf_counter() - started)
+        return _StreamHandle(deployment, client, stream, first_chunk, owned)
+
+    async def _first_stream(self, candidates, request):
+        """Start a stream, failing over on errors and hedging when the first token is late"""
+        queue = list(candidates)
+        running = {}
+        last_error = None
+        try:
+            while queue or running:
+                if not running:
+                    deployment = queue.pop(0)
+                    running[asyncio.ensure_future(self._start_stream(deployment, request))] = deployment
+                primary = next(iter(running.values()))
+                timeout = self._hedge_delay(primary) if queue and len(running) == 1 else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slow primary: race it against the next candidate
+                    deployment = queue.pop(0)
+                    running[asyncio.ensure_future(self._start_stream(deployment, request))] = deployment
+                    continue
+                winner = None
+                for task in done:
+                    running.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        # Both finished in the same wakeup; only one stream is read
+                        await task.result().close()
+                if winner is not None:
+                    return winner
+            raise last_error or RuntimeError("No deployment available")
+        finally:
+            # Losers, or every attempt when this call is cancelled
+            for task in running:
+                task.cancel()
+            for result in await asyncio.gather(*running, return_exceptions=True):
+                if isinstance(result, _StreamHandle):
+                    await result.close()
+
+    async def stream(self, request, tier=None):
+        """Yield `(deployment, chunk)` pairs of a streamed completion
+
+        `request` holds the chat completion arguments except `model` and
+        `stream`, which the router fills in. Where the API version allows it,
+        the last chunk carries the request's token usage.
+        """
+        candidates = self.candidates(tier or classify_request(request["messages"], request.get("tools")))
+        handle = await self._first_stream(candidates, request)
+        try:
+            if handle.first_chunk is not None:
+                yield handle.deployment, handle.first_chunk
+            async for chunk in handle.stream:
+                if getattr(chunk, "usage", None) is not None:
+                    handle.deployment.record_usage(chunk.usage)
+                yield handle.deployment, chunk
+        finally:
+            await handle.close()
+
+    async def complete(self, request, tier=None):
+        """Run a non-streaming completion with failover and return `(deployment, response)`"""
+        candidates = self.candidates(tier or classify_request(request["messages"], request.get("tools")))
+        last_error = None
+        for deployment in candidates:
+            client, owned = self._client(deployment)
+            started = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(model=deployment.deployment, **request)
+            except Exception as e:
+                deployment.record_failure()
+                last_error = e
+                continue
+            finally:
+                if owned:
+                    await client.close()
+            deployment.record_success(time.perf_counter() - started, first_token=False)
+            if response.usage is not None:
+                deployment.record_usage(response.usage)
+            return deployment, response
+        raise last_error or RuntimeError("No deployment available")
+
+    def stats(self):
+        return [deployment.stats() for deployment in self.deployments]
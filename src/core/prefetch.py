@@ -0,0 +1,155 @@
+"""
+Speculative execution of likely next requests
+
+`SpeculativeExecutor` runs submitted jobs on one low-priority background
+thread and keeps their results in a short-lived cache until they are taken.
+Jobs are skipped once a rolling `SpendBudget` is used up, and results are
+keyed so a change in anything the answer depends on simply misses.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from src.core.cache import TTLCache
+
+_STOP = object()
+
+
+class SpendBudget:
+    """Rolling-window allowance, e.g. tokens per hour"""
+
+    def __init__(self, limit, window=3600.0):
+        self.limit = limit
+        self.window = window
+        self._spent = deque()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._spent and self._spent[0][0] <= now - self.window:
+            self._total -= self._spent.popleft()[1]
+
+    def remaining(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return max(0, self.limit - self._total)
+
+    def charge(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            self._spent.append((now, amount))
+            self._total += amount
+
+
+class SpeculativeExecutor:
+    """Runs speculative jobs in the background and caches their results"""
+
+    def __init__(self, ttl=120.0, max_pending=8, budget=None, niceness=10):
+        self.results = TTLCache(maxsize=256, ttl=ttl)
+        self.budget = budget
+        self.niceness = niceness
+        self.stats = {"submitted": 0, "skipped": 0, "completed": 0, "failed": 0, "used": 0}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._discarded = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="speculative-executor", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, job):
+        """Queue `job()` to produce the result for `key`
+
+        `job` returns `(result, cost)`; the cost is charged to the budget.
+        Returns False when the key is already known, the queue is full or
+        the budget is spent.
+        """
+        with self._lock:
+            if key in self._pending or self.results.get(key) is not None:
+                return False
+            if self.budget is not None and self.budget.remaining() <= 0:
+                self.stats["skipped"] += 1
+                return False
+            future = Future()
+            try:
+                self._queue.put_nowait((key, job, future, self._generation))
+            except queue.Full:
+                self.stats["skipped"] += 1
+                return False
+            self._pending[key] = future
+            self.stats["submitted"] += 1
+            return True
+
+    def take(self, key, wait=0.0):
+        """Return and forget the result for `key`, waiting up to `wait` if it is still running"""
+        result = self.results.pop(key)
+        if result is None and wait:
+            with self._lock:
+                future = self._pending.get(key)
+            if future is not None:
+                try:
+                    future.result(timeout=wait)
+                except Exception:
+                    return None
+                result = self.results.pop(key)
+        if result is not None:
+            self.stats["used"] += 1
+        return result
+
+    def discard(self, keys):
+        """Forget the results for `keys`, including ones still being computed"""
+        with self._lock:
+            for key in keys:
+                self.results.pop(key)
+                if key in self._pending:
+                    self._discarded.add(key)
+
+    def clear(self):
+        """Drop cached results; jobs already running finish but are discarded"""
+        with self._lock:
+            self._generation += 1
+            self.results.clear()
+
+    def _lower_priority(self):
+        try:
+            # On Linux a thread id addresses just this thread
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.niceness)
+        except (AttributeError, OSError):
+            pass
+
+    def _run(self):
+        self._lower_priority()
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            key, job, future, generation = item
+            try:
+                if self.budget is not None and self.budget.remaining() <= 0:
+                    self.stats["skipped"] += 1
+                    future.set_result(None)
+                    continue
+                result, cost = job()
+                if self.budget is not None:
+                    self.budget.charge(cost)
+                with self._lock:
+                    if generation == self._generation and key not in self._discarded:
+                        self.results.set(key, result)
+                self.stats["completed"] += 1
+                future.set_result(result)
+            except Exception as e:
+                self.stats["failed"] += 1
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+                    self._discarded.discard(key)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
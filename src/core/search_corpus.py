@@ -0,0 +1,237 @@
+"""
+Offline document corpus with BM25 search for the Web Search MCP server
+
+HTML, Markdown and plain-text files are parsed into title + text, indexed in
+an inverted index and searched with BM25. Results carry a snippet built from
+the densest window of query terms, and an LRU cache in front of the index
+answers repeated queries until the corpus changes.
+"""
+
+import os
+import re
+import threading
+from html.parser import HTMLParser
+from pathlib import Path
+
+from src.core.cache import LRUCache
+from src.core.text_index import InvertedIndex, tokenize
+
+SUPPORTED_EXTENSIONS = {".html", ".htm", ".md", ".markdown", ".txt", ".rst"}
+SNIPPET_WORDS = 30
+
+_WORD_SPAN_RE = re.compile(r"[A-Za-z0-9]+")
+_MARKDOWN_NOISE_RE = re.compile(r"(```.*?```)|(!?\[([^\]]*)\]\([^)]*\))|[#*_>`|]", re.DOTALL)
+
+
+class _HTMLTextExtractor(HTMLParser):
+    _SKIP_TAGS = {"script", "style", "noscript", "template"}
+    _BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.heading = ""
+        self.parts = []
+        self._skip_depth = 0
+        self._in_title = False
+        self._in_h1 = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "h1":
+            self._in_h1 = True
+        if tag in self._BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        elif tag == "h1":
+            self._in_h1 = False
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title += data
+            return
+        if self._in_h1 and not self.heading:
+            self.heading = data.strip()
+        self.parts.append(data)
+
+
+def _first_line(text):
+    for line in text.splitlines():
+        if line.strip():
+            return line.strip()
+    return ""
+
+
+def extract_document(path):
+    """Return `(title, text)` for a supported document file"""
+    path = Path(path)
+    raw = path.read_text(encoding="utf-8", errors="replace")
+    suffix = path.suffix.lower()
+
+    if suffix in (".html", ".htm"):
+        parser = _HTMLTextExtractor()
+        parser.feed(raw)
+        text = re.sub(r"[ \t]+", " ", "".join(parser.parts))
+        title = parser.title.strip() or parser.heading or path.stem
+        return title, text.strip()
+
+    if suffix in (".md", ".markdown"):
+        title = ""
+        for line in raw.splitlines():
+            if line.startswith("# "):
+                title = line[2:].strip()
+                break
+        text = _MARKDOWN_NOISE_RE.sub(lambda m: m.group(3) or " ", raw)
+        return title or path.stem, text.strip()
+
+    return _first_line(raw) or path.stem, raw.strip()
+
+
+def build_snippet(text, query_terms, max_words=SNIPPET_WORDS):
+    """Return the window of `text` containing the most distinct query terms"""
+    words = list(_WORD_SPAN_RE.finditer(text))
+    if not words:
+        return ""
+    if len(words) <= max_words:
+        return " ".join(text.split())
+
+    terms = set(query_terms)
+    best_start = 0
+    best_hits = 0
+    counts = {}
+    for index, match in enumerate(words):
+        token = match.group().lower()
+        if token in terms:
+            counts[token] = counts.get(token, 0) + 1
+        start = index - max_words + 1
+        if start > 0:
+            dropped = words[start - 1].group().lower()
+            if dropped in terms:
+                counts[dropped] -= 1
+                if not counts[dropped]:
+                    del counts[dropped]
+        if len(counts) > best_hits:
+            best_hits = len(counts)
+            best_start = max(start, 0)
+
+    end = min(best_start + max_words, len(words)) - 1
+    snippet = " ".join(text[words[best_start].start():words[end].end()].split())
+    prefix = "..." if best_start > 0 else ""
+    suffix = "..." if end < len(words) - 1 else ""
+    return f"{prefix}{snippet}{suffix}"
+
+
+class DocumentCorpus:
+    """Local document collection searchable like a web index"""
+
+    def __init__(self, cache_size=256):
+        self.index = InvertedIndex()
+        self.documents = {}
+        self.cache = LRUCache(cache_size)
+        self._paths = {}
+        self._next_id = 1
+        # Bumped on every change, so a search only caches results computed from the current documents
+        self._generation = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add_document(self, path, title, text, signature=None):
+        """Index one document, replacing an older version of the same path"""
+        path = os.path.abspath(path)
+        with self._lock:
+            doc_id = self._paths.get(path)
+            if doc_id is None:
+                doc_id = self._next_id
+                self._next_id += 1
+                self._paths[path] = doc_id
+            self.documents[doc_id] = {
+                "path": path,
+                "url": Path(path).as_uri(),
+                "title": title,
+                "text": text,
+                "signature": signature
+            }
+            # Title terms are indexed as tags so matches there rank higher
+            self.index.add(doc_id, f"{title}\n{text}", tags=tokenize(title))
+            self._generation += 1
+            self.cache.clear()
+        return doc_id
+
+    def remove_document(self, path):
+        with self._lock:
+            doc_id = self._paths.pop(os.path.abspath(path), None)
+            if doc_id is None:
+                return False
+            self.documents.pop(doc_id)
+            self.index.remove(doc_id)
+            self._generation += 1
+            self.cache.clear()
+            return True
+
+    def ingest(self, root):
+        """Index supported files under `root`, skipping files that have not changed
+
+        Raises FileNotFoundError when `root` does not exist.
+        """
+        root = Path(root)
+        if not root.exists():
+            raise FileNotFoundError(f"No such file or directory: {root}")
+        files = [root] if root.is_file() else [
+            path for path in sorted(root.rglob("*"))
+            if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS
+        ]
+        added = updated = unchanged = 0
+        for path in files:
+            stat = path.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            doc_id = self._paths.get(os.path.abspath(path))
+            if doc_id is not None and self.documents[doc_id]["signature"] == signature:
+                unchanged += 1
+                continue
+            title, text = extract_document(path)
+            self.add_document(path, title, text, signature=signature)
+            if doc_id is None:
+                added += 1
+            else:
+                updated += 1
+        return {"added": added, "updated": updated, "unchanged": unchanged, "documents": len(self.documents)}
+
+    def search(self, query, max_results=5):
+        """Return `(results, cached)` for a query, served from the cache when possible"""
+        terms = tokenize(query)
+        key = (tuple(sorted(set(terms))), max_results)
+        results = self.cache.get(key)
+        if results is not None:
+            return results, True
+
+        with self._lock:
+            generation = self._generation
+            _, ranked = self.index.search(query, limit=max_results)
+            hits = [(self.documents[doc_id], score) for doc_id, score in ranked]
+        # Documents are replaced rather than mutated, so snippets can be built outside the lock
+        results = [
+            {
+                "title": document["title"],
+                "url": document["url"],
+                "snippet": build_snippet(document["text"], terms),
+                "score": round(score, 4)
+            }
+            for document, score in hits
+        ]
+        with self._lock:
+            # A document added or removed meanwhile cleared the cache; do not refill it with older results
+            if generation == self._generation:
+                self.cache.set(key, results)
+        return results, False
@@ -0,0 +1,270 @@
+"""
+JSON serialization for chat messages, tool schemas and tool payloads
+
+Everything that crosses a process or network boundary is encoded here. The
+fastest available backend is picked at import time: orjson, then msgspec,
+then the stdlib `json` module. All backends produce compact UTF-8 JSON and
+raise `DecodeError` on malformed input.
+
+Typed structs such as `LinearTicket` are msgspec Structs when msgspec is
+installed, so `decode_as` builds them straight from the JSON bytes without an
+intermediate dict; otherwise they are plain dataclasses. orjson has no typed
+decoder, so with orjson alone `decode_as` still goes through a dict.
+"""
+
+import dataclasses
+import hashlib
+import json
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = "orjson"
+elif msgspec is not None:
+    BACKEND = "msgspec"
+else:
+    BACKEND = "json"
+
+
+class DecodeError(ValueError):
+    """Raised for malformed JSON or JSON that does not fit the requested type"""
+
+
+class Fragment:
+    """Already-encoded JSON embedded as-is in a larger document"""
+
+    __slots__ = ("data", "_value")
+
+    def __init__(self, data, value=None):
+        self.data = data
+        self._value = value
+
+    @property
+    def value(self):
+        if self._value is None:
+            self._value = loads(self.data)
+        return self._value
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+    _ORJSON_FRAGMENT = getattr(orjson, "Fragment", None)
+
+    def _orjson_default(obj):
+        if isinstance(obj, Fragment):
+            return _ORJSON_FRAGMENT(obj.data) if _ORJSON_FRAGMENT else obj.value
+        if dataclasses.is_dataclass(obj):
+            return dataclasses.asdict(obj)
+        return str(obj)
+
+    def dumps(obj):
+        """Encode `obj` as compact UTF-8 JSON bytes, stringifying unknown types"""
+        return orjson.dumps(obj, default=_orjson_default, option=_ORJSON_OPTIONS)
+
+    def loads(data):
+        """Decode JSON from bytes or str"""
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError as e:
+            raise DecodeError(str(e)) from None
+
+elif msgspec is not None:
+    def _msgspec_hook(obj):
+        if isinstance(obj, Fragment):
+            return msgspec.Raw(obj.data)
+        return str(obj)
+
+    _encoder = msgspec.json.Encoder(enc_hook=_msgspec_hook)
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(obj):
+        """Encode `obj` as compact UTF-8 JSON bytes, stringifying unknown types"""
+        return _encoder.encode(obj)
+
+    def loads(data):
+        """Decode JSON from bytes or str"""
+        try:
+            return _decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise DecodeError(str(e)) from None
+
+else:
+    def _json_default(obj):
+        if isinstance(obj, Fragment):
+            return obj.value
+        if dataclasses.is_dataclass(obj):
+            return dataclasses.asdict(obj)
+        return str(obj)
+
+    _json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+    def dumps(obj):
+        """Encode `obj` as compact UTF-8 JSON bytes, stringifying unknown types"""
+        return _json_encoder.encode(obj).encode("utf-8")
+
+    def loads(data):
+        """Decode JSON from bytes or str"""
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError as e:
+            raise DecodeError(str(e)) from None
+
+
+def dumps_str(obj):
+    """Encode `obj` as a JSON string"""
+    return dumps(obj).decode("utf-8")
+
+
+if msgspec is not None:
+    class LinearTicket(msgspec.Struct, kw_only=True):
+        """Arguments of the `show_linear_ticket` tool"""
+        title: str = "Untitled"
+        status: str = "Todo"
+        assignee: str = "Unassigned"
+        deadline: str = "No deadline"
+        tags: list = []
+
+    def decode_as(data, cls):
+        """Decode JSON directly into an instance of the struct `cls`"""
+        try:
+            return msgspec.json.decode(data, type=cls)
+        except (msgspec.DecodeError, msgspec.ValidationError) as e:
+            raise DecodeError(str(e)) from None
+
+else:
+    @dataclasses.dataclass
+    class LinearTicket:
+        """Arguments of the `show_linear_ticket` tool"""
+        title: str = "Untitled"
+        status: str = "Todo"
+        assignee: str = "Unassigned"
+        deadline: str = "No deadline"
+        tags: list = dataclasses.field(default_factory=list)
+
+    _FIELD_NAMES = {}
+
+    def decode_as(data, cls):
+        """Decode JSON into an instance of the dataclass `cls`, ignoring unknown keys"""
+        value = loads(data)
+        if not isinstance(value, dict):
+            raise DecodeError(f"Expected a JSON object for {cls.__name__}")
+        names = _FIELD_NAMES.get(cls)
+        if names is None:
+            names = _FIELD_NAMES[cls] = frozenset(field.name for field in dataclasses.fields(cls))
+        try:
+            return cls(**{key: item for key, item in value.items() if key in names})
+        except TypeError as e:
+            raise DecodeError(str(e)) from None
+
+
+def openai_tool(tool):
+    """Convert an MCP-style tool definition into the OpenAI function-tool format"""
+    return {
+        "type": "function",
+        "function": {
+            "name": tool["name"],
+            "description": tool["description"],
+            "parameters": tool["input_schema"]
+        }
+    }
+
+
+class EncodedList(list):
+    """A list that also carries its canonical encoding as a `Fragment`
+
+    It passes for a plain list everywhere, while `canonical` (and therefore
+    `digest`) uses the stored bytes instead of copying and encoding it again.
+    Treated as immutable.
+    """
+
+    __slots__ = ("fragment",)
+
+    def __init__(self, items):
+        super().__init__(items)
+        self.fragment = Fragment(dumps([canonical(item) for item in self]), self)
+
+
+def canonical(value):
+    """Copy of a JSON value with every object's keys in sorted order
+
+    The OpenAI client encodes dicts in insertion order, so equal schemas built
+    in different orders would otherwise serialize to different bytes.
+    """
+    if isinstance(value, EncodedList):
+        return value.fragment
+    if isinstance(value, Fragment):
+        return value
+    if isinstance(value, dict):
+        return {key: canonical(value[key]) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    return value
+
+
+def digest(value):
+    """Short hash of a JSON value that ignores object key order, for use as a dict key"""
+    return hashlib.blake2b(dumps(canonical(value)), digest_size=16).digest()
+
+
+class ToolSchemaCache:
+    """Converts and encodes tool lists once per distinct set of tool definitions
+
+    Entries are keyed by the `digest` of the tool list, so equal definitions
+    share an entry however often they are decoded or rebuilt. Tool
+    definitions are treated as immutable.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, tools, key=None):
+        tools = list(tools)
+        key = key or digest(tools)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                converted = [openai_tool(tool) for tool in tools]
+                entry = {"openai": converted, "canonical": None}
+                if len(self._entries) >= self.maxsize:
+                    self._entries.pop(next(iter(self._entries)))
+            # Most recently used last
+            self._entries[key] = entry
+            return entry
+
+    def openai_tools(self, tools, key=None):
+        """Return the OpenAI-format tool list for `tools`; `key` is their digest when already known"""
+        return self._entry(tools, key)["openai"]
+
+    def canonical_tools(self, tools, key=None):
+        """Return the OpenAI-format tool list sorted by name with canonical key order
+
+        The result is byte-for-byte the same for the same set of tools in any
+        order, which keeps the request prefix cacheable by the provider. It is
+        an `EncodedList`, so digesting a request that carries it does not
+        encode the tools again.
+        """
+        entry = self._entry(tools, key)
+        if entry["canonical"] is None:
+            converted = [canonical(tool) for tool in entry["openai"]]
+            entry["canonical"] = EncodedList(
+                sorted(converted, key=lambda tool: (tool["function"]["name"], dumps(tool)))
+            )
+        return entry["canonical"]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tool_schemas = ToolSchemaCache()
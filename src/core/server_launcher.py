@@ -0,0 +1,205 @@
+"""
+Launcher for the demo MCP servers
+
+Two modes are supported:
+
+- ``single-loop`` hosts every selected server on one asyncio event loop, which
+  keeps the memory footprint of a full demo setup to a single process.
+- ``multi-process`` runs each server in its own worker process. With
+  ``--workers N`` every server gets N workers sharing its port through
+  SO_REUSEPORT, so CPU-heavy tools scale across cores.
+
+The launcher prints ``READY`` (and optionally writes ``--ready-file``) only
+after every listener is bound, so clients never race startup. SIGINT/SIGTERM
+trigger a coordinated shutdown of all servers and workers.
+
+Usage:
+    python -m src.core.server_launcher --mode single-loop
+    python -m src.core.server_launcher --mode multi-process --workers 4 --servers memory,sqlite
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from src.core.demo_mcp_servers import DEMO_SERVERS, start_demo_servers
+
+READY_TIMEOUT = 30
+SHUTDOWN_TIMEOUT = 10
+
+
+def _write_ready_file(path, servers):
+    """Atomically publish the bound servers for clients waiting on startup"""
+    if not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"pid": os.getpid(), "servers": servers}, f)
+    os.replace(temp_path, path)
+
+
+def _install_signal_handlers(loop, stop_event):
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            # Signal handlers can only be installed from the main thread
+            pass
+
+
+async def serve_single_loop(server_ids, host="127.0.0.1", reuse_port=False, on_ready=None):
+    """Host the selected servers on the current event loop until a stop signal"""
+    stop_event = asyncio.Event()
+    _install_signal_handlers(asyncio.get_running_loop(), stop_event)
+
+    started = await start_demo_servers(server_ids, host=host, reuse_port=reuse_port)
+    if len(started) != len(server_ids):
+        for server in started.values():
+            await server.stop()
+        raise RuntimeError("Not all servers could be started")
+
+    if on_ready is not None:
+        on_ready({server_id: server.port for server_id, server in started.items()})
+    try:
+        await stop_event.wait()
+    finally:
+        await asyncio.gather(*(server.stop() for server in started.values()), return_exceptions=True)
+
+
+def _worker_main(server_id, host, workers, ready_queue):
+    """Entry point of a worker process hosting a single server"""
+    # The parent coordinates shutdown, ignore the terminal's Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    reuse_port = workers > 1
+    DEMO_SERVERS[server_id].workers = workers
+
+    def on_ready(ports):
+        ready_queue.put((server_id, os.getpid(), ports[server_id], None))
+
+    try:
+        asyncio.run(serve_single_loop([server_id], host=host, reuse_port=reuse_port, on_ready=on_ready))
+    except Exception as e:
+        ready_queue.put((server_id, os.getpid(), None, str(e)))
+        sys.exit(1)
+
+
+def run_multi_process(server_ids, host="127.0.0.1", workers=1, ready_file=None):
+    """Run one or more worker processes per server and supervise them"""
+    context = multiprocessing.get_context("spawn")
+    ready_queue = context.Queue()
+    processes = []
+    for server_id in server_ids:
+        for _ in range(workers):
+            process = context.Process(
+                target=_worker_main,
+                args=(server_id, host, workers, ready_queue),
+                name=f"mcp-{server_id}",
+                daemon=False
+            )
+            process.start()
+            processes.append(process)
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    exit_code = 0
+    try:
+        ready = {}
+        deadline = time.monotonic() + READY_TIMEOUT
+        while len(ready) < len(processes) and not stopping:
+            try:
+                server_id, pid, port, error = ready_queue.get(timeout=0.2)
+            except Exception:
+                if time.monotonic() > deadline or any(not p.is_alive() for p in processes):
+                    print("❌ Workers failed to become ready", file=sys.stderr)
+                    exit_code = 1
+                    return exit_code
+                continue
+            if error:
+                print(f"❌ {server_id} worker {pid} failed: {error}", file=sys.stderr)
+                exit_code = 1
+                return exit_code
+            ready[pid] = (server_id, port)
+
+        if stopping:
+            return exit_code
+        servers = {}
+        for server_id, port in ready.values():
+            servers.setdefault(server_id, {"port": port, "workers": 0})["workers"] += 1
+        _write_ready_file(ready_file, servers)
+        print("READY", json.dumps(servers), flush=True)
+
+        while not stopping:
+            for process in processes:
+                if not process.is_alive():
+                    print(f"❌ Worker {process.name} (pid {process.pid}) exited, shutting down", file=sys.stderr)
+                    exit_code = 1
+                    stopping = True
+                    break
+            time.sleep(0.2)
+        return exit_code
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        if ready_file and os.path.exists(ready_file):
+            os.remove(ready_file)
+        print("Stopped demo servers.", flush=True)
+
+
+def run_single_loop(server_ids, host="127.0.0.1", ready_file=None):
+    def on_ready(ports):
+        servers = {server_id: {"port": port, "workers": 1} for server_id, port in ports.items()}
+        _write_ready_file(ready_file, servers)
+        print("READY", json.dumps(servers), flush=True)
+
+    try:
+        asyncio.run(serve_single_loop(server_ids, host=host, on_ready=on_ready))
+    except RuntimeError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    finally:
+        if ready_file and os.path.exists(ready_file):
+            os.remove(ready_file)
+    print("Stopped demo servers.", flush=True)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the demo MCP servers")
+    parser.add_argument("--mode", choices=["single-loop", "multi-process"], default="single-loop")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes per server (multi-process mode)")
+    parser.add_argument("--servers", default=",".join(DEMO_SERVERS), help="Comma-separated server ids")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--ready-file", help="Write bound servers as JSON here once all are listening")
+    args = parser.parse_args(argv)
+
+    server_ids = [server_id.strip() for server_id in args.servers.split(",") if server_id.strip()]
+    unknown = [server_id for server_id in server_ids if server_id not in DEMO_SERVERS]
+    if unknown:
+        parser.error(f"Unknown servers: {', '.join(unknown)} (available: {', '.join(DEMO_SERVERS)})")
+
+    if args.mode == "multi-process":
+        return run_multi_process(server_ids, host=args.host, workers=max(1, args.workers), ready_file=args.ready_file)
+    return run_single_loop(server_ids, host=args.host, ready_file=args.ready_file)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""
+Session state kept outside the worker process
+
+Any worker can serve any session when the state a session needs between
+requests lives in a shared backend instead of process memory. A session is
+a set of named fields, each stored as its own JSON value, plus a version
+number. `SessionState` remembers what it loaded, so a save sends only the
+fields whose encoding changed, guarded by the version it started from
+(optimistic concurrency). If another worker saved in between, the save
+raises `VersionConflict`; `SessionState.update` reloads and reapplies the
+change.
+
+Conversations are not session state: they live in the chat history store
+and sessions only point at one.
+
+Backends:
+
+- `InMemorySessionStateBackend`: a dict in this process, for tests and
+  single-worker runs
+- `SQLiteSessionStateBackend`: a SQLite file shared by every worker on a host
+"""
+
+import os
+import threading
+import time
+
+from src.core.serialization import dumps_str, loads
+from src.core.sqlite_pool import ConnectionPool, SerializedWriter, connect
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sessions_accessed ON sessions(accessed_at);
+CREATE TABLE IF NOT EXISTS session_fields (
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (session_id, key)
+) WITHOUT ROWID;
+"""
+
+
+class VersionConflict(Exception):
+    """Raised when a session was saved by someone else since it was loaded"""
+
+    def __init__(self, session_id, expected, actual):
+        super().__init__(f"Session {session_id} is at version {actual}, expected {expected}")
+        self.session_id = session_id
+        self.expected = expected
+        self.actual = actual
+
+
+class SessionStateBackend:
+    """Common interface for session state backends
+
+    Field values cross this interface as JSON strings.
+    """
+
+    def load(self, session_id, known_version=None):
+        """Return `(version, {key: json})`, `(version, None)` when still at
+        `known_version`, or None when the session does not exist"""
+        raise NotImplementedError
+
+    def save(self, session_id, expected_version, changed, removed=()):
+        """Write changed fields and drop removed ones if the session is still at
+        `expected_version` (0 creates it); return the new version"""
+        raise NotImplementedError
+
+    def touch(self, session_id):
+        """Record that the session is in use without changing its version"""
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        raise NotImplementedError
+
+    def expire(self, max_idle):
+        """Delete sessions unused for `max_idle` seconds and return how many"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class InMemorySessionStateBackend(SessionStateBackend):
+    """Session state in this process only"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id, known_version=None):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry["version"] == known_version:
+                return entry["version"], None
+            return entry["version"], dict(entry["fields"])
+
+    def save(self, session_id, expected_version, changed, removed=()):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            actual = entry["version"] if entry is not None else 0
+            if actual != expected_version:
+                raise VersionConflict(session_id, expected_version, actual)
+            if entry is None:
+                entry = self._sessions[session_id] = {"version": 0, "fields": {}}
+            entry["fields"].update(changed)
+            for key in removed:
+                entry["fields"].pop(key, None)
+            entry["version"] += 1
+            entry["accessed_at"] = time.time()
+            return entry["version"]
+
+    def touch(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry["accessed_at"] = time.time()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def expire(self, max_idle):
+        cutoff = time.time() - max_idle
+        with self._lock:
+            idle = [session_id for session_id, entry in self._sessions.items() if entry["accessed_at"] < cutoff]
+            for session_id in idle:
+                del self._sessions[session_id]
+        return len(idle)
+
+
+class SQLiteSessionStateBackend(SessionStateBackend):
+    """Session state in a SQLite database that every worker process opens
+
+    Saves go through the process's serialized writer; the version check and
+    the field writes share one transaction, so concurrent saves from any
+    number of processes cannot interleave.
+    """
+
+    def __init__(self, path, pool_size=4):
+        self.path = path
+        conn = connect(path)
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        self._pool = ConnectionPool(path, size=pool_size)
+        self._writer = SerializedWriter(path)
+
+    def load(self, session_id, known_version=None):
+        with self._pool.connection() as conn:
+            # One read transaction, so the version and fields match
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                if row is None:
+                    return None
+                if row[0] == known_version:
+                    return row[0], None
+                fields = conn.execute(
+                    "SELECT key, value FROM session_fields WHERE session_id = ?", (session_id,)
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+        return row[0], dict(fields)
+
+    def save(self, session_id, expected_version, changed, removed=()):
+        def write(conn):
+            now = time.time()
+            if expected_version == 0:
+                inserted = conn.execute(
+                    "INSERT INTO sessions (session_id, version, updated_at, accessed_at) VALUES (?, 1, ?, ?) "
+                    "ON CONFLICT(session_id) DO NOTHING",
+                    (session_id, now, now)
+                ).rowcount
+            else:
+                inserted = conn.execute(
+                    "UPDATE sessions SET version = version + 1, updated_at = ?, accessed_at = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (now, now, session_id, expected_version)
+                ).rowcount
+            if not inserted:
+                row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                raise VersionConflict(session_id, expected_version, row[0] if row else 0)
+            if changed:
+                conn.executemany(
+                    "INSERT INTO session_fields (session_id, key, value) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id, key) DO UPDATE SET value = excluded.value",
+                    [(session_id, key, value) for key, value in changed.items()]
+                )
+            if removed:
+                conn.executemany(
+                    "DELETE FROM session_fields WHERE session_id = ? AND key = ?",
+                    [(session_id, key) for key in removed]
+                )
+            return expected_version + 1
+
+        return self._writer.execute(write)
+
+    def touch(self, session_id):
+        # Nothing waits on it; it is committed with the next group of writes
+        self._writer.submit(lambda conn: conn.execute(
+            "UPDATE sessions SET accessed_at = ? WHERE session_id = ?", (time.time(), session_id)
+        ))
+
+    def delete(self, session_id):
+        def delete(conn):
+            conn.execute("DELETE FROM session_fields WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+        self._writer.execute(delete)
+
+    def expire(self, max_idle):
+        def expire(conn):
+            cutoff = time.time() - max_idle
+            conn.execute(
+                "DELETE FROM session_fields WHERE session_id IN "
+                "(SELECT session_id FROM sessions WHERE accessed_at < ?)",
+                (cutoff,)
+            )
+            return conn.execute("DELETE FROM sessions WHERE accessed_at < ?", (cutoff,)).rowcount
+
+        return self._writer.execute(expire)
+
+    def close(self):
+        self._writer.close()
+        self._pool.close()
+
+
+class SessionState:
+    """One session's fields, tracking what changed since they were loaded or saved"""
+
+    def __init__(self, backend, session_id):
+        self.backend = backend
+        self.session_id = session_id
+        self.version = 0
+        self._values = {}
+        # The JSON last loaded or saved per field, to find the changed ones
+        self._stored = {}
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        del self._values[key]
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def keys(self):
+        return self._values.keys()
+
+    def load(self):
+        """Bring the fields up to the stored version; return False if the session does not exist
+
+        Costs one version lookup when nothing changed since the last load or save.
+        """
+        result = self.backend.load(self.session_id, known_version=self.version or None)
+        if result is None:
+            return False
+        version, fields = result
+        if fields is not None:
+            self._stored = fields
+            self._values = {key: loads(value) for key, value in fields.items()}
+            self.version = version
+        return True
+
+    def changes(self):
+        """Return `(changed, removed)`: JSON of fields that differ from storage, and dropped keys"""
+        changed = {}
+        for key, value in self._values.items():
+            encoded = dumps_str(value)
+            if self._stored.get(key) != encoded:
+                changed[key] = encoded
+        removed = [key for key in self._stored if key not in self._values]
+        return changed, removed
+
+    def save(self):
+        """Write the changed fields; return False when there was nothing to write
+
+        Raises `VersionConflict` when the session was saved elsewhere since
+        it was loaded.
+        """
+        changed, removed = self.changes()
+        if self.version and not changed and not removed:
+            return False
+        self.version = self.backend.save(self.session_id, self.version, changed, removed)
+        self._stored.update(changed)
+        for key in removed:
+            del self._stored[key]
+        return True
+
+    def update(self, mutate, retries=3):
+        """Apply `mutate(state)` and save it, reloading and reapplying on conflicts
+
+        Returns what `mutate` returned. `mutate` may run more than once.
+        """
+        for attempt in range(retries + 1):
+            result = mutate(self)
+            try:
+                self.save()
+                return result
+            except VersionConflict:
+                if attempt == retries or not self.load():
+                    raise
+
+    def reset(self):
+        """Treat the session as never saved, keeping its values, so the next save creates it again"""
+        self.version = 0
+        self._stored = {}
+
+    def delete(self):
+        self.backend.delete(self.session_id)
+        self.version = 0
+        self._values = {}
+        self._stored = {}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_session_state_backend():
+    """Build the backend configured by the SESSION_STATE_* environment variables"""
+    backend_name = os.getenv("SESSION_STATE_BACKEND", "sqlite")
+    if backend_name == "sqlite":
+        return SQLiteSessionStateBackend(os.getenv("SESSION_STATE_DB_PATH", "session_state.sqlite3"))
+    if backend_name == "memory":
+        return InMemorySessionStateBackend()
+    raise ValueError(f"Unknown session state backend: {backend_name}")
+
+
+def get_session_state_backend():
+    """Return the process-wide session state backend"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_session_state_backend()
+    return _backend
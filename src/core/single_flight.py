@@ -0,0 +1,158 @@
+"""
+Single-flight coalescing of identical concurrent calls
+
+When several callers make the same request at the same moment, only the
+first (the leader) runs it; the others wait for the leader's outcome instead
+of repeating the upstream work. Nothing is cached: once a call finishes, the
+next identical call runs again.
+
+`SingleFlight.do` coalesces blocking calls across threads. `SingleFlight.stream`
+coalesces async iterators, including across threads that each run their own
+event loop (every Streamlit script run does): items the leader receives are
+fanned out to every waiter, and a waiter that joins late first gets the items
+it missed. Waiters share the leader's result objects, so they must not
+mutate them.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+async def _aclose(iterator):
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+class FlightAborted(Exception):
+    """Raised to waiters when the leader stopped consuming a shared stream before its end"""
+
+
+class _Flight:
+    """Items of one shared stream and the waiters to notify of new ones"""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.waiters = []
+        self.lock = threading.Lock()
+
+    def _notify(self):
+        for loop, event in self.waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The waiter's event loop has closed; it is no longer listening
+                pass
+
+    def publish(self, item):
+        with self.lock:
+            self.items.append(item)
+            self._notify()
+
+    def finish(self, error=None):
+        with self.lock:
+            self.done = True
+            self.error = error
+            self._notify()
+
+
+class SingleFlight:
+    """Runs each distinct in-flight call once, keyed by a caller-chosen hashable key"""
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key, fn):
+        """Return `fn()`, or the result of the identical call already in flight
+
+        Exceptions raised by the leader's `fn` are raised to every waiter.
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._forget(self._calls, key, future)
+            future.set_exception(e)
+            raise
+        self._forget(self._calls, key, future)
+        future.set_result(result)
+        return result
+
+    def _forget(self, flights, key, flight):
+        # Removed before the outcome is published, so later callers start a new call
+        with self._lock:
+            if flights.get(key) is flight:
+                del flights[key]
+
+    async def stream(self, key, open_stream):
+        """Iterate `open_stream()`, or join the identical stream already in flight
+
+        `open_stream` returns an async iterator and is only called by the
+        leader. The leader's consumer sets the pace; waiters receive every
+        item from the first one on.
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _Flight()
+            else:
+                self.stats["shared"] += 1
+
+        if not leader:
+            waiter = (asyncio.get_running_loop(), asyncio.Event())
+            with flight.lock:
+                flight.waiters.append(waiter)
+            position = 0
+            try:
+                while True:
+                    # Cleared before reading, so an item published meanwhile sets it again
+                    waiter[1].clear()
+                    with flight.lock:
+                        items = flight.items[position:]
+                        done, error = flight.done, flight.error
+                    for item in items:
+                        yield item
+                    position += len(items)
+                    if done:
+                        if error is not None:
+                            raise error
+                        return
+                    await waiter[1].wait()
+            finally:
+                with flight.lock:
+                    flight.waiters.remove(waiter)
+
+        source = open_stream()
+        try:
+            async for item in source:
+                flight.publish(item)
+                yield item
+        except (GeneratorExit, asyncio.CancelledError):
+            self._forget(self._streams, key, flight)
+            flight.finish(FlightAborted("The shared request was abandoned by the caller that started it"))
+            await _aclose(source)
+            raise
+        except BaseException as e:
+            self._forget(self._streams, key, flight)
+            flight.finish(e)
+            raise
+        self._forget(self._streams, key, flight)
+        flight.finish()
@@ -0,0 +1,214 @@
+"""
+Connection pooling and serialized writes for SQLite-backed servers
+
+SQLite in WAL mode allows many concurrent readers alongside one writer. Reads
+borrow a connection from a fixed-size pool, while every write goes through a
+single writer thread that groups queued operations into one transaction.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+_STOP = object()
+
+
+def connect(path, read_only=False, cached_statements=256):
+    """Open a SQLite connection tuned for concurrent WAL access
+
+    Read-only connections are opened with `mode=ro`, so SQL run on them cannot
+    write even after turning `query_only` off.
+    """
+    if read_only:
+        target = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+    else:
+        target = path
+    conn = sqlite3.connect(
+        target,
+        check_same_thread=False,
+        cached_statements=cached_statements,
+        isolation_level=None,
+        uri=read_only
+    )
+    if not read_only:
+        # Read-only connections cannot change the journal mode; the writer sets it for the file
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class ConnectionPool:
+    """Fixed-size pool of read-only connections"""
+
+    def __init__(self, path, size=4, cached_statements=256):
+        self.path = path
+        self.size = size
+        self._cached_statements = cached_statements
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self, timeout=None):
+        """Borrow a connection, opening a new one while under the pool size"""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return connect(self.path, read_only=True, cached_statements=self._cached_statements)
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Timed out waiting for a pooled connection")
+
+    def release(self, conn):
+        """Return a borrowed connection to the pool"""
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout=timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class SerializedWriter:
+    """Single writer thread that commits queued operations in groups
+
+    Each submitted operation is a callable taking the writer connection. All
+    operations drained from the queue in one pass share a transaction, so many
+    concurrent writers pay for a single commit.
+    """
+
+    def __init__(self, path, max_batch=256, on_open=None):
+        self.path = path
+        self.max_batch = max_batch
+        self._on_open = on_open
+        self._queue = queue.Queue()
+        self._ready = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=f"sqlite-writer:{path}", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, operation):
+        """Queue `operation(conn)` and return a Future for its result"""
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def execute(self, operation):
+        """Run `operation(conn)` on the writer thread and wait for the commit"""
+        return self.submit(operation).result()
+
+    def _run(self):
+        try:
+            conn = connect(self.path)
+            if self._on_open is not None:
+                self._on_open(conn)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            operations = []
+            for item in batch:
+                if item is _STOP:
+                    stopping = True
+                elif item[1].set_running_or_notify_cancel():
+                    operations.append(item)
+            if operations:
+                self._run_batch(conn, operations)
+
+        conn.close()
+
+    @staticmethod
+    def _run_batch(conn, operations):
+        # Failures here fail the batch's futures; the writer thread keeps running for later writes
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except Exception as e:
+            for _, future in operations:
+                future.set_exception(e)
+            return
+        pending = []
+        for operation, future in operations:
+            try:
+                if not conn.in_transaction:
+                    # An earlier operation ended the transaction itself
+                    conn.execute("BEGIN IMMEDIATE")
+                conn.execute("SAVEPOINT op")
+                result = operation(conn)
+                conn.execute("RELEASE op")
+            except Exception as e:
+                try:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK TO op")
+                        conn.execute("RELEASE op")
+                except sqlite3.Error:
+                    pass
+                future.set_exception(e)
+                continue
+            pending.append((future, result))
+        try:
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            for future, _ in pending:
+                future.set_exception(e)
+            return
+        for future, result in pending:
+            future.set_result(result)
+
+    def close(self):
+        """Flush queued writes and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
@@ -0,0 +1,176 @@
+"""
+Declarative task and quick-action catalog with compiled permission bitsets
+
+Tasks and actions are defined in `src/config/task_catalog.json`. Each entry
+may list the permissions it `requires` (all of them) and the `roles` it is
+shown to. Permission names are compiled to bits once, so a check is a single
+AND, and the entries visible to each (role, permission mask) pair are
+computed once and shared by every session. The catalog reloads itself when
+its definition file changes.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+from src.core.serialization import loads
+
+CATALOG_PATH = Path(__file__).resolve().parents[1] / "config" / "task_catalog.json"
+# How often, at most, the definition file is checked for changes
+RELOAD_CHECK_INTERVAL = 2.0
+_ENTRY_KEYS = ("requires", "roles")
+
+
+class PermissionRegistry:
+    """Maps permission names to bit positions
+
+    Only `register` assigns bits, so looking up arbitrary names cannot use
+    them up; an unknown name has no bit (0).
+    """
+
+    def __init__(self, names=()):
+        self._bits = {}
+        self._lock = threading.Lock()
+        self.register(names)
+
+    def register(self, names):
+        """Assign bits to names that have none and return their bitset"""
+        mask = 0
+        for name in names:
+            bit = self._bits.get(name)
+            if bit is None:
+                with self._lock:
+                    bit = self._bits.setdefault(name, 1 << len(self._bits))
+            mask |= bit
+        return mask
+
+    def bit(self, name):
+        return self._bits.get(name, 0)
+
+    def mask(self, names):
+        """Compile a collection of permission names into an integer bitset, ignoring unknown names"""
+        mask = 0
+        for name in names:
+            mask |= self.bit(name)
+        return mask
+
+    def names(self, mask):
+        return [name for name, bit in self._bits.items() if mask & bit]
+
+    @staticmethod
+    def has(mask, bit):
+        return mask & bit == bit
+
+
+class TaskCatalog:
+    """Compiled task and action definitions with memoized per-role views"""
+
+    def __init__(self, path=CATALOG_PATH, check_interval=RELOAD_CHECK_INTERVAL):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.version = 0
+        # Bits are only ever added, so masks compiled earlier stay valid across reloads
+        self.permissions = PermissionRegistry()
+        self._lock = threading.Lock()
+        self._signature = None
+        self._next_check = 0.0
+        self._load()
+
+    def _load(self):
+        stat = os.stat(self.path)
+        with open(self.path, "rb") as f:
+            definition = loads(f.read())
+        permissions = self.permissions
+        permissions.register(definition.get("permissions", []))
+        # Swapped in one assignment so readers never mix entries from two versions
+        self._state = (
+            self._compile(definition.get("tasks", []), permissions),
+            self._compile(definition.get("actions", []), permissions),
+            {}
+        )
+        self._signature = (stat.st_mtime_ns, stat.st_size)
+        self.version += 1
+
+    @staticmethod
+    def _compile(entries, permissions):
+        compiled = []
+        for entry in entries:
+            roles = entry.get("roles")
+            public = {key: value for key, value in entry.items() if key not in _ENTRY_KEYS}
+            compiled.append((
+                permissions.register(entry.get("requires", [])),
+                frozenset(roles) if roles else None,
+                public
+            ))
+        return compiled
+
+    def reload_if_changed(self):
+        """Reload the definition file if it changed since it was last read"""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        with self._lock:
+            self._next_check = now + self.check_interval
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return False
+            if (stat.st_mtime_ns, stat.st_size) == self._signature:
+                return False
+            try:
+                self._load()
+            except (OSError, ValueError) as e:
+                # Keep serving the last good catalog while the file is being edited
+                print(f"Failed to reload task catalog {self.path}: {e}")
+                return False
+            return True
+
+    def mask(self, permission_names):
+        """Compile a user profile's permissions, registering names the catalog does not use"""
+        return self.permissions.register(permission_names)
+
+    def has_permission(self, mask, permission):
+        bit = self.permissions.bit(permission)
+        return bool(bit) and self.permissions.has(mask, bit)
+
+    def _view(self, role, mask):
+        tasks, actions, views = self._state
+        key = (role, mask)
+        view = views.get(key)
+        if view is None:
+            view = views[key] = tuple(
+                tuple(
+                    entry for required, roles, entry in entries
+                    if required & mask == required and (roles is None or role in roles)
+                )
+                for entries in (tasks, actions)
+            )
+        return view
+
+    def tasks_for(self, role, mask):
+        """Return the tasks visible to `role` with the permission bitset `mask`
+
+        The returned entries are shared between sessions and must not be mutated.
+        """
+        self.reload_if_changed()
+        return self._view(role, mask)[0]
+
+    def actions_for(self, role, mask):
+        """Return the quick actions visible to `role` with the permission bitset `mask`"""
+        self.reload_if_changed()
+        return self._view(role, mask)[1]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_task_catalog():
+    """Return the process-wide catalog shared by all sessions"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = TaskCatalog()
+    return _catalog
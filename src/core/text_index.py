@@ -0,0 +1,172 @@
+"""
+Tokenized inverted index with BM25 ranking
+
+Postings are updated incrementally as documents are added or removed, so a
+query only touches the posting lists of its own terms instead of scanning
+every stored document.
+"""
+
+import heapq
+import math
+import re
+import sys
+from collections import Counter
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Score added per query term that matches a document tag exactly
+TAG_MATCH_BOOST = 2.0
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def normalize_tag(tag):
+    """Return the canonical form used to index a tag"""
+    return tag.strip().lower()
+
+
+class InvertedIndex:
+    """Inverted index over document text plus an exact-match tag index
+
+    With `keep_doc_terms=False` the index does not remember which terms each
+    document contained; callers must then pass the original text and tags to
+    `remove`, which saves a tuple per document for stores that keep the text.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, keep_doc_terms=True):
+        self.k1 = k1
+        self.b = b
+        self.keep_doc_terms = keep_doc_terms
+        self.postings = {}
+        self.tag_postings = {}
+        self.doc_lengths = {}
+        self.doc_terms = {}
+        self.doc_tags = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_lengths
+
+    def add(self, doc_id, text, tags=()):
+        """Index a document, replacing any previous version with the same id"""
+        if doc_id in self.doc_lengths:
+            if not self.keep_doc_terms:
+                raise ValueError(f"Document {doc_id} is already indexed, remove it first")
+            self.remove(doc_id)
+
+        # Interned terms are shared between postings keys and documents
+        terms = Counter(map(sys.intern, tokenize(text)))
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        length = sum(terms.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+
+        doc_tags = self._normalize_tags(tags)
+        for tag in doc_tags:
+            self.tag_postings.setdefault(tag, set()).add(doc_id)
+        if self.keep_doc_terms:
+            self.doc_terms[doc_id] = tuple(terms)
+            self.doc_tags[doc_id] = doc_tags
+
+    @staticmethod
+    def _normalize_tags(tags):
+        return tuple({sys.intern(normalize_tag(tag)) for tag in tags if tag and tag.strip()})
+
+    def remove(self, doc_id, text=None, tags=None):
+        """Drop a document from the index
+
+        `text` and `tags` must be the values the document was indexed with when
+        the index was created with `keep_doc_terms=False`.
+        """
+        if doc_id not in self.doc_lengths:
+            return False
+        if self.keep_doc_terms:
+            terms = self.doc_terms.pop(doc_id)
+            doc_tags = self.doc_tags.pop(doc_id)
+        else:
+            terms = set(tokenize(text or ""))
+            doc_tags = self._normalize_tags(tags or ())
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+        for tag in doc_tags:
+            posting = self.tag_postings.get(tag)
+            if posting is None:
+                continue
+            posting.discard(doc_id)
+            if not posting:
+                del self.tag_postings[tag]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        return True
+
+    def compact(self):
+        """Rebuild internal dicts so space freed by removals is returned"""
+        # Python dicts never shrink on deletion, copying them does
+        self.postings = {term: dict(posting) for term, posting in self.postings.items()}
+        self.tag_postings = {tag: set(posting) for tag, posting in self.tag_postings.items()}
+        self.doc_lengths = dict(self.doc_lengths)
+        self.doc_terms = dict(self.doc_terms)
+        self.doc_tags = dict(self.doc_tags)
+
+    def _tag_filter(self, tags):
+        candidates = None
+        for tag in tags:
+            posting = self.tag_postings.get(normalize_tag(tag), set())
+            candidates = set(posting) if candidates is None else candidates & posting
+            if not candidates:
+                return set()
+        return candidates
+
+    def score(self, query, tags=None):
+        """Return BM25 scores for every document matching the query"""
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return {}
+
+        allowed = self._tag_filter(tags) if tags else None
+        if allowed is not None and not allowed:
+            return {}
+
+        avg_length = self.total_length / doc_count or 1.0
+        k1 = self.k1
+        b = self.b
+        scores = {}
+        query_terms = set(tokenize(query))
+
+        for term in query_terms:
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, frequency in posting.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = k1 * (1 - b + b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (k1 + 1) / (frequency + norm)
+
+        for term in query_terms:
+            for doc_id in self.tag_postings.get(term, ()):
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                scores[doc_id] = scores.get(doc_id, 0.0) + TAG_MATCH_BOOST
+
+        return scores
+
+    def search(self, query, limit=10, offset=0, tags=None):
+        """Return `(total_matches, [(doc_id, score), ...])` for one page of results"""
+        scores = self.score(query, tags=tags)
+        if not scores and tags and not tokenize(query):
+            # A tags-only query lists every document carrying those tags
+            scores = dict.fromkeys(self._tag_filter(tags), 0.0)
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return len(scores), top[offset:offset + limit]
@@ -0,0 +1,172 @@
+"""
+Per-request tool selection
+
+Every tool schema sent with a request costs prompt tokens and gives the
+model one more tool to confuse with the right one. `ToolRetriever` ranks the
+available tools against the latest user messages and attaches only the best
+`top_k` plus the pinned ones, so the tools block stays about the same size
+however many MCP servers are connected. Tools are ranked by BM25 over their
+names, descriptions and parameters, optionally blended with hashed n-gram
+embeddings (needs numpy). When nothing matches, the full set is sent.
+
+Tool definitions are treated as immutable, as in `ToolSchemaCache`: the index
+for a tool list is built once and reused for every list with the same
+definitions, keyed by their digest, so sessions that decode their own copies
+of a catalog share one index.
+"""
+
+import heapq
+import threading
+
+from src.config.config import TOOL_RETRIEVAL_CONFIG
+from src.core.serialization import digest
+from src.core.text_index import InvertedIndex, tokenize
+
+# User messages, newest first, that make up the retrieval query
+QUERY_MESSAGES = 2
+# Dropped from queries: tool descriptions use them too, so they would match tools at random
+STOP_WORDS = frozenset("""
+a about all an and any are as at be by can could do does for from get give how i in is it me my of on or
+please show so that the their there this to us want was we what when where which who why will with would
+you your
+""".split())
+
+
+def tool_text(tool):
+    """The text a tool is indexed by: its name twice, description and parameters"""
+    parts = [tool["name"], tool["name"], tool.get("description", "")]
+    schema = tool.get("input_schema") or tool.get("parameters") or {}
+    for name, prop in (schema.get("properties") or {}).items():
+        parts.append(name)
+        if isinstance(prop, dict) and prop.get("description"):
+            parts.append(prop["description"])
+    return " ".join(parts)
+
+
+def retrieval_query(messages, count=QUERY_MESSAGES):
+    """Terms of the latest `count` user messages, so a short follow-up keeps the earlier topic"""
+    texts = []
+    for message in reversed(messages):
+        if message["role"] == "user" and isinstance(message.get("content"), str):
+            texts.append(message["content"])
+            if len(texts) == count:
+                break
+    return " ".join(term for term in tokenize(" ".join(reversed(texts))) if term not in STOP_WORDS)
+
+
+class _ToolIndex:
+    """BM25 index, and optionally embeddings, over one list of tools"""
+
+    def __init__(self, tools, embedder=None):
+        self.tools = tools
+        self.index = InvertedIndex()
+        texts = [tool_text(tool) for tool in tools]
+        for position, text in enumerate(texts):
+            self.index.add(position, text)
+        self.embedder = embedder
+        self.vectors = embedder(texts) if embedder is not None else None
+
+    def matches(self, query, min_score, min_similarity, vector_weight):
+        """Return `{position: rank}` for the tools that match the query"""
+        scores = self.index.score(query)
+        matched = {position for position, score in scores.items() if score >= min_score}
+        # BM25 scaled to 0..1 so it can be blended with cosine similarities
+        best = max(scores.values(), default=1.0)
+        ranks = {position: score / best for position, score in scores.items()}
+        if self.vectors is not None and tokenize(query):
+            similarities = (self.vectors @ self.embedder([query])[0]).tolist()
+            for position, similarity in enumerate(similarities):
+                if similarity >= min_similarity:
+                    matched.add(position)
+                ranks[position] = ranks.get(position, 0.0) + vector_weight * max(similarity, 0.0)
+        return {position: ranks[position] for position in matched}
+
+
+class ToolRetriever:
+    """Picks the tools to attach to a request
+
+    `top_k` ranked tools are attached besides the tools named in `pinned`;
+    `top_k=0` disables retrieval. A tool matches when its BM25 score reaches
+    `min_score`, which a word found in most tools' descriptions does not.
+    With `vectors=True`, tools whose hashed n-gram embedding has a cosine
+    similarity of at least `min_similarity` to the query match as well,
+    which catches paraphrases; matches are then ranked by normalized BM25
+    plus `vector_weight` times the similarity.
+    """
+
+    def __init__(self, top_k=8, pinned=(), vectors=False, vector_weight=0.5, min_score=1.0, min_similarity=0.3,
+                 maxsize=16):
+        self.top_k = top_k
+        self.pinned = frozenset(pinned)
+        self.vectors = vectors
+        self.vector_weight = vector_weight
+        self.min_score = min_score
+        self.min_similarity = min_similarity
+        self.maxsize = maxsize
+        self._embedder = None
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.misses = 0
+
+    def _index(self, tools, key=None):
+        key = key or digest(tools)
+        with self._lock:
+            index = self._indexes.pop(key, None)
+            if index is None:
+                if self.vectors and self._embedder is None:
+                    from src.core.embeddings import HashedNgramEmbedder
+
+                    self._embedder = HashedNgramEmbedder()
+                index = _ToolIndex(list(tools), self._embedder)
+                if len(self._indexes) >= self.maxsize:
+                    self._indexes.pop(next(iter(self._indexes)))
+            # Most recently used last
+            self._indexes[key] = index
+            return index
+
+    def select(self, tools, query, key=None):
+        """Return the tools to send for `query`, in their original order
+
+        `key` is the `digest` of `tools` when the caller already has it.
+        Returns `tools` itself when retrieval is off, the list is already
+        small enough or no tool matches the query.
+        """
+        pinned = [tool for tool in tools if tool["name"] in self.pinned]
+        if not self.top_k or len(tools) <= len(pinned) + self.top_k:
+            return tools
+        self.requests += 1
+        index = self._index(tools, key)
+        matches = index.matches(query, self.min_score, self.min_similarity, self.vector_weight)
+        candidates = [
+            (rank, position) for position, rank in matches.items() if tools[position]["name"] not in self.pinned
+        ]
+        if not candidates:
+            self.misses += 1
+            return tools
+        chosen = {position for _, position in heapq.nlargest(self.top_k, candidates)}
+        return [
+            tool for position, tool in enumerate(tools)
+            if position in chosen or tool["name"] in self.pinned
+        ]
+
+    def stats(self):
+        return {"requests": self.requests, "misses": self.misses}
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_tool_retriever():
+    """Return the process-wide tool retriever configured by TOOL_RETRIEVAL_*"""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = ToolRetriever(
+                    top_k=TOOL_RETRIEVAL_CONFIG["top_k"],
+                    pinned=TOOL_RETRIEVAL_CONFIG["pinned"],
+                    vectors=TOOL_RETRIEVAL_CONFIG["vectors"]
+                )
+    return _retriever
@@ -0,0 +1,189 @@
+"""
+Recording chat turns for offline replay
+
+With TURN_RECORD_PATH set, every chat turn is appended to that file as one
+JSON line:
+
+- the inputs the request was built from: API messages, user profile,
+  settings and the tool catalog, by digest
+- the names of the tools attached after retrieval
+- the streamed chunks with their arrival time (ms since the stream opened),
+  as `[t, content, tool_calls, usage]` with `tool_calls` as
+  `[[index, name, arguments], ...]` and `usage` as
+  `[prompt_tokens, completion_tokens, cached_tokens]`
+- tool calls with arguments, result and duration
+- render durations, e.g. the time spent drawing streamed text
+
+Each distinct tool catalog is written once as a `{"type": "tools"}` line
+that turns refer to by digest, which keeps turn lines small.
+`scripts/replay_turns.py` replays the file without a network.
+
+The turn being recorded is held in a context variable. Code on the turn's
+path calls `current_turn()` and records nothing when it returns None, so
+recording costs nothing while it is off.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from src.core.serialization import digest, dumps
+
+_current = contextvars.ContextVar("current_turn", default=None)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def current_turn():
+    """Return the `TurnRecording` of the turn in progress, or None"""
+    return _current.get()
+
+
+class TurnRecording:
+    """What happened during one chat turn"""
+
+    def __init__(self, recorder, source):
+        self.recorder = recorder
+        self.started = time.perf_counter()
+        self.record = {
+            "type": "turn",
+            "ts": round(time.time(), 3),
+            "source": source,
+            "chunks": [],
+            "tool_calls": [],
+            "render": {}
+        }
+        self._stream_started = None
+        # Set by callers that handle a failure themselves instead of raising it
+        self.error = None
+
+    def set_request(self, messages, tools, profile, max_tokens, temperature, request, catalog=None):
+        """Record what a completion request was built from and which tools it carries
+
+        `catalog` is the `digest` of `tools` when the caller already has it.
+        """
+        self.record.update({
+            "messages": messages,
+            "profile": profile,
+            "settings": {"max_tokens": max_tokens, "temperature": temperature},
+            "tools": self.recorder.tool_catalog(tools, catalog),
+            "attached_tools": [tool["function"]["name"] for tool in request.get("tools", ())]
+        })
+
+    def stream_started(self):
+        self._stream_started = time.perf_counter()
+        # A restarted stream replaces what was received before
+        self.record["chunks"] = []
+
+    def chunk(self, deployment, chunk):
+        self.record["deployment"] = deployment.name
+        entry = [_ms(time.perf_counter() - self._stream_started), None, None, None]
+        if chunk.choices:
+            delta = chunk.choices[0].delta
+            entry[1] = delta.content
+            if delta.tool_calls:
+                entry[2] = [
+                    [call.index, call.function.name, call.function.arguments] if call.function is not None
+                    else [call.index, None, None]
+                    for call in delta.tool_calls
+                ]
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            entry[3] = [usage.prompt_tokens, usage.completion_tokens, getattr(details, "cached_tokens", 0) or 0]
+        while entry[-1] is None and len(entry) > 1:
+            entry.pop()
+        self.record["chunks"].append(entry)
+
+    def tool_call(self, name, arguments, result=None, error=None, seconds=0.0, server=None):
+        call = {"name": name, "arguments": arguments, "ms": _ms(seconds)}
+        if server is not None:
+            call["server"] = server
+        if error is not None:
+            call["error"] = error
+        else:
+            call["result"] = result
+        self.record["tool_calls"].append(call)
+
+    def render(self, name, seconds):
+        """Add time spent drawing part of the turn"""
+        self.record["render"][name] = round(self.record["render"].get(name, 0.0) + seconds * 1000, 2)
+
+    def finish(self, error=None):
+        self.record["total_ms"] = _ms(time.perf_counter() - self.started)
+        error = error or self.error
+        if error is not None:
+            self.record["error"] = error
+        self.recorder.write(self.record)
+
+
+class TurnRecorder:
+    """Appends turn recordings to a JSONL file; safe to share between threads"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._catalogs = set()
+        self._file = open(path, "ab")
+
+    def tool_catalog(self, tools, key=None):
+        """Write `tools` the first time they are seen and return their digest"""
+        key = (key or digest(tools)).hex()
+        with self._lock:
+            if key not in self._catalogs:
+                self._catalogs.add(key)
+                self._write({"type": "tools", "digest": key, "tools": tools})
+        return key
+
+    def _write(self, record):
+        self._file.write(dumps(record) + b"\n")
+        self._file.flush()
+
+    def write(self, record):
+        with self._lock:
+            self._write(record)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_turn_recorder():
+    """Return the process-wide recorder, or None when TURN_RECORD_PATH is not set"""
+    global _recorder
+    path = os.getenv("TURN_RECORD_PATH")
+    if not path:
+        return None
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = TurnRecorder(path)
+    return _recorder
+
+
+@contextmanager
+def record_turn(source):
+    """Record the turn run inside the block; yields the recording, or None when off"""
+    recorder = get_turn_recorder()
+    if recorder is None:
+        yield None
+        return
+    turn = TurnRecording(recorder, source)
+    token = _current.set(turn)
+    try:
+        yield turn
+    except BaseException as e:
+        turn.finish(error=f"{type(e).__name__}: {e}")
+        raise
+    else:
+        turn.finish()
+    finally:
+        _current.reset(token)
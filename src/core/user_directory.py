@@ -0,0 +1,304 @@
+"""
+Pluggable user directory with TTL-cached, batched lookups
+
+A directory backend answers three questions: who has these emails, who is in
+these teams, and which users exist. Backends always take batches, so a team
+page with hundreds of members costs one query. `CachedUserDirectory` wraps a
+backend with a TTL cache of profiles and team rosters, including negative
+entries for unknown users.
+
+Backends:
+
+- `SQLiteUserDirectory`: local table seeded from `USER_PROFILES`
+- `MCPUserDirectory`: asks an MCP server exposing `get_users`,
+  `get_team_members` and `list_users` tools
+"""
+
+import itertools
+import os
+import socket
+import threading
+
+from src.config.config import USER_PROFILES
+from src.core.cache import NOT_FOUND, TTLCache
+from src.core.serialization import dumps, dumps_str, loads
+from src.core.sqlite_pool import ConnectionPool, connect
+
+# SQLite's default limit on bound parameters is 999 on older builds
+_MAX_PARAMS = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    team TEXT NOT NULL,
+    permissions TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_users_team ON users(team, email);
+"""
+
+
+def _chunks(values, size=_MAX_PARAMS):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class UserDirectory:
+    """Common interface for user directory backends"""
+
+    def get_profiles(self, emails):
+        """Return `{email: profile}` for the emails that exist"""
+        raise NotImplementedError
+
+    def get_team_members(self, teams):
+        """Return `{team: [profile, ...]}` for every requested team"""
+        raise NotImplementedError
+
+    def list_users(self):
+        """Return the emails of every known user"""
+        raise NotImplementedError
+
+    def get_profile(self, email):
+        return self.get_profiles([email]).get(email)
+
+    def close(self):
+        pass
+
+
+class SQLiteUserDirectory(UserDirectory):
+    """User directory stored in a local SQLite database"""
+
+    def __init__(self, path, pool_size=4, seed_profiles=None):
+        self.path = path
+        conn = connect(path)
+        try:
+            conn.executescript(_SCHEMA)
+            if seed_profiles and not conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+                self._upsert(conn, seed_profiles.values())
+        finally:
+            conn.close()
+        self.pool = ConnectionPool(path, size=pool_size)
+
+    @staticmethod
+    def _upsert(conn, profiles):
+        conn.executemany(
+            """
+            INSERT INTO users (email, name, role, team, permissions) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(email) DO UPDATE SET
+                name = excluded.name, role = excluded.role,
+                team = excluded.team, permissions = excluded.permissions
+            """,
+            [
+                (p["email"], p["name"], p["role"], p.get("team", ""), dumps_str(p.get("permissions", [])))
+                for p in profiles
+            ]
+        )
+
+    def upsert_profiles(self, profiles):
+        conn = connect(self.path)
+        try:
+            with conn:
+                conn.execute("BEGIN")
+                self._upsert(conn, profiles)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_profile(row):
+        email, name, role, team, permissions = row
+        return {"name": name, "email": email, "role": role, "team": team, "permissions": loads(permissions)}
+
+    def get_profiles(self, emails):
+        profiles = {}
+        with self.pool.connection() as conn:
+            for chunk in _chunks(emails):
+                rows = conn.execute(
+                    "SELECT email, name, role, team, permissions FROM users "
+                    f"WHERE email IN ({','.join('?' * len(chunk))})",
+                    chunk
+                )
+                for row in rows:
+                    profiles[row[0]] = self._row_to_profile(row)
+        return profiles
+
+    def get_team_members(self, teams):
+        members = {team: [] for team in teams}
+        with self.pool.connection() as conn:
+            for chunk in _chunks(members):
+                rows = conn.execute(
+                    "SELECT email, name, role, team, permissions FROM users "
+                    f"WHERE team IN ({','.join('?' * len(chunk))}) ORDER BY team, email",
+                    chunk
+                )
+                for row in rows:
+                    members[row[3]].append(self._row_to_profile(row))
+        return members
+
+    def list_users(self):
+        with self.pool.connection() as conn:
+            return [email for email, in conn.execute("SELECT email FROM users ORDER BY email")]
+
+    def close(self):
+        self.pool.close()
+
+
+class MCPUserDirectory(UserDirectory):
+    """User directory served by an MCP server over newline-delimited JSON-RPC"""
+
+    def __init__(self, host, port, timeout=5.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+
+    def _disconnect(self):
+        for closable in (self._reader, self._sock):
+            if closable is not None:
+                closable.close()
+        self._sock = self._reader = None
+
+    def call_tool(self, name, arguments):
+        """Call a tool and return its decoded JSON output"""
+        request = {
+            "jsonrpc": "2.0", "id": next(self._ids), "method": "tools/call",
+            "params": {"name": name, "arguments": arguments}
+        }
+        with self._lock:
+            # One reconnect covers a server restart between calls
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall(dumps(request) + b"\n")
+                    line = self._reader.readline()
+                    if not line:
+                        raise ConnectionError("Connection closed by MCP server")
+                    break
+                except OSError:
+                    self._disconnect()
+                    if attempt:
+                        raise
+        response = loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"].get("message", "MCP error"))
+        result = response["result"]
+        output = loads(result["content"][0]["text"])
+        if result.get("isError"):
+            raise RuntimeError(output.get("error", f"{name} failed"))
+        return output
+
+    def get_profiles(self, emails):
+        users = self.call_tool("get_users", {"emails": list(emails)}).get("users", [])
+        return {user["email"]: user for user in users}
+
+    def get_team_members(self, teams):
+        members = {team: [] for team in teams}
+        for user in self.call_tool("get_team_members", {"teams": list(members)}).get("members", []):
+            members.setdefault(user.get("team", ""), []).append(user)
+        return members
+
+    def list_users(self):
+        return [user["email"] for user in self.call_tool("list_users", {}).get("users", [])]
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+class CachedUserDirectory(UserDirectory):
+    """TTL cache in front of a directory backend, with negative caching"""
+
+    # Key of the cached user list, kept apart from email and team keys
+    _USERS_KEY = ("users",)
+
+    def __init__(self, backend, ttl=300.0, negative_ttl=30.0, maxsize=4096):
+        self.backend = backend
+        self.profiles = TTLCache(maxsize=maxsize, ttl=ttl, negative_ttl=negative_ttl)
+        self.teams = TTLCache(maxsize=maxsize, ttl=ttl, negative_ttl=negative_ttl)
+
+    def get_profiles(self, emails):
+        cached, missing = self.profiles.get_many(dict.fromkeys(emails))
+        if missing:
+            fetched = self.backend.get_profiles(missing)
+            for email in missing:
+                profile = fetched.get(email)
+                self.profiles.set(email, NOT_FOUND if profile is None else profile)
+                cached[email] = profile
+        return {email: profile for email, profile in cached.items() if profile not in (None, NOT_FOUND)}
+
+    def get_team_members(self, teams):
+        cached, missing = self.teams.get_many(dict.fromkeys(teams))
+        members = {team: self._roster_profiles(emails) for team, emails in cached.items()}
+        if missing:
+            fetched = self.backend.get_team_members(missing)
+            for team in missing:
+                roster = fetched.get(team, [])
+                # Rosters hold emails, the profiles themselves share the profile cache
+                self.profiles.set_many({profile["email"]: profile for profile in roster})
+                self.teams.set(team, tuple(profile["email"] for profile in roster) if roster else NOT_FOUND)
+                members[team] = roster
+        return members
+
+    def _roster_profiles(self, emails):
+        if emails is NOT_FOUND:
+            return []
+        profiles = self.get_profiles(emails)
+        return [profiles[email] for email in emails if email in profiles]
+
+    def list_users(self):
+        users = self.teams.get(self._USERS_KEY)
+        if users is None:
+            users = tuple(self.backend.list_users())
+            self.teams.set(self._USERS_KEY, users)
+        return list(users)
+
+    def invalidate(self, email=None, team=None):
+        if email is not None:
+            self.profiles.pop(email)
+        if team is not None:
+            self.teams.pop(team)
+        self.teams.pop(self._USERS_KEY)
+
+    def close(self):
+        self.backend.close()
+
+
+_directory = None
+_directory_lock = threading.Lock()
+
+
+def create_user_directory():
+    """Build the directory configured by the USER_DIRECTORY_* environment variables"""
+    backend_name = os.getenv("USER_DIRECTORY_BACKEND", "sqlite")
+    if backend_name == "mcp":
+        backend = MCPUserDirectory(
+            os.getenv("USER_DIRECTORY_MCP_HOST", "localhost"),
+            int(os.getenv("USER_DIRECTORY_MCP_PORT", "3007"))
+        )
+    elif backend_name == "sqlite":
+        backend = SQLiteUserDirectory(
+            os.getenv("USER_DIRECTORY_DB_PATH", "user_directory.sqlite3"),
+            seed_profiles=USER_PROFILES
+        )
+    else:
+        raise ValueError(f"Unknown user directory backend: {backend_name}")
+    return CachedUserDirectory(backend, ttl=float(os.getenv("USER_DIRECTORY_TTL", "300")))
+
+
+def get_user_directory():
+    """Return the process-wide directory shared by all sessions"""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = create_user_directory()
+    return _directory
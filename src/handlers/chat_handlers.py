@@ -0,0 +1,93 @@
+"""
+Chat history handling for the Streamlit session
+
+The session holds a `ChatWindow` over the user's current conversation in
+`st.session_state.chat`; `st.session_state.messages` is the window's message
+list. All writes go through `append_message` so they are persisted first.
+"""
+
+import os
+import threading
+
+import streamlit as st
+from src.core.chat_history import ChatHistoryStore, ChatWindow
+from src.core.chat_pipeline import api_messages as _api_messages
+
+# Messages loaded when a conversation is opened and per "load earlier" page
+CHAT_PAGE_SIZE = 50
+# Oldest messages are dropped from memory beyond this many
+CHAT_MAX_MESSAGES = 200
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chat_store():
+    """Return the process-wide chat history store shared by all sessions"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ChatHistoryStore(os.getenv("CHAT_HISTORY_DB_PATH", "chat_history.sqlite3"))
+    return _store
+
+
+def _current_user_email():
+    return st.session_state.user_profile.get("email") or "guest"
+
+
+def _open_window(conversation_id):
+    window = ChatWindow(get_chat_store(), conversation_id, page_size=CHAT_PAGE_SIZE, max_messages=CHAT_MAX_MESSAGES)
+    st.session_state.chat = window
+    st.session_state.chat_user = _current_user_email()
+    st.session_state.messages = window.messages
+    st.session_state.pop("chat_render_window", None)
+    return window
+
+
+def ensure_conversation():
+    """Open the current user's latest conversation, resuming it after restarts"""
+    user_email = _current_user_email()
+    if st.session_state.get("chat") is not None and st.session_state.get("chat_user") == user_email:
+        return st.session_state.chat
+    store = get_chat_store()
+    conversation_id = store.latest_conversation(user_email) or store.create_conversation(user_email)
+    return _open_window(conversation_id)
+
+
+def open_conversation(conversation_id):
+    """Show a stored conversation of the current user, e.g. when a session is resumed"""
+    return _open_window(conversation_id)
+
+
+def start_new_conversation():
+    """Start an empty conversation; earlier ones stay in the store"""
+    return _open_window(get_chat_store().create_conversation(_current_user_email()))
+
+
+def append_message(message):
+    """Persist a message to the current conversation and show it in the window"""
+    return ensure_conversation().append(message)
+
+
+def load_earlier_messages(count=None):
+    """Page older messages of the current conversation into memory"""
+    return ensure_conversation().load_earlier(count)
+
+
+def has_earlier_messages():
+    return ensure_conversation().has_earlier
+
+
+def load_latest_messages():
+    """Return the window to the end of the conversation after paging back"""
+    return ensure_conversation().load_latest()
+
+
+def has_later_messages():
+    return ensure_conversation().has_later
+
+
+def api_messages(messages=None):
+    """Strip stored metadata so messages can be sent to the chat completions API"""
+    return _api_messages(st.session_state.messages if messages is None else messages)
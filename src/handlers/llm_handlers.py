@@ -0,0 +1,120 @@
+"""
+Chat completion requests and speculative prefetch of task-card answers
+"""
+
+import threading
+
+import streamlit as st
+from src.config.config import PREFETCH_CONFIG
+from src.core.chat_pipeline import (
+    DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, complete_chat, completion_request, get_router, stream_reply
+)
+from src.core.prefetch import SpeculativeExecutor, SpendBudget
+from src.core.task_catalog import get_task_catalog
+from src.handlers.chat_handlers import api_messages, ensure_conversation
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_available_tools():
+    """Built-in tools followed by the tools of every connected MCP server"""
+    tools = list(st.session_state.regular_tools)
+    for server_tools in st.session_state.mcp_tools.values():
+        tools.extend(server_tools)
+    return tools
+
+
+def build_completion_request(messages):
+    """Chat completion arguments for `messages` with the session's tools, profile and settings"""
+    return completion_request(
+        messages,
+        get_available_tools(),
+        st.session_state.user_profile,
+        max_tokens=st.session_state.get("max_tokens", DEFAULT_MAX_TOKENS),
+        temperature=st.session_state.get("temperature", DEFAULT_TEMPERATURE)
+    )
+
+
+def task_prompt(task):
+    """The chat message sent when a task card is clicked"""
+    return f"Execute this task: {task['title']} - {task['description']}"
+
+
+async def stream_chat_reply(messages, on_text=None):
+    """Stream a reply to `messages`, calling `on_text(text_so_far)` as content arrives
+
+    Returns `{"content", "tool_calls", "deployment", "usage"}`.
+    """
+    content = []
+
+    def on_delta(delta):
+        content.append(delta)
+        if on_text is not None:
+            on_text("".join(content))
+
+    return await stream_reply(build_completion_request(messages), on_delta)
+
+
+def get_prefetcher():
+    """Return the process-wide speculative executor"""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = SpeculativeExecutor(
+                    ttl=PREFETCH_CONFIG["ttl"],
+                    budget=SpendBudget(PREFETCH_CONFIG["token_budget"])
+                )
+    return _prefetcher
+
+
+def _prefetch_context():
+    """Everything a prefetched answer depends on besides the task itself"""
+    messages = st.session_state.messages
+    return (
+        get_task_catalog().version,
+        st.session_state.get("user_data_version", 0),
+        tuple(tool["name"] for tool in get_available_tools()),
+        st.session_state.get("max_tokens", DEFAULT_MAX_TOKENS),
+        st.session_state.get("temperature", DEFAULT_TEMPERATURE),
+        ensure_conversation().conversation_id,
+        messages[-1]["id"] if messages else 0
+    )
+
+
+def claim_prefetch(task):
+    """Return the prefetch key for a clicked task and keep its answer from being discarded"""
+    key = (_prefetch_context(), task["id"])
+    st.session_state.get("prefetch_keys", set()).discard(key)
+    return key
+
+
+def prefetch_task_responses(tasks):
+    """Warm answers for the top high-priority task cards in the background"""
+    if not PREFETCH_CONFIG["enabled"] or get_router() is None:
+        return
+    prefetcher = get_prefetcher()
+    context = _prefetch_context()
+    if st.session_state.get("prefetch_context") != context:
+        # The chat, tools, settings, tasks or user data changed: earlier answers are stale
+        prefetcher.discard(st.session_state.get("prefetch_keys", ()))
+        st.session_state.prefetch_context = context
+        st.session_state.prefetch_keys = set()
+
+    history = api_messages()
+    candidates = [task for task in tasks if task.get("priority") == "high"][:PREFETCH_CONFIG["top_k"]]
+    for task in candidates:
+        key = (context, task["id"])
+        if key in st.session_state.prefetch_keys:
+            continue
+        request = build_completion_request(history + [{"role": "user", "content": task_prompt(task)}])
+        if prefetcher.submit(key, lambda request=request: complete_chat(request)):
+            st.session_state.prefetch_keys.add(key)
+
+
+def take_prefetched_response(key, wait=5.0):
+    """Return a prefetched answer for `key`, waiting briefly if it is still being generated"""
+    if not PREFETCH_CONFIG["enabled"] or key is None:
+        return None
+    return get_prefetcher().take(key, wait=wait)
@@ -0,0 +1,116 @@
+"""
+Shared session state for the Streamlit app
+
+`st.session_state` only lives as long as the browser's connection to one
+server process. The fields needed to pick a session up again are mirrored to
+the shared session state backend under a session id carried in the page URL
+(`?sid=...`), so a reconnect to any replica resumes the same user,
+conversation, MCP servers and chat settings. Everything else is derived again:
+profile, tasks and actions come from the user directory and task catalog, and
+messages from the chat history store.
+
+Sessions unused for SESSION_STATE_IDLE_TIMEOUT seconds are deleted. Each
+rerun marks the session as used, at most once per `TOUCH_INTERVAL`, and the
+app deletes idle sessions from the backend at most once per `SWEEP_INTERVAL`,
+as the headless service does.
+"""
+
+import os
+import secrets
+import threading
+import time
+
+import streamlit as st
+from src.core.session_state import SessionState, VersionConflict, get_session_state_backend
+from src.core.user_management import refresh_user_data
+from src.handlers.chat_handlers import open_conversation
+
+SESSION_QUERY_PARAM = "sid"
+# st.session_state keys mirrored to the backend as they are
+PERSISTED_KEYS = ("user_email", "mcp_servers", "mcp_tools", "max_tokens", "temperature")
+# Seconds without use before a session is deleted
+IDLE_TIMEOUT = float(os.getenv("SESSION_STATE_IDLE_TIMEOUT", "1800"))
+# Shared last-used times are refreshed at most this often per session
+TOUCH_INTERVAL = 60.0
+# Seconds between sweeps for idle sessions, per process
+SWEEP_INTERVAL = 60.0
+
+_last_sweep = 0.0
+_sweep_lock = threading.Lock()
+
+
+def _query_params():
+    # st.query_params replaced the experimental API in Streamlit 1.30
+    return getattr(st, "query_params", None)
+
+
+def _expire_idle_sessions(backend):
+    global _last_sweep
+    now = time.monotonic()
+    with _sweep_lock:
+        if now - _last_sweep < SWEEP_INTERVAL:
+            return
+        _last_sweep = now
+    backend.expire(IDLE_TIMEOUT)
+
+
+def _touch(state):
+    now = time.monotonic()
+    if now - st.session_state.get("shared_state_touched", 0.0) > TOUCH_INTERVAL:
+        st.session_state.shared_state_touched = now
+        state.backend.touch(state.session_id)
+    _expire_idle_sessions(state.backend)
+
+
+def restore_session_state():
+    """Load the shared state for this browser session, once per connection
+
+    Later reruns only mark the session as used. Returns True when an earlier
+    session was resumed.
+    """
+    state = st.session_state.get("shared_state")
+    if state is not None:
+        _touch(state)
+        return False
+    params = _query_params()
+    session_id = params.get(SESSION_QUERY_PARAM) if params is not None else None
+    state = SessionState(get_session_state_backend(), session_id or secrets.token_urlsafe(24))
+    st.session_state.shared_state = state
+    _touch(state)
+    if not session_id or not state.load():
+        if params is not None:
+            params[SESSION_QUERY_PARAM] = state.session_id
+        return False
+
+    for key in PERSISTED_KEYS:
+        if key in state:
+            st.session_state[key] = state[key]
+    refresh_user_data()
+    if state.get("conversation_id"):
+        open_conversation(state["conversation_id"])
+    return True
+
+
+def persist_session_state():
+    """Save the fields that changed since the last save; a no-op when nothing did"""
+    state = st.session_state.get("shared_state")
+    if state is None:
+        return
+
+    def mirror(state):
+        for key in PERSISTED_KEYS:
+            if key in st.session_state:
+                state[key] = st.session_state[key]
+        chat = st.session_state.get("chat")
+        if chat is not None:
+            state["conversation_id"] = chat.conversation_id
+
+    # Another tab on the same session saved in between: this tab's values win
+    try:
+        state.update(mirror)
+    except VersionConflict as e:
+        if e.actual:
+            raise
+        # Expired while the page stayed open without reruns: store it again under the same id
+        state.reset()
+        state.update(mirror)
@@ -4,23 +4,26 @@ Main Streamlit application for the MCP Linear Project Assistant
 
 import streamlit as st
 import asyncio
-import json
-from openai import AsyncAzureOpenAI
-from dotenv import load_dotenv
-
-# Import our modular components
-from src.config.config import SYSTEM_PROMPT, AZURE_OPENAI_CONFIG, BUILTIN_TOOLS
-from src.handlers.mcp_handlers import simulate_mcp_tool_execution
+import time
+
+# Import our modular components; importing the config also loads the .env file
+from src.config.config import BUILTIN_TOOLS
+from src.handlers.chat_handlers import api_messages, append_message, ensure_conversation
+from src.handlers.session_handlers import persist_session_state, restore_session_state
+from src.handlers.llm_handlers import (
+    claim_prefetch, prefetch_task_responses, stream_chat_reply, take_prefetched_response, task_prompt
+)
+from src.core.chat_pipeline import DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, ticket_from_tool_call
+from src.core.serialization import DecodeError
+from src.core.turn_recorder import record_turn
 from src.core.user_management import refresh_user_data
 from src.ui.ui_components import (
-    render_header, render_custom_css, render_user_profile_section,
+    fragment, rerun_fragment, render_header, render_custom_css, render_user_profile_section,
+    render_chat_history, ticket_card_html,
     render_user_tasks_section, render_mcp_servers_section, 
     render_settings_section, render_demo_tools_section, render_tools_status_section
 )
 
-# Load environment variables
-load_dotenv()
-
 
 def initialize_session_state():
     """Initialize session state variables"""
@@ -46,30 +49,21 @@ def initialize_session_state():
         st.session_state.regular_tools = BUILTIN_TOOLS
     if "trigger_ai_response" not in st.session_state:
         st.session_state.trigger_ai_response = False
+    # Set here rather than by the sliders, so a resumed session can restore them
+    if "max_tokens" not in st.session_state:
+        st.session_state.max_tokens = DEFAULT_MAX_TOKENS
+    if "temperature" not in st.session_state:
+        st.session_state.temperature = DEFAULT_TEMPERATURE
 
 
 def show_linear_ticket(title, status, assignee, deadline, tags):
     """Display a Linear ticket in the UI"""
-    status_colors = {
-        "In Progress": "🟡",
-        "Done": "✅",
-        "Todo": "⏳",
-        "Backlog": "📋"
-    }
-    
-    status_icon = status_colors.get(status, "❓")
-    
-    st.markdown(f"""
-    <div style="border: 1px solid #ddd; border-radius: 8px; padding: 15px; margin: 10px 0; background: #f9f9f9;">
-        <h3>🎫 {title}</h3>
-        <p><strong>Status:</strong> {status_icon} {status}</p>
-        <p><strong>Assignee:</strong> {assignee}</p>
-        <p><strong>Deadline:</strong> {deadline}</p>
-        <p><strong>Tags:</strong> {', '.join(tags)}</p>
-    </div>
-    """, unsafe_allow_html=True)
+    ticket = {"title": title, "status": status, "assignee": assignee, "deadline": deadline, "tags": tags}
+    st.markdown(ticket_card_html(ticket), unsafe_allow_html=True)
+    return ticket
 
 
+@fragment
 def render_tasks_in_chat():
     """Render user tasks as chat messages"""
     if st.session_state.user_tasks:
@@ -80,7 +74,7 @@ def render_tasks_in_chat():
         with col2:
             if st.button("🔄", help="Refresh your tasks and actions", key="refresh_tasks"):
                 refresh_user_data()
-                st.rerun()
+                rerun_fragment()
         
         st.markdown("Click on any task to execute it:")
         
@@ -102,77 +96,75 @@ def render_tasks_in_chat():
                         use_container_width=True
                     ):
                         # Add task to chat and trigger AI response
-                        st.session_state.messages.append({
-                            "role": "user", 
-                            "content": f"Execute this task: {task['title']} - {task['description']}"
-                        })
+                        st.session_state.prefetch_key = claim_prefetch(task)
+                        append_message({"role": "user", "content": task_prompt(task)})
                         st.session_state.trigger_ai_response = True
+                        # The reply streams into the chat, outside this panel
                         st.rerun()
 
 
 def handle_tool_calls(tool_calls):
-    """Handle tool calls from the LLM response"""
+    """Handle tool calls from the LLM response and return the tickets shown"""
+    tickets = []
     for tool_call in tool_calls:
-        if tool_call.function.name == "show_linear_ticket":
+        try:
+            ticket = ticket_from_tool_call(tool_call)
+            if ticket is not None:
+                tickets.append(show_linear_ticket(**ticket))
+        except DecodeError as e:
+            st.error(f"Invalid ticket arguments: {e}")
+        except Exception as e:
+            st.error(f"Error displaying ticket: {e}")
+    return tickets
+
+
+def show_reply_tool_calls(turn, tool_calls):
+    """Show the reply's tickets, timing them for the turn recording"""
+    started = time.perf_counter()
+    tickets = handle_tool_calls(tool_calls) if tool_calls else []
+    if turn is not None:
+        turn.render("tickets", time.perf_counter() - started)
+    return tickets
+
+
+def generate_ai_response(prefetch_key=None):
+    """Stream the assistant's reply to the current conversation and store it"""
+    with record_turn("streamlit") as turn, st.chat_message("assistant"):
+        prefetched = take_prefetched_response(prefetch_key)
+        if prefetched is not None:
+            # Answered speculatively while the task cards were on screen
+            if turn is not None:
+                turn.record["prefetched"] = True
+            st.markdown(prefetched["content"])
+            tickets = show_reply_tool_calls(turn, prefetched["tool_calls"])
+            message = {"role": "assistant", "content": prefetched["content"]}
+            if tickets:
+                message["tickets"] = tickets
+            append_message(message)
+            return
+        
+        with st.spinner("Thinking..."):
+            placeholder = st.empty()
+            # Create event loop for async call
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
             try:
-                args = json.loads(tool_call.function.arguments)
-                show_linear_ticket(
-                    args.get("title", "Untitled"),
-                    args.get("status", "Todo"),
-                    args.get("assignee", "Unassigned"),
-                    args.get("deadline", "No deadline"),
-                    args.get("tags", [])
-                )
+                reply = loop.run_until_complete(stream_chat_reply(api_messages(), placeholder.markdown))
             except Exception as e:
-                st.error(f"Error displaying ticket: {e}")
-
-
-async def call_azure_openai(messages):
-    """Call Azure OpenAI with the given messages"""
-    try:
-        client = AsyncAzureOpenAI(
-            api_key=AZURE_OPENAI_CONFIG["api_key"],
-            api_version=AZURE_OPENAI_CONFIG["api_version"],
-            azure_endpoint=AZURE_OPENAI_CONFIG["endpoint"]
-        )
-        
-        # Convert tools to OpenAI format
-        tools = []
-        for tool in st.session_state.regular_tools:
-            tools.append({
-                "type": "function",
-                "function": {
-                    "name": tool["name"],
-                    "description": tool["description"],
-                    "parameters": tool["input_schema"]
-                }
-            })
-        
-        # Add MCP tools
-        for server_name, server_tools in st.session_state.mcp_tools.items():
-            for tool in server_tools:
-                tools.append({
-                    "type": "function",
-                    "function": {
-                        "name": tool["name"],
-                        "description": tool["description"],
-                        "parameters": tool["input_schema"]
-                    }
-                })
-        
-        response = await client.chat.completions.create(
-            model=AZURE_OPENAI_CONFIG["deployment_name"],
-            messages=messages,
-            tools=tools if tools else None,
-            tool_choice="auto" if tools else None,
-            stream=True
-        )
-        
-        return response
-        
-    except Exception as e:
-        st.error(f"Error calling Azure OpenAI: {e}")
-        return None
+                st.error(f"Error calling Azure OpenAI: {e}")
+                if turn is not None:
+                    turn.error = f"{type(e).__name__}: {e}"
+                return
+            finally:
+                loop.close()
+            
+            # Tickets are stored with the message so reruns show them again
+            tickets = show_reply_tool_calls(turn, reply["tool_calls"])
+            
+            message = {"role": "assistant", "content": reply["content"]}
+            if tickets:
+                message["tickets"] = tickets
+            append_message(message)
 
 
 def main():
@@ -186,11 +178,16 @@ def main():
     
     # Initialize session state
     initialize_session_state()
+    # Resume the session from the shared backend after a reconnect to any worker
+    restore_session_state()
     
     # Initialize user data if not already done
     if not st.session_state.user_tasks:
         refresh_user_data()
     
+    # Resume the user's latest conversation from the history store
+    ensure_conversation()
+    
     # Render custom CSS
     render_custom_css()
     
@@ -213,88 +210,33 @@ def main():
     
     # Always render tasks at the top
     render_tasks_in_chat()
+    if not st.session_state.trigger_ai_response:
+        # Warm the likely next clicks while the user reads the cards
+        prefetch_task_responses(st.session_state.user_tasks)
     
-    # Chat messages
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+    # Chat messages, windowed to the most recent ones
+    render_chat_history()
     
     # Auto-trigger AI response if flag is set
     if st.session_state.trigger_ai_response:
         # Reset the flag
         st.session_state.trigger_ai_response = False
         
-        # Generate AI response
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                # Create event loop for async call
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(call_azure_openai(st.session_state.messages))
-                
-                if response:
-                    full_response = ""
-                    tool_calls = []
-                    
-                    for chunk in response:
-                        if chunk.choices[0].delta.content:
-                            full_response += chunk.choices[0].delta.content
-                            st.write(chunk.choices[0].delta.content, end="")
-                        
-                        if chunk.choices[0].delta.tool_calls:
-                            for tool_call in chunk.choices[0].delta.tool_calls:
-                                if tool_call.function:
-                                    tool_calls.append(tool_call)
-                    
-                    # Handle tool calls
-                    if tool_calls:
-                        handle_tool_calls(tool_calls)
-                    
-                    # Add assistant message
-                    st.session_state.messages.append({"role": "assistant", "content": full_response})
-                else:
-                    st.error("Failed to get response from AI")
+        generate_ai_response(st.session_state.pop("prefetch_key", None))
     
     # Chat input
     if prompt := st.chat_input("Ask me anything about your projects..."):
         # Add user message
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        append_message({"role": "user", "content": prompt})
         
         # Display user message
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Generate AI response
-        with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                # Create event loop for async call
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                response = loop.run_until_complete(call_azure_openai(st.session_state.messages))
-                
-                if response:
-                    full_response = ""
-                    tool_calls = []
-                    
-                    for chunk in response:
-                        if chunk.choices[0].delta.content:
-                            full_response += chunk.choices[0].delta.content
-                            st.write(chunk.choices[0].delta.content, end="")
-                        
-                        if chunk.choices[0].delta.tool_calls:
-                            for tool_call in chunk.choices[0].delta.tool_calls:
-                                if tool_call.function:
-                                    tool_calls.append(tool_call)
-                    
-                    # Handle tool calls
-                    if tool_calls:
-                        handle_tool_calls(tool_calls)
-                    
-                    # Add assistant message
-                    st.session_state.messages.append({"role": "assistant", "content": full_response})
-                else:
-                    st.error("Failed to get response from AI")
+        generate_ai_response()
     
+    # Mirror what changed in this run to the shared backend
+    persist_session_state()
 
 
 if __name__ == "__main__":
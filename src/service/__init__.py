@@ -0,0 +1,3 @@
+"""
+Headless service mode: the chat pipeline over HTTP, Server-Sent Events and WebSockets
+"""
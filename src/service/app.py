@@ -0,0 +1,472 @@
+"""
+Headless HTTP, Server-Sent Events and WebSocket API for the chat pipeline
+
+Everything runs on one asyncio event loop: model replies stream through the
+async OpenAI client, history writes are awaited on the store's writer thread
+and the few blocking calls (directory lookups, MCP connection checks) run in
+worker threads. Session state is kept in a shared backend and conversations
+in the shared history store, so replicas behind a load balancer need no
+session affinity.
+
+Endpoints (JSON unless noted):
+
+    GET    /healthz
+    POST   /api/sessions                                    {"user_email"}
+    GET    /api/sessions/{sid}
+    DELETE /api/sessions/{sid}
+    PATCH  /api/sessions/{sid}/settings                     {"max_tokens", "temperature"}
+    GET    /api/sessions/{sid}/messages?before=&limit=
+    POST   /api/sessions/{sid}/messages                     {"content"}; SSE with Accept: text/event-stream
+    POST   /api/sessions/{sid}/conversations
+    GET    /api/sessions/{sid}/tasks
+    GET    /api/sessions/{sid}/ws                           WebSocket: send {"type": "message", "content"}
+    GET    /api/mcp/servers/public
+    GET    /api/sessions/{sid}/mcp/servers
+    POST   /api/sessions/{sid}/mcp/servers                  {"name", "host", "port", "description"}
+    DELETE /api/sessions/{sid}/mcp/servers/{name}
+    POST   /api/sessions/{sid}/mcp/servers/{name}/connect
+    POST   /api/sessions/{sid}/mcp/servers/{name}/disconnect
+    POST   /api/sessions/{sid}/mcp/servers/{name}/tools/{tool}  {"arguments"}
+
+Chat turns report the events of `ChatSession.run_turn`.
+
+Every endpoint except /healthz needs the service's API token, sent as
+`Authorization: Bearer <token>`. The WebSocket also accepts it as a `token`
+query parameter, since browsers cannot set headers on WebSocket requests.
+The token is read from SERVICE_API_TOKEN; without it, the command line
+generates one and prints it at startup. The service listens on 127.0.0.1
+unless `--host` says otherwise.
+"""
+
+import argparse
+import asyncio
+import hmac
+import multiprocessing
+import os
+import secrets
+
+try:
+    from aiohttp import WSMsgType, web
+except ImportError:
+    # Only the service mode needs aiohttp
+    web = None
+
+from src.config.config import PUBLIC_MCP_SERVERS
+from src.core.chat_history import ChatHistoryStore
+from src.core.chat_pipeline import create_router, prompt_cache_stats
+from src.core.mcp_client import (
+    add_server, connect_server, disconnect_server, execute_tool, remove_server
+)
+from src.core.serialization import DecodeError, dumps_str, loads
+from src.core.session_state import VersionConflict, create_session_state_backend
+from src.core.tool_retriever import get_tool_retriever
+from src.service.sessions import CHAT_PAGE_SIZE, SessionManager
+
+# Seconds between sweeps for idle sessions
+SWEEP_INTERVAL = 60.0
+# Limits of the settings sliders in the app
+MAX_TOKENS_RANGE = (100, 4000)
+TEMPERATURE_RANGE = (0.0, 2.0)
+
+
+def _json(data, status=200):
+    return web.Response(text=dumps_str(data), status=status, content_type="application/json")
+
+
+def _http_error(error_class, message):
+    return error_class(text=dumps_str({"error": message}), content_type="application/json")
+
+
+async def _body(request):
+    if not request.can_read_body:
+        return {}
+    try:
+        body = loads(await request.read())
+    except DecodeError as e:
+        raise _http_error(web.HTTPBadRequest, f"Invalid JSON: {e}")
+    if not isinstance(body, dict):
+        raise _http_error(web.HTTPBadRequest, "Expected a JSON object")
+    return body
+
+
+def _token_middleware(api_token):
+    """Reject requests without the API token; /healthz stays open for load balancers"""
+    expected = api_token.encode("utf-8")
+
+    @web.middleware
+    async def check_token(request, handler):
+        if request.path != "/healthz":
+            authorization = request.headers.get("Authorization", "")
+            if authorization.startswith("Bearer "):
+                supplied = authorization[len("Bearer "):]
+            elif request.path.endswith("/ws"):
+                supplied = request.query.get("token", "")
+            else:
+                supplied = ""
+            if not hmac.compare_digest(supplied.encode("utf-8"), expected):
+                raise _http_error(web.HTTPUnauthorized, "Missing or invalid API token")
+        return await handler(request)
+
+    return check_token
+
+
+def _number(body, key, kind, bounds):
+    value = body[key]
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not bounds[0] <= value <= bounds[1]:
+        raise _http_error(web.HTTPBadRequest, f"{key} must be a number between {bounds[0]} and {bounds[1]}")
+    return kind(value)
+
+
+class ChatService:
+    """Request handlers over a session manager and a model router"""
+
+    def __init__(self, store, state_backend, router=None, max_sessions=10000, idle_timeout=1800.0):
+        self.store = store
+        self.state_backend = state_backend
+        self.router = router
+        self.sessions = SessionManager(store, state_backend, max_sessions=max_sessions, idle_timeout=idle_timeout)
+        self._sweeper = None
+        self._turns = set()
+
+    def routes(self):
+        return [
+            web.get("/healthz", self.health),
+            web.post("/api/sessions", self.create_session),
+            web.get("/api/sessions/{sid}", self.get_session),
+            web.delete("/api/sessions/{sid}", self.delete_session),
+            web.patch("/api/sessions/{sid}/settings", self.update_settings),
+            web.get("/api/sessions/{sid}/messages", self.list_messages),
+            web.post("/api/sessions/{sid}/messages", self.post_message),
+            web.post("/api/sessions/{sid}/conversations", self.new_conversation),
+            web.get("/api/sessions/{sid}/tasks", self.tasks),
+            web.get("/api/sessions/{sid}/ws", self.websocket),
+            web.get("/api/mcp/servers/public", self.public_mcp_servers),
+            web.get("/api/sessions/{sid}/mcp/servers", self.mcp_servers),
+            web.post("/api/sessions/{sid}/mcp/servers", self.add_mcp_server),
+            web.delete("/api/sessions/{sid}/mcp/servers/{name}", self.remove_mcp_server),
+            web.post("/api/sessions/{sid}/mcp/servers/{name}/connect", self.connect_mcp_server),
+            web.post("/api/sessions/{sid}/mcp/servers/{name}/disconnect", self.disconnect_mcp_server),
+            web.post("/api/sessions/{sid}/mcp/servers/{name}/tools/{tool}", self.run_mcp_tool)
+        ]
+
+    async def _session(self, request):
+        session = await self.sessions.get(request.match_info["sid"])
+        if session is None:
+            raise _http_error(web.HTTPNotFound, "Session not found")
+        return session
+
+    async def _update(self, session, mutate):
+        try:
+            return await self.sessions.update(session, mutate)
+        except VersionConflict:
+            raise _http_error(web.HTTPConflict, "The session is being changed elsewhere; retry")
+
+    # Lifecycle
+
+    async def start(self, app):
+        self._sweeper = asyncio.ensure_future(self._sweep_forever())
+
+    async def stop(self, app):
+        self._sweeper.cancel()
+        # Let running turns store their replies before the store closes
+        if self._turns:
+            await asyncio.gather(*self._turns, return_exceptions=True)
+        if self.router is not None:
+            await self.router.aclose()
+        self.state_backend.close()
+        self.store.close()
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            await asyncio.to_thread(self.sessions.sweep)
+
+    # Sessions
+
+    async def health(self, request):
+        return _json({
+            "status": "ok",
+            "sessions": len(self.sessions),
+            "deployments": self.router.stats() if self.router is not None else [],
+            "prompt_cache": prompt_cache_stats(self.router) if self.router is not None else None,
+            "tool_retrieval": get_tool_retriever().stats()
+        })
+
+    async def create_session(self, request):
+        body = await _body(request)
+        user_email = body.get("user_email")
+        if not isinstance(user_email, str) or not user_email:
+            raise _http_error(web.HTTPBadRequest, "user_email is required")
+        session = await self.sessions.create(user_email)
+        if session is None:
+            raise _http_error(web.HTTPNotFound, "User not found")
+        return _json(session.describe(), status=201)
+
+    async def get_session(self, request):
+        return _json((await self._session(request)).describe())
+
+    async def delete_session(self, request):
+        if not await self.sessions.close(request.match_info["sid"]):
+            raise _http_error(web.HTTPNotFound, "Session not found")
+        return web.Response(status=204)
+
+    async def update_settings(self, request):
+        session = await self._session(request)
+        body = await _body(request)
+        settings = {}
+        if "max_tokens" in body:
+            settings["max_tokens"] = _number(body, "max_tokens", int, MAX_TOKENS_RANGE)
+        if "temperature" in body:
+            settings["temperature"] = _number(body, "temperature", float, TEMPERATURE_RANGE)
+
+        def apply(state):
+            for key, value in settings.items():
+                state[key] = value
+
+        await self._update(session, apply)
+        return _json(session.describe())
+
+    async def tasks(self, request):
+        session = await self._session(request)
+        return _json({"tasks": session.tasks(), "actions": session.actions()})
+
+    # Conversation
+
+    async def list_messages(self, request):
+        """Page through the conversation, newest first by page and chronological within one"""
+        session = await self._session(request)
+        try:
+            before = int(request.query["before"]) if "before" in request.query else None
+            limit = min(200, max(1, int(request.query.get("limit", CHAT_PAGE_SIZE))))
+        except ValueError:
+            raise _http_error(web.HTTPBadRequest, "before and limit must be integers")
+        messages = await asyncio.to_thread(self.store.before, session.window.conversation_id, before, limit)
+        return _json({"messages": messages, "has_earlier": len(messages) == limit})
+
+    async def new_conversation(self, request):
+        session = await self._session(request)
+        await self.sessions.new_conversation(session)
+        return _json(session.describe(), status=201)
+
+    def _run_turn(self, session, content, emit):
+        # Turns run as their own tasks so a client going away does not cut
+        # them short; the reply is stored either way
+        turn = asyncio.ensure_future(session.run_turn(content, emit, self.router))
+        self._turns.add(turn)
+        turn.add_done_callback(self._turns.discard)
+        return turn
+
+    async def post_message(self, request):
+        session = await self._session(request)
+        content = (await _body(request)).get("content")
+        if not isinstance(content, str) or not content.strip():
+            raise _http_error(web.HTTPBadRequest, "content is required")
+
+        if "text/event-stream" not in request.headers.get("Accept", ""):
+            events = []
+
+            async def collect(event):
+                if event["type"] != "delta":
+                    events.append(event)
+
+            message = await asyncio.shield(self._run_turn(session, content, collect))
+            return _json({
+                "message": message,
+                "errors": [event["error"] for event in events if event["type"] == "error"]
+            }, status=200 if message is not None else 502)
+
+        response = web.StreamResponse(headers={
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            # Stop proxies from buffering the stream
+            "X-Accel-Buffering": "no"
+        })
+        await response.prepare(request)
+        connected = True
+
+        async def send(event):
+            nonlocal connected
+            if not connected:
+                return
+            try:
+                await response.write(f"event: {event['type']}\ndata: {dumps_str(event)}\n\n".encode("utf-8"))
+            except ConnectionError:
+                connected = False
+
+        await asyncio.shield(self._run_turn(session, content, send))
+        if connected:
+            await response.write_eof()
+        return response
+
+    async def websocket(self, request):
+        session = await self._session(request)
+        ws = web.WebSocketResponse(heartbeat=30.0)
+        await ws.prepare(request)
+
+        async def send(event):
+            if not ws.closed:
+                try:
+                    await ws.send_str(dumps_str(event))
+                except ConnectionError:
+                    pass
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                event = loads(msg.data)
+            except DecodeError as e:
+                await send({"type": "error", "error": f"Invalid JSON: {e}"})
+                continue
+            content = event.get("content") if isinstance(event, dict) and event.get("type") == "message" else None
+            if not isinstance(content, str) or not content.strip():
+                await send({"type": "error", "error": "Expected {\"type\": \"message\", \"content\": ...}"})
+                continue
+            # Revalidates the session and keeps a long-lived socket's session from being swept
+            session = await self.sessions.get(session.session_id)
+            if session is None:
+                await send({"type": "error", "error": "Session not found"})
+                break
+            self._run_turn(session, content, send)
+        return ws
+
+    # MCP servers
+
+    async def public_mcp_servers(self, request):
+        return _json(PUBLIC_MCP_SERVERS)
+
+    async def mcp_servers(self, request):
+        return _json((await self._session(request)).mcp_servers)
+
+    async def add_mcp_server(self, request):
+        session = await self._session(request)
+        body = await _body(request)
+        name, host, port = body.get("name"), body.get("host"), body.get("port")
+        if not (isinstance(name, str) and name and isinstance(host, str) and host):
+            raise _http_error(web.HTTPBadRequest, "name and host are required")
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            raise _http_error(web.HTTPBadRequest, "port must be an integer")
+        await self._update(
+            session, lambda state: add_server(state["mcp_servers"], name, host, port, body.get("description", ""))
+        )
+        return _json(session.mcp_servers[name], status=201)
+
+    async def remove_mcp_server(self, request):
+        session = await self._session(request)
+        name = request.match_info["name"]
+        if name not in session.mcp_servers:
+            raise _http_error(web.HTTPNotFound, "Server not found")
+        await self._update(session, lambda state: remove_server(state["mcp_servers"], state["mcp_tools"], name))
+        return web.Response(status=204)
+
+    async def connect_mcp_server(self, request):
+        session = await self._session(request)
+        name = request.match_info["name"]
+        # Runs in a thread: the connection check blocks for up to its timeout
+        success, message = await self._update(
+            session, lambda state: connect_server(state["mcp_servers"], state["mcp_tools"], name)
+        )
+        return _json({"success": success, "message": message}, status=200 if success else 502)
+
+    async def disconnect_mcp_server(self, request):
+        session = await self._session(request)
+        name = request.match_info["name"]
+        success, message = await self._update(
+            session, lambda state: disconnect_server(state["mcp_servers"], state["mcp_tools"], name)
+        )
+        return _json({"success": success, "message": message}, status=200 if success else 404)
+
+    async def run_mcp_tool(self, request):
+        session = await self._session(request)
+        name, tool = request.match_info["name"], request.match_info["tool"]
+        # Only the session's own connected servers and the tools they reported can be called
+        server = session.mcp_servers.get(name)
+        if server is None:
+            raise _http_error(web.HTTPNotFound, "Server not found")
+        if server.get("status") != "connected":
+            raise _http_error(web.HTTPConflict, "Server is not connected")
+        if not any(candidate["name"] == tool for candidate in session.mcp_tools.get(name, ())):
+            raise _http_error(web.HTTPNotFound, "Tool not found on this server")
+        arguments = (await _body(request)).get("arguments", {})
+        if not isinstance(arguments, dict):
+            raise _http_error(web.HTTPBadRequest, "arguments must be a JSON object")
+        # In a thread: an identical call already in flight is waited for, not repeated
+        result = await asyncio.to_thread(execute_tool, name, tool, arguments)
+        return _json(result)
+
+
+def create_app(store=None, state_backend=None, router=None, max_sessions=10000, idle_timeout=1800.0, api_token=None):
+    """Build the service's aiohttp application
+
+    `api_token` defaults to SERVICE_API_TOKEN; one of them is required.
+    """
+    if web is None:
+        raise RuntimeError("The service mode needs aiohttp: pip install aiohttp")
+    api_token = api_token or os.getenv("SERVICE_API_TOKEN")
+    if not api_token:
+        raise RuntimeError("The service needs an API token: set SERVICE_API_TOKEN")
+    if store is None:
+        store = ChatHistoryStore(os.getenv("CHAT_HISTORY_DB_PATH", "chat_history.sqlite3"))
+    if state_backend is None:
+        state_backend = create_session_state_backend()
+    if router is None:
+        # One event loop for the whole process, so clients and their connections are reused
+        router = create_router(reuse_clients=True)
+    service = ChatService(store, state_backend, router, max_sessions=max_sessions, idle_timeout=idle_timeout)
+    app = web.Application(client_max_size=1024 * 1024, middlewares=[_token_middleware(api_token)])
+    app.add_routes(service.routes())
+    app.on_startup.append(service.start)
+    app.on_cleanup.append(service.stop)
+    return app
+
+
+def _serve(host, port, max_sessions, idle_timeout, api_token, reuse_port=False):
+    web.run_app(
+        create_app(max_sessions=max_sessions, idle_timeout=idle_timeout, api_token=api_token),
+        host=host, port=port, reuse_port=reuse_port
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the chat pipeline over HTTP, SSE and WebSockets")
+    parser.add_argument("--host", default=os.getenv("SERVICE_HOST", "127.0.0.1"),
+                        help="Address to listen on; use 0.0.0.0 only behind TLS and a trusted network")
+    parser.add_argument("--port", type=int, default=int(os.getenv("SERVICE_PORT", "8080")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", "1")),
+                        help="Worker processes sharing the port (SO_REUSEPORT); any worker serves any session")
+    parser.add_argument("--max-sessions", type=int, default=int(os.getenv("SERVICE_MAX_SESSIONS", "10000")),
+                        help="Sessions each worker keeps cached in memory")
+    idle_timeout = os.getenv("SERVICE_IDLE_TIMEOUT", os.getenv("SESSION_STATE_IDLE_TIMEOUT", "1800"))
+    parser.add_argument("--idle-timeout", type=float, default=float(idle_timeout),
+                        help="Seconds before an idle session is deleted")
+    args = parser.parse_args(argv)
+    if web is None:
+        parser.exit(1, "The service mode needs aiohttp: pip install aiohttp\n")
+    api_token = os.getenv("SERVICE_API_TOKEN")
+    if not api_token:
+        # Shared by every worker; clients need it for each request
+        api_token = secrets.token_urlsafe(32)
+        print(f"SERVICE_API_TOKEN is not set; this run's API token is {api_token}", flush=True)
+    if args.workers <= 1:
+        _serve(args.host, args.port, args.max_sessions, args.idle_timeout, api_token)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=_serve, args=(args.host, args.port, args.max_sessions, args.idle_timeout, api_token, True),
+            name=f"chat-service-{index}"
+        )
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        # Ctrl+C reaches the workers too; wait for them to shut down cleanly
+        for process in processes:
+            process.join()
@@ -0,0 +1,255 @@
+"""
+Chat sessions of the headless service
+
+A `ChatSession` holds what the Streamlit app keeps in `st.session_state`: the
+user's profile, the current conversation, connected MCP servers and chat
+settings. Those fields live in a shared session state backend, so any worker
+can serve any session. Each worker keeps the sessions it has served in a
+local cache and revalidates them against the stored version on every
+request, which costs one indexed lookup when nothing changed. Messages live
+in the shared chat history store.
+"""
+
+import asyncio
+import secrets
+import time
+from collections import OrderedDict
+
+from src.config.config import BUILTIN_TOOLS
+from src.core.chat_history import ChatWindow
+from src.core.chat_pipeline import (
+    DEFAULT_MAX_TOKENS, DEFAULT_TEMPERATURE, api_messages, completion_request, stream_reply, ticket_from_tool_call
+)
+from src.core.serialization import DecodeError
+from src.core.session_state import SessionState
+from src.core.task_catalog import get_task_catalog
+from src.core.turn_recorder import record_turn
+from src.core.user_directory import get_user_directory
+
+# Messages loaded when a conversation is opened and per history page
+CHAT_PAGE_SIZE = 50
+# Oldest messages are dropped from memory beyond this many
+CHAT_MAX_MESSAGES = 200
+# Shared last-used times are refreshed at most this often per session
+TOUCH_INTERVAL = 60.0
+
+
+class ChatSession:
+    """One client's conversation state, backed by a `SessionState`"""
+
+    def __init__(self, state, window):
+        self.state = state
+        self.window = window
+        self.last_seen = time.monotonic()
+        self.last_touched = self.last_seen
+        # One turn at a time per session in this worker; other sessions are not held up
+        self.lock = asyncio.Lock()
+
+    @property
+    def session_id(self):
+        return self.state.session_id
+
+    @property
+    def profile(self):
+        return self.state["profile"]
+
+    @property
+    def mcp_servers(self):
+        return self.state["mcp_servers"]
+
+    @property
+    def mcp_tools(self):
+        return self.state["mcp_tools"]
+
+    @property
+    def max_tokens(self):
+        return self.state["max_tokens"]
+
+    @property
+    def temperature(self):
+        return self.state["temperature"]
+
+    def tools(self):
+        """Built-in tools followed by the tools of every connected MCP server"""
+        tools = list(BUILTIN_TOOLS)
+        for server_tools in self.mcp_tools.values():
+            tools.extend(server_tools)
+        return tools
+
+    def tasks(self):
+        catalog = get_task_catalog()
+        return list(catalog.tasks_for(self.profile.get("role", "user"), catalog.mask(self.profile.get("permissions", []))))
+
+    def actions(self):
+        catalog = get_task_catalog()
+        return list(catalog.actions_for(self.profile.get("role", "user"), catalog.mask(self.profile.get("permissions", []))))
+
+    def describe(self):
+        return {
+            "session_id": self.session_id,
+            "user": self.profile,
+            "conversation_id": self.window.conversation_id,
+            "settings": {"max_tokens": self.max_tokens, "temperature": self.temperature},
+            "mcp_servers": self.mcp_servers
+        }
+
+    async def run_turn(self, content, emit, router=None):
+        """Answer a user message, reporting progress through `await emit(event)`
+
+        Events, in order: `message` (the stored user message), any number of
+        `delta` (reply text), `ticket` and `error`, then `done` with the
+        stored assistant message. Returns the assistant message, or None
+        when the model call failed.
+        """
+        async with self.lock:
+            with record_turn("service") as turn:
+                return await self._run_turn(content, emit, router, turn)
+
+    async def _run_turn(self, content, emit, router, turn):
+        # Pick up messages other workers added to this conversation
+        await asyncio.to_thread(self.window.refresh)
+        user_message = await self.window.append_async({"role": "user", "content": content})
+        await emit({"type": "message", "message": user_message})
+
+        request = completion_request(
+            api_messages(self.window.messages), self.tools(), self.profile,
+            max_tokens=self.max_tokens, temperature=self.temperature
+        )
+        try:
+            reply = await stream_reply(request, lambda delta: emit({"type": "delta", "content": delta}), router)
+        except Exception as e:
+            if turn is not None:
+                turn.error = f"{type(e).__name__}: {e}"
+            await emit({"type": "error", "error": f"Error calling Azure OpenAI: {e}"})
+            return None
+
+        tickets = []
+        for tool_call in reply["tool_calls"]:
+            try:
+                ticket = ticket_from_tool_call(tool_call)
+            except DecodeError as e:
+                await emit({"type": "error", "error": f"Invalid ticket arguments: {e}"})
+                continue
+            if ticket is not None:
+                tickets.append(ticket)
+                await emit({"type": "ticket", "ticket": ticket})
+
+        message = {"role": "assistant", "content": reply["content"]}
+        if tickets:
+            message["tickets"] = tickets
+        message = await self.window.append_async(message)
+        await emit({"type": "done", "message": message, "deployment": reply["deployment"], "usage": reply["usage"]})
+        return message
+
+
+class SessionManager:
+    """Creates, finds and expires sessions
+
+    Sessions unused for `idle_timeout` seconds are deleted from the backend
+    by `sweep`. The local cache holds up to `max_sessions` sessions and drops
+    the least recently used one beyond that; a dropped session is simply
+    loaded again from the backend when it comes back.
+    """
+
+    def __init__(self, store, state_backend, max_sessions=10000, idle_timeout=1800.0):
+        self.store = store
+        self.state_backend = state_backend
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _window(self, conversation_id):
+        return ChatWindow(self.store, conversation_id, page_size=CHAT_PAGE_SIZE, max_messages=CHAT_MAX_MESSAGES)
+
+    def _cache(self, session):
+        self._sessions[session.session_id] = session
+        self._sessions.move_to_end(session.session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    async def create(self, user_email):
+        """Open a session on the user's latest conversation, or return None for unknown users"""
+        profile = await asyncio.to_thread(get_user_directory().get_profile, user_email)
+        if profile is None:
+            return None
+        email = profile.get("email") or user_email
+        conversation_id = await asyncio.to_thread(
+            lambda: self.store.latest_conversation(email) or self.store.create_conversation(email)
+        )
+        state = SessionState(self.state_backend, secrets.token_urlsafe(24))
+        state["profile"] = profile
+        state["conversation_id"] = conversation_id
+        state["mcp_servers"] = {}
+        state["mcp_tools"] = {}
+        state["max_tokens"] = DEFAULT_MAX_TOKENS
+        state["temperature"] = DEFAULT_TEMPERATURE
+        await asyncio.to_thread(state.save)
+        window = await asyncio.to_thread(self._window, conversation_id)
+        return self._cache(ChatSession(state, window))
+
+    async def get(self, session_id):
+        """Return the session, revalidated against the backend, or None if it does not exist"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            state = SessionState(self.state_backend, session_id)
+            if not await asyncio.to_thread(state.load):
+                return None
+            window = await asyncio.to_thread(self._window, state["conversation_id"])
+            session = self._cache(ChatSession(state, window))
+        else:
+            # A primary-key lookup, cheaper than a thread hop
+            if not session.state.load():
+                self._sessions.pop(session_id, None)
+                return None
+            self._sessions.move_to_end(session_id)
+            if session.window.conversation_id != session.state["conversation_id"]:
+                # Another worker started a new conversation
+                session.window = await asyncio.to_thread(self._window, session.state["conversation_id"])
+        now = time.monotonic()
+        session.last_seen = now
+        if now - session.last_touched > TOUCH_INTERVAL:
+            session.last_touched = now
+            self.state_backend.touch(session_id)
+        return session
+
+    async def update(self, session, mutate):
+        """Apply `mutate(state)` to the session and save it, retrying on conflicts with other workers
+
+        Runs in a worker thread, so `mutate` may block.
+        """
+        return await asyncio.to_thread(session.state.update, mutate)
+
+    async def new_conversation(self, session):
+        """Point the session at a new, empty conversation; earlier ones stay in the store"""
+        async with session.lock:
+            conversation_id = await asyncio.to_thread(self.store.create_conversation, session.profile.get("email"))
+
+            def switch(state):
+                state["conversation_id"] = conversation_id
+
+            await self.update(session, switch)
+            session.window = await asyncio.to_thread(self._window, conversation_id)
+
+    async def close(self, session_id):
+        """Delete the session everywhere; return False if it did not exist"""
+        session = await self.get(session_id)
+        if session is None:
+            return False
+        self._sessions.pop(session_id, None)
+        await asyncio.to_thread(session.state.delete)
+        return True
+
+    def sweep(self):
+        """Delete sessions idle everywhere and drop idle local copies; return how many were deleted
+
+        Blocks on the backend; run it in a worker thread.
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        for session_id, session in list(self._sessions.items()):
+            if session.last_seen < cutoff and not session.lock.locked():
+                self._sessions.pop(session_id, None)
+        return self.state_backend.expire(self.idle_timeout)
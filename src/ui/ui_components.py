@@ -2,13 +2,52 @@
 UI components for the Streamlit MCP application
 """
 
+import html
+
 import streamlit as st
-from src.config.config import PROMPT_LIBRARY, USER_PROFILES
+from streamlit.errors import StreamlitAPIException
+from src.config.config import PROMPT_LIBRARY
+from src.core.cache import LRUCache
+from src.core.chat_pipeline import prompt_cache_stats
+from src.handlers.chat_handlers import (
+    append_message, has_earlier_messages, has_later_messages, load_earlier_messages, load_latest_messages,
+    start_new_conversation
+)
 from src.handlers.mcp_handlers import (
     add_mcp_server, remove_mcp_server, connect_to_mcp_server, 
-    disconnect_mcp_server, get_public_mcp_servers, simulate_mcp_tool_execution
+    disconnect_mcp_server, execute_mcp_tool, get_public_mcp_servers
 )
-from src.core.user_management import refresh_user_data, switch_user
+from src.handlers.session_handlers import persist_session_state
+from src.core.user_management import fetch_team_members, list_users, refresh_user_data, switch_user
+
+# Messages rendered per rerun before "Load earlier messages" is needed
+CHAT_RENDER_WINDOW = 30
+TICKET_STATUS_ICONS = {
+    "In Progress": "🟡",
+    "Done": "✅",
+    "Todo": "⏳",
+    "Backlog": "📋"
+}
+# Stored messages never change, so their card HTML is cached by message id
+_ticket_html_cache = LRUCache(maxsize=512)
+# Fragments (Streamlit >= 1.37) rerun on their own instead of the whole script
+_st_fragment = getattr(st, "fragment", None)
+
+
+def fragment(func):
+    """Make a panel independently rerunnable, or leave it as is on older Streamlit"""
+    return _st_fragment(func) if _st_fragment is not None else func
+
+
+def rerun_fragment():
+    """Rerun only the current panel, or the whole app when fragments are unavailable"""
+    if _st_fragment is not None:
+        try:
+            st.rerun(scope="fragment")
+        except StreamlitAPIException:
+            # The panel was drawn by a full-app run rather than its own rerun
+            pass
+    st.rerun()
 
 
 def render_header():
@@ -163,6 +202,7 @@ def render_custom_css():
     """, unsafe_allow_html=True)
 
 
+@fragment
 def render_user_profile_section():
     """Render user profile section in sidebar"""
     user_profile = st.session_state.user_profile
@@ -173,7 +213,7 @@ def render_user_profile_section():
         st.markdown("**🔐 Login**")
         selected_user = st.selectbox(
             "Select User:",
-            list(USER_PROFILES.keys()),
+            list_users(),
             key="user_selector"
         )
         
@@ -181,6 +221,7 @@ def render_user_profile_section():
             success, message = switch_user(selected_user)
             if success:
                 st.success(message)
+                # Tasks and chat belong to the user, so the whole page changes
                 st.rerun()
             else:
                 st.error(message)
@@ -191,8 +232,13 @@ def render_user_profile_section():
         {user_profile['role'].title()} | {user_profile['team']}  
         📧 {user_profile['email']}
         """)
+        
+        if user_profile['role'] in ("team_lead", "project_manager"):
+            members = fetch_team_members().get(user_profile['team'], [])
+            st.caption(f"👥 {len(members)} team members: " + ", ".join(member['name'] for member in members))
 
 
+@fragment
 def render_user_tasks_section():
     """Render user-specific tasks section"""
     st.markdown("#### 📋 My Tasks & Actions")
@@ -215,7 +261,7 @@ def render_user_tasks_section():
                 
                 if st.button(f"Execute: {task['title']}", key=f"task_{task['id']}"):
                     # Add user message
-                    st.session_state.messages.append({
+                    append_message({
                         "role": "user", 
                         "content": task['action']
                     })
@@ -237,7 +283,7 @@ def render_user_tasks_section():
                 
                 if st.button(f"Run: {action['title']}", key=f"action_{action['id']}"):
                     # Add user message
-                    st.session_state.messages.append({
+                    append_message({
                         "role": "user", 
                         "content": action['action']
                     })
@@ -249,14 +295,16 @@ def render_user_tasks_section():
     if st.button("🔄 Refresh My Data"):
         refresh_user_data()
         st.success("User data refreshed!")
-        st.rerun()
+        rerun_fragment()
     
     # Clear chat button
+    # Earlier conversations stay in the history store
     if st.button("🗑️ Clear Chat", type="secondary"):
-        st.session_state.messages = []
+        start_new_conversation()
         st.rerun()
 
 
+@fragment
 def render_mcp_servers_section():
     """Render MCP servers management section"""
     st.markdown("#### 🛠️ MCP Server Management")
@@ -276,7 +324,7 @@ def render_mcp_servers_section():
                 if name and host and port:
                     add_mcp_server(name, host, port, description)
                     st.success(f"Added server: {name}")
-                    st.rerun()
+                    rerun_fragment()
                 else:
                     st.error("Please fill in all required fields")
     
@@ -294,7 +342,7 @@ def render_mcp_servers_section():
                     if server_info["status"] == "connected":
                         if st.button(f"Disconnect", key=f"disconnect_{server_name}"):
                             disconnect_mcp_server(server_name)
-                            st.rerun()
+                            rerun_fragment()
                     else:
                         if st.button(f"Connect", key=f"connect_{server_name}"):
                             success, message = connect_to_mcp_server(server_name)
@@ -302,7 +350,7 @@ def render_mcp_servers_section():
                                 st.success(message)
                             else:
                                 st.error(message)
-                            st.rerun()
+                            rerun_fragment()
                 
                 with col2:
                     if st.button(f"Test", key=f"test_{server_name}"):
@@ -312,7 +360,7 @@ def render_mcp_servers_section():
                 with col3:
                     if st.button(f"Remove", key=f"remove_{server_name}"):
                         remove_mcp_server(server_name)
-                        st.rerun()
+                        rerun_fragment()
     else:
         st.info("No MCP servers configured. Add one above to get started!")
     
@@ -349,8 +397,12 @@ def render_mcp_servers_section():
             for tool in tools:
                 st.caption(f"• {tool['name']}")
     
+    # Server changes rerun only this panel
+    persist_session_state()
+    
 
 
+@fragment
 def render_settings_section():
     """Render settings section"""
     st.markdown("#### ⚙️ Settings")
@@ -366,6 +418,10 @@ def render_settings_section():
     
     if AZURE_OPENAI_CONFIG["api_key"]:
         st.success("Azure OpenAI is properly configured!")
+        cache_stats = prompt_cache_stats()
+        if cache_stats["prompt_tokens"]:
+            hit_rate = cache_stats["cached_tokens"] / cache_stats["prompt_tokens"]
+            st.caption(f"Prompt cache: {hit_rate:.0%} of {cache_stats['prompt_tokens']:,} prompt tokens served from cache")
     else:
         st.error("Please configure Azure OpenAI in your .env file")
         st.code("""
@@ -383,12 +439,16 @@ AZURE_OPENAI_DEPLOYMENT_NAME=your_deployment_name
     
     # Chat parameters
     st.subheader("💬 Chat Parameters")
-    max_tokens = st.slider("Max Tokens", 100, 4000, 2000)
-    temperature = st.slider("Temperature", 0.0, 2.0, 0.7, 0.1)
+    # Read by the chat request builder through their session state keys
+    # and initialized with the rest of the session state
+    st.slider("Max Tokens", 100, 4000, key="max_tokens")
+    st.slider("Temperature", 0.0, 2.0, step=0.1, key="temperature")
     
     # Save settings
     if st.button("💾 Save Settings"):
         st.success("Settings saved! (Note: Some changes require app restart)")
+    # A slider change reruns only this panel
+    persist_session_state()
 
 
 def render_demo_tools_section():
@@ -398,21 +458,21 @@ def render_demo_tools_section():
     
     # Filesystem demo
     if st.button("📁 Test Filesystem"):
-        result = simulate_mcp_tool_execution("Filesystem MCP", "list_directory", {"path": "."})
+        result = execute_mcp_tool("Filesystem MCP", "list_directory", {"path": "."})
         st.success(f"Demo result: {result['message']}")
         if 'files' in result:
             st.write("Files found:", result['files'])
     
     # Git demo
     if st.button("🔧 Test Git"):
-        result = simulate_mcp_tool_execution("Git MCP", "git_status", {"path": "."})
+        result = execute_mcp_tool("Git MCP", "git_status", {"path": "."})
         st.success(f"Demo result: {result['message']}")
         if 'status' in result:
             st.code(result['status'])
     
     # Web search demo
     if st.button("🌐 Test Web Search"):
-        result = simulate_mcp_tool_execution("Web Search MCP", "search_web", {"query": "MCP servers"})
+        result = execute_mcp_tool("Web Search MCP", "search_web", {"query": "MCP servers"})
         st.success(f"Demo result: {result['message']}")
         if 'results' in result:
             for res in result['results']:
@@ -421,7 +481,7 @@ def render_demo_tools_section():
     
     # Memory demo
     if st.button("💾 Test Memory"):
-        result = simulate_mcp_tool_execution("Memory MCP", "create_memory", {"content": "Demo memory content", "tags": ["demo", "test"]})
+        result = execute_mcp_tool("Memory MCP", "create_memory", {"content": "Demo memory content", "tags": ["demo", "test"]})
         st.success(f"Demo result: {result['message']}")
         if 'memory' in result:
             st.write("Created memory:", result['memory']['content'])
@@ -457,3 +517,54 @@ def render_tools_status_section():
             for tool in tools:
                 st.caption(f"• {tool['name']}")
     
+
+
+def ticket_card_html(ticket):
+    """Build the HTML card for a Linear ticket"""
+    status = ticket.get("status", "Todo")
+    status_icon = TICKET_STATUS_ICONS.get(status, "❓")
+    escape = html.escape
+    return f"""
+    <div style="border: 1px solid #ddd; border-radius: 8px; padding: 15px; margin: 10px 0; background: #f9f9f9;">
+        <h3>🎫 {escape(ticket.get("title", "Untitled"))}</h3>
+        <p><strong>Status:</strong> {status_icon} {escape(status)}</p>
+        <p><strong>Assignee:</strong> {escape(ticket.get("assignee", "Unassigned"))}</p>
+        <p><strong>Deadline:</strong> {escape(ticket.get("deadline", "No deadline"))}</p>
+        <p><strong>Tags:</strong> {escape(', '.join(ticket.get("tags", [])))}</p>
+    </div>
+    """
+
+
+def render_chat_message(message):
+    """Render one stored chat message with any ticket cards it carries"""
+    with st.chat_message(message["role"]):
+        if message.get("content"):
+            st.markdown(message["content"])
+        tickets = message.get("tickets")
+        if tickets:
+            cards = _ticket_html_cache.get(message["id"])
+            if cards is None:
+                cards = "".join(ticket_card_html(ticket) for ticket in tickets)
+                _ticket_html_cache.set(message["id"], cards)
+            st.markdown(cards, unsafe_allow_html=True)
+
+
+def render_chat_history():
+    """Render the most recent chat messages, with a control to show earlier ones"""
+    messages = st.session_state.messages
+    window = st.session_state.get("chat_render_window", CHAT_RENDER_WINDOW)
+    hidden = len(messages) - window
+    if hidden > 0 or has_earlier_messages():
+        if st.button("⬆️ Load earlier messages", key="load_earlier"):
+            if hidden < CHAT_RENDER_WINDOW:
+                load_earlier_messages()
+            st.session_state.chat_render_window = window + CHAT_RENDER_WINDOW
+            st.rerun()
+    for message in messages[-window:]:
+        render_chat_message(message)
+    # Paging far back drops the newest messages from memory
+    if has_later_messages():
+        if st.button("⬇️ Back to latest messages", key="load_latest"):
+            load_latest_messages()
+            st.session_state.pop("chat_render_window", None)
+            st.rerun()